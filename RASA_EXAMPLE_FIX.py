@@ -5,10 +5,21 @@ Team AI: This is an example showing EXACTLY how to add intent to dispatcher.utte
 Copy this pattern to ALL your custom actions.
 """
 
-from typing import Any, Text, Dict, List
-from rasa_sdk import Action, Tracker
+from typing import Any, Text, Dict, List, Optional
+from rasa_sdk import Tracker
 from rasa_sdk.executor import CollectingDispatcher
 
+from actions.http_client import backend, BackendError, gather_limited
+from actions.search_cache import search_cache
+from actions.catalog_index import catalog_index
+from actions.tracing import TracedAction
+from actions.recommendations import co_purchase
+from actions.gemini_cache import ask_gemini
+from actions.size_chart import size_advisor
+from actions.customer_context import customer_context
+from actions.slot_parsing import parse_price, parse_height_cm, parse_weight_kg
+from actions.product_cards import product_list_payload, product_pages, cursor_events, CURSOR_SLOT, PRODUCT_LIST_MAX_RESULTS
+
 
 # ====================================
 # Helper Function (Already implemented by Team AI)
@@ -22,18 +33,115 @@ def get_intent_from_tracker(tracker: Tracker) -> str:
         return 'unknown'
 
 
+# ====================================
+# Backend helpers (shared pooled async client, see actions/http_client.py)
+# ====================================
+async def search_products(query: str, category: Optional[str] = None, limit: int = 10) -> List[Dict[Text, Any]]:
+    """Search the in-memory catalog index; fall back to /internal/products (via search_cache) if it isn't built"""
+    if await catalog_index.ensure_ready():
+        return catalog_index.search(query, category=category, limit=limit)
+
+    params = {"search": query, "category": category, "limit": limit}
+
+    async def fetch():
+        data = await backend.get("/internal/products", params=params)
+        return data.get("products", [])
+
+    return await search_cache.get_or_fetch(query, {"category": category, "limit": limit}, fetch)
+
+
+async def search_products_by_price(
+    query: str, min_price: Optional[float], max_price: Optional[float], limit: int = 10
+) -> List[Dict[Text, Any]]:
+    """Price-filtered search from the catalog index, or POST /internal/products/search while it is being built"""
+    if await catalog_index.ensure_ready():
+        return catalog_index.search(query, min_price=min_price, max_price=max_price, limit=limit)
+
+    body = {"q": query or None, "min_price": min_price, "max_price": max_price, "limit": min(limit, 50)}
+
+    async def fetch():
+        data = await backend.post("/internal/products/search", json={k: v for k, v in body.items() if v is not None})
+        return data.get("products", [])
+
+    return await search_cache.get_or_fetch(query, {"min_price": min_price, "max_price": max_price, "limit": limit}, fetch)
+
+
+async def get_customer(tracker: Tracker) -> Dict[Text, Any]:
+    """{customer_id, email} of the logged-in customer (ChatService injects user_jwt_token into metadata)"""
+    return await customer_context.identity(tracker)
+
+
+async def get_customer_orders(tracker: Tracker) -> List[Dict[Text, Any]]:
+    """Orders of the logged-in customer, cached per sender (see actions/customer_context.py)"""
+    return await customer_context.orders(tracker)
+
+
+BATCH_IDS = 100  # max ids per /internal/products?ids= and /internal/variants?ids= request
+
+
+def _chunks(ids: List[int], size: int = BATCH_IDS) -> List[List[int]]:
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+async def get_products_by_ids(product_ids: List[int]) -> List[Dict[Text, Any]]:
+    """Full product details for several ids in one round trip (chunks of 100 run concurrently)"""
+    ids = list(dict.fromkeys(int(pid) for pid in product_ids))
+    if not ids:
+        return []
+    pages = await gather_limited(
+        backend.get("/internal/products", params={"ids": ",".join(map(str, chunk))})
+        for chunk in _chunks(ids)
+    )
+    products = []
+    for page in pages:
+        if isinstance(page, Exception):
+            raise page
+        products.extend(page.get("products", []))
+    return products
+
+
+async def get_variants_by_ids(variant_ids: List[int]) -> Dict[int, Dict[Text, Any]]:
+    """variant_id -> live variant (stock, price) for several ids in one round trip"""
+    ids = list(dict.fromkeys(int(vid) for vid in variant_ids))
+    if not ids:
+        return {}
+    pages = await gather_limited(
+        backend.get("/internal/variants", params={"ids": ",".join(map(str, chunk))})
+        for chunk in _chunks(ids)
+    )
+    variants = {}
+    for page in pages:
+        if isinstance(page, Exception):
+            raise page
+        for variant in page.get("variants", []):
+            variants[variant["variant_id"]] = variant
+    return variants
+
+
+def bought_together_products(product_id: int, limit: int = 5) -> List[Dict[Text, Any]]:
+    """Co-purchase neighbours of product_id that are in the catalog index (see actions/recommendations.py)"""
+    products = []
+    for neighbor_id, _score in co_purchase.neighbors(product_id, k=limit * 2):
+        product = catalog_index.products.get(neighbor_id)
+        if product:
+            products.append(product)
+        if len(products) == limit:
+            break
+    return products
+
+
 # ====================================
 # ❌ BEFORE (WRONG - No metadata)
 # ====================================
-class ActionSearchProductsBEFORE(Action):
+class ActionSearchProductsBEFORE(TracedAction):
     def name(self) -> Text:
         return "action_search_products"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         intent_name = get_intent_from_tracker(tracker)  # ← Get intent
         
         # Search products...
-        products = self.search_products("áo meow")
+        products = await search_products("áo meow")
         
         # ❌ WRONG: No metadata parameter
         dispatcher.utter_message(
@@ -47,40 +155,170 @@ class ActionSearchProductsBEFORE(Action):
 # ====================================
 # ✅ AFTER (CORRECT - With metadata)
 # ====================================
-class ActionSearchProductsAFTER(Action):
+class ActionSearchProductsAFTER(TracedAction):
     def name(self) -> Text:
         return "action_search_products"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         intent_name = get_intent_from_tracker(tracker)  # ← Get intent
         
         # Search products...
-        products = self.search_products("áo meow")
+        try:
+            products = await search_products(tracker.latest_message.get('text') or "", limit=PRODUCT_LIST_MAX_RESULTS)
+        except BackendError:
+            dispatcher.utter_message(
+                text="Sorry, product search is unavailable right now.",
+                metadata={"intent": intent_name}
+            )
+            return []
         
         # ✅ CORRECT: Add metadata parameter with intent
+        # Compact cards, first page only; the rest via next_cursor (ActionShowMoreProducts)
+        payload = product_list_payload(products, tracker.sender_id)
         dispatcher.utter_message(
             text=f"Found {len(products)} products",
             metadata={"intent": intent_name},  # ← ADD THIS LINE!
-            custom={"type": "product_list", "products": products}
+            custom=payload
         )
         
-        return []
+        return cursor_events(payload)
 
 
 # ====================================
 # ✅ More Examples
 # ====================================
 
-class ActionTrackOrder(Action):
+class ActionSearchByPrice(TracedAction):
+    """Example: Search within a price range (answered from the catalog index)"""
+    def name(self) -> Text:
+        return "action_search_by_price"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        intent_name = get_intent_from_tracker(tracker)
+
+        # Raw entity text: "300k", "1tr5", "300.000đ"
+        min_price = parse_price(tracker.get_slot('min_price'))
+        max_price = parse_price(tracker.get_slot('max_price'))
+        query = tracker.get_slot('product_type') or ""
+
+        if min_price is None and max_price is None:
+            dispatcher.utter_message(
+                text="What price range are you looking for? (e.g. 200k - 500k)",
+                metadata={"intent": intent_name}
+            )
+            return []
+        if min_price is not None and max_price is not None and min_price > max_price:
+            min_price, max_price = max_price, min_price
+
+        try:
+            products = await search_products_by_price(query, min_price, max_price, limit=PRODUCT_LIST_MAX_RESULTS)
+        except BackendError:
+            dispatcher.utter_message(
+                text="Sorry, product search is unavailable right now.",
+                metadata={"intent": intent_name}
+            )
+            return []
+
+        payload = product_list_payload(products, tracker.sender_id)
+        dispatcher.utter_message(
+            text=f"Found {len(products)} products in your price range",
+            metadata={"intent": intent_name},
+            custom=payload
+        )
+
+        return cursor_events(payload)
+
+
+class ActionRecommendProducts(TracedAction):
+    """Example: Recommendations for the product the customer is looking at"""
+    def name(self) -> Text:
+        return "action_recommend_products"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        intent_name = get_intent_from_tracker(tracker)
+
+        product_id = tracker.get_slot('product_id')
+        products = []
+        if product_id and await catalog_index.ensure_ready():
+            products = bought_together_products(int(product_id))
+
+        if not products:
+            dispatcher.utter_message(
+                text="I don't have recommendations for this item yet.",
+                metadata={"intent": intent_name}
+            )
+            return []
+
+        payload = product_list_payload(products, tracker.sender_id)
+        dispatcher.utter_message(
+            text="Customers who bought this also bought:",
+            metadata={"intent": intent_name},
+            custom=payload
+        )
+
+        return cursor_events(payload)
+
+
+class ActionShowMoreProducts(TracedAction):
+    """Example: next page of the last product list ("xem thêm"), no backend call"""
+    def name(self) -> Text:
+        return "action_show_more_products"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        intent_name = get_intent_from_tracker(tracker)
+        # next_cursor of a specific list from the frontend (metadata.cursor), else the last list shown
+        metadata = tracker.latest_message.get('metadata') or {}
+        cursor = metadata.get('cursor') or tracker.get_slot(CURSOR_SLOT)
+        if not cursor:
+            dispatcher.utter_message(
+                text="That's all the products in this list.",
+                metadata={"intent": intent_name}
+            )
+            return []
+        page = product_pages.page(cursor, tracker.sender_id)
+
+        if page is None:
+            dispatcher.utter_message(
+                text="That list has expired, please search again.",
+                metadata={"intent": intent_name}
+            )
+            return []
+
+        dispatcher.utter_message(
+            text=f"Products {page['offset'] + 1}-{page['offset'] + len(page['products'])} of {page['total']}",
+            metadata={"intent": intent_name},
+            custom=page
+        )
+        return cursor_events(page)
+
+
+class ActionTrackOrder(TracedAction):
     """Example: Order tracking"""
     def name(self) -> Text:
         return "action_track_order"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def get_order_info(self, tracker: Tracker) -> Optional[Dict[Text, Any]]:
+        orders = await get_customer_orders(tracker)
+        order_id = tracker.get_slot('order_id')
+        if order_id:
+            orders = [o for o in orders if str(o['id']) == str(order_id)]
+        return orders[0] if orders else None
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         intent_name = get_intent_from_tracker(tracker)
         
         # Get order info...
-        order = self.get_order_info(tracker)
+        try:
+            order = await self.get_order_info(tracker)
+        except BackendError:
+            order = None
+
+        if not order:
+            dispatcher.utter_message(
+                text="I couldn't find your order. Please log in and try again.",
+                metadata={"intent": intent_name}
+            )
+            return []
         
         # ✅ Send with metadata
         dispatcher.utter_message(
@@ -91,16 +329,43 @@ class ActionTrackOrder(Action):
         return []
 
 
-class ActionGetStylingAdvice(Action):
+class ActionGetStylingAdvice(TracedAction):
     """Example: Styling advice"""
     def name(self) -> Text:
         return "action_get_styling_advice"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def get_styling_suggestions(self, tracker: Tracker) -> List[Dict[Text, Any]]:
+        product_id = tracker.get_slot('product_id')
+        if not product_id:
+            return []
+
+        # Items customers actually bought together come first (precomputed, O(1) lookup)
+        if await catalog_index.ensure_ready():
+            bought_together = bought_together_products(int(product_id), limit=3)
+        else:
+            bought_together = []
+        if bought_together:
+            return bought_together
+
+        rules = await backend.get(f"/internal/products/{product_id}/styling-rules")
+        # One product per recommended category, searched concurrently
+        results = await gather_limited(
+            search_products(rec['value'], limit=1) for rec in rules.get('recommendations', [])
+        )
+        suggestions = []
+        for products in results:
+            if not isinstance(products, Exception):
+                suggestions.extend(products)
+        return suggestions
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         intent_name = get_intent_from_tracker(tracker)
         
         # Get recommendations...
-        suggestions = self.get_styling_suggestions(tracker)
+        try:
+            suggestions = await self.get_styling_suggestions(tracker)
+        except BackendError:
+            suggestions = []
         
         # ✅ Multiple messages - ALL need metadata
         dispatcher.utter_message(
@@ -108,21 +373,247 @@ class ActionGetStylingAdvice(Action):
             metadata={"intent": intent_name}  # ← Add to first message
         )
         
+        payload = product_list_payload(suggestions, tracker.sender_id)
         dispatcher.utter_message(
             text="You can pair these items...",
             metadata={"intent": intent_name},  # ← Add to second message
-            custom={"type": "product_list", "products": suggestions}
+            custom=payload
         )
         
+        return cursor_events(payload)
+
+
+class ActionCompareProducts(TracedAction):
+    """Example: compare several products - one batched request instead of one per product"""
+    def name(self) -> Text:
+        return "action_compare_products"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        intent_name = get_intent_from_tracker(tracker)
+        product_ids = tracker.get_slot("compare_product_ids") or list(tracker.get_latest_entity_values("product_id"))
+
+        try:
+            products = await get_products_by_ids(product_ids)
+        except BackendError:
+            products = []
+
+        if len(products) < 2:
+            dispatcher.utter_message(
+                text="Please pick at least two products to compare.",
+                metadata={"intent": intent_name}
+            )
+            return []
+
+        comparison = [
+            {
+                "id": p["id"],
+                "name": p["name"],
+                "price": p["selling_price"],
+                "sizes": p.get("available_sizes", []),
+                "colors": p.get("available_colors", []),
+                "in_stock": p.get("total_stock", 0) > 0,
+            }
+            for p in products
+        ]
+        dispatcher.utter_message(
+            text=f"Comparing {len(comparison)} products:",
+            metadata={"intent": intent_name},
+            custom={"type": "product_comparison", "products": comparison}
+        )
+        return []
+
+
+class ActionViewCart(TracedAction):
+    """Example: cart with live stock - variants fetched in one batched request"""
+    def name(self) -> Text:
+        return "action_view_cart"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        intent_name = get_intent_from_tracker(tracker)
+
+        try:
+            if not (await get_customer(tracker)).get('customer_id'):
+                dispatcher.utter_message(
+                    text="Please log in to view your cart.",
+                    metadata={"intent": intent_name}
+                )
+                return []
+            cart = await customer_context.cart(tracker)
+            variants = await get_variants_by_ids([item['variant_id'] for item in cart.get('items', [])])
+        except BackendError:
+            dispatcher.utter_message(
+                text="Sorry, I can't load your cart right now.",
+                metadata={"intent": intent_name}
+            )
+            return []
+
+        items = []
+        for item in cart.get('items', []):
+            variant = variants.get(item['variant_id']) or {}
+            items.append({**item, "available_stock": variant.get('available_stock', 0)})
+
+        dispatcher.utter_message(
+            text=f"You have {len(items)} item(s) in your cart, total {cart.get('total', 0):,.0f}đ.",
+            metadata={"intent": intent_name},
+            custom={"type": "cart", "items": items, "total": cart.get('total', 0)}
+        )
+        return []
+
+
+class ActionAddToCart(TracedAction):
+    """Example: mutating action - drop the cached cart afterwards"""
+    def name(self) -> Text:
+        return "action_add_to_cart"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        intent_name = get_intent_from_tracker(tracker)
+        variant_id = tracker.get_slot('variant_id')
+
+        try:
+            customer_id = (await get_customer(tracker)).get('customer_id')
+            if not customer_id or not variant_id:
+                dispatcher.utter_message(
+                    text="Please log in and choose a size and color first.",
+                    metadata={"intent": intent_name}
+                )
+                return []
+            await backend.post("/api/chatbot/cart/add", json={
+                "customer_id": customer_id,
+                "variant_id": int(variant_id),
+                "quantity": int(tracker.get_slot('quantity') or 1),
+            })
+        except BackendError as e:
+            dispatcher.utter_message(
+                text="Sorry, I couldn't add that item to your cart." if e.status != 400 else "That item is out of stock.",
+                metadata={"intent": intent_name}
+            )
+            return []
+        finally:
+            customer_context.invalidate(tracker.sender_id, "cart")
+
+        dispatcher.utter_message(
+            text="Added to your cart!",
+            metadata={"intent": intent_name}
+        )
+        return []
+
+
+class ActionCancelOrder(TracedAction):
+    """Example: cancel an order from the cached order list, then drop the cached orders"""
+    def name(self) -> Text:
+        return "action_cancel_order"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        intent_name = get_intent_from_tracker(tracker)
+        order_id = tracker.get_slot('order_id')
+
+        try:
+            orders = await get_customer_orders(tracker)
+            order = next((o for o in orders if str(o['id']) == str(order_id)), None)
+            if not order:
+                dispatcher.utter_message(
+                    text="I couldn't find that order in your account.",
+                    metadata={"intent": intent_name}
+                )
+                return []
+            customer_id = (await get_customer(tracker)).get('customer_id')
+            await backend.post(f"/api/chatbot/orders/{order['id']}/cancel", json={"customer_id": customer_id})
+        except BackendError as e:
+            dispatcher.utter_message(
+                text="Only pending orders can be cancelled." if e.status == 400 else "Sorry, I couldn't cancel the order right now.",
+                metadata={"intent": intent_name}
+            )
+            return []
+        finally:
+            customer_context.invalidate(tracker.sender_id, "orders")
+
+        dispatcher.utter_message(
+            text=f"Order #{order['id']} has been cancelled.",
+            metadata={"intent": intent_name}
+        )
+        return []
+
+
+class ActionGetSizingAdvice(TracedAction):
+    """Example: size advice computed locally from the precomputed size tables"""
+    def name(self) -> Text:
+        return "action_get_sizing_advice"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        intent_name = get_intent_from_tracker(tracker)
+        # Raw entity text: "170cm", "1m70", "65 ký"
+        height = parse_height_cm(tracker.get_slot("height"))
+        weight = parse_weight_kg(tracker.get_slot("weight"))
+
+        if height is None or weight is None:
+            dispatcher.utter_message(
+                text="Could you tell me your height (cm) and weight (kg)?",
+                metadata={"intent": intent_name}
+            )
+            return []
+
+        # Rules come from the backend once per SIZE_RULES_TTL_SECONDS (actions/size_chart.py)
+        if not await size_advisor.load_rules():
+            dispatcher.utter_message(
+                text="Sorry, size advice is unavailable right now.",
+                metadata={"intent": intent_name}
+            )
+            return []
+
+        # "size áo và quần": advice is a local table lookup, the size charts are fetched concurrently
+        categories = list(tracker.get_latest_entity_values("category")) or ["shirt"]
+        advices = [size_advisor.advise(height, weight, category) for category in categories]
+        if None in advices:
+            (min_height, max_height), (min_weight, max_weight) = size_advisor.limits()
+            dispatcher.utter_message(
+                text=f"I can advise for heights {min_height}-{max_height} cm and weights {min_weight}-{max_weight} kg. "
+                     "Could you check your measurements?",
+                metadata={"intent": intent_name}
+            )
+            return []
+
+        charts = await gather_limited(size_advisor.size_chart(category) for category in categories)
+        for category, advice, chart in zip(categories, advices, charts):
+            if isinstance(chart, Exception):
+                chart = None
+            dispatcher.utter_message(
+                text=f"{category}: size {advice['recommended_size']} ({advice['reason']})",
+                metadata={"intent": intent_name},
+                custom={"type": "size_advice", "advice": advice, "size_chart": chart}
+            )
+
+        return []
+
+
+class ActionAskGemini(TracedAction):
+    """Example: free-form question answered by Gemini, through the response cache"""
+    def name(self) -> Text:
+        return "action_ask_gemini"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        intent_name = get_intent_from_tracker(tracker)
+        question = tracker.latest_message.get('text') or ''
+
+        try:
+            # Repeated / near-duplicate questions are answered from actions/gemini_cache.py
+            answer = await ask_gemini(question)
+        except BackendError:
+            answer = {}
+
+        dispatcher.utter_message(
+            text=answer.get('answer') or "Sorry, I can't answer that right now.",
+            metadata={"intent": intent_name, "source": answer.get('source'), "cache": answer.get('cache')}
+        )
+
         return []
 
 
-class ActionFallback(Action):
+class ActionFallback(TracedAction):
     """Example: Fallback action"""
     def name(self) -> Text:
         return "action_default_fallback"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         intent_name = get_intent_from_tracker(tracker)
         
         # ✅ Even fallback needs metadata!
@@ -143,7 +634,12 @@ For EVERY action in your codebase:
 1. Find all dispatcher.utter_message() calls
 2. Add get_intent_from_tracker(tracker) at the start
 3. Add metadata={"intent": intent_name} to EVERY utter_message() call
-4. Test and verify backend logs show intent
+4. Make run() async and call the backend through actions.http_client.backend
+   (never requests.get/post - it blocks the action server worker)
+5. Subclass TracedAction instead of Action: it times every run, exports
+   histograms at :9464/metrics and fills in metadata.intent on any
+   utter_message() that forgot it (keep adding it explicitly anyway)
+6. Test and verify backend logs show intent
 
 Actions to check:
 - ActionSearchProducts ✓
@@ -0,0 +1 @@
+"""Shared helpers for the Rasa action server (backend client, caches, metrics)."""
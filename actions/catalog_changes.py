@@ -0,0 +1,234 @@
+"""
+Push-based catalog change stream for the action server.
+
+migrations/009_create_catalog_change_notify.sql makes Postgres send a
+NOTIFY on channel catalog_changes for every change to products,
+product_variants, promotions and promotion_products (a promotion change is
+also sent once per product it applies to, so product_ids covers price
+changes). This module LISTENs on
+that channel (psycopg2 connection driven by the asyncio loop, no thread) and
+hands coalesced batches to in-process subscribers:
+
+    from actions.catalog_changes import catalog_changes
+
+    async def on_change(batch):
+        search_cache.invalidate_products(batch.product_ids)
+
+    catalog_changes.subscribe(on_change)
+    catalog_changes.start()
+
+Notifications are collected for CATALOG_CHANGES_BATCH_MS (or until
+CATALOG_CHANGES_MAX_BATCH), duplicates collapse into sets, and every
+subscriber gets one ChangeBatch. NOTIFY is not durable: after a (re)connect
+subscribers receive a batch with resync=True and should reconcile from the
+source (catalog_index.refresh() does that through its updated_at watermark).
+
+The LISTEN connection only reads, so a peer that disappeared (failover, NAT
+or proxy idle timeout) would go unnoticed; TCP keepalives
+(CATALOG_CHANGES_KEEPALIVE_SECONDS) make such a socket fail, which triggers
+the usual reconnect + resync.
+
+Needs DATABASE_URL; without it start() does nothing and the caches keep their
+TTL / polling behaviour.
+"""
+
+import os
+import json
+import time
+import asyncio
+import inspect
+import logging
+import contextvars
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "catalog_changes"
+CATALOG_CHANGES_BATCH_MS = float(os.getenv("CATALOG_CHANGES_BATCH_MS", "50"))
+CATALOG_CHANGES_MAX_BATCH = int(os.getenv("CATALOG_CHANGES_MAX_BATCH", "5000"))
+RECONNECT_MAX_SECONDS = 30.0
+# Idle seconds before the first TCP keepalive probe; a dead peer is detected after ~idle + 3 x 10s
+CATALOG_CHANGES_KEEPALIVE_SECONDS = int(os.getenv("CATALOG_CHANGES_KEEPALIVE_SECONDS", "30"))
+# psycopg2.connect() options for every LISTEN connection on the channel
+KEEPALIVE_OPTIONS = {
+    "keepalives": 1,
+    "keepalives_idle": CATALOG_CHANGES_KEEPALIVE_SECONDS,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+
+class ChangeBatch:
+    """Coalesced changes: ids per table plus the set of affected product ids"""
+
+    __slots__ = ("ids", "product_ids", "deleted_product_ids", "resync", "notifications", "first_seen")
+
+    def __init__(self, resync: bool = False):
+        self.ids: Dict[str, Set[int]] = defaultdict(set)
+        self.product_ids: Set[int] = set()
+        self.deleted_product_ids: Set[int] = set()
+        self.resync = resync
+        self.notifications = 0
+        self.first_seen = time.monotonic()
+
+    def add(self, payload: Dict[str, Any]):
+        self.notifications += 1
+        table, row_id, product_id = payload.get("t"), payload.get("id"), payload.get("p")
+        if table and row_id is not None:
+            self.ids[table].add(int(row_id))
+        if product_id is not None:
+            self.product_ids.add(int(product_id))
+            if table == "products" and payload.get("op") == "DELETE":
+                self.deleted_product_ids.add(int(product_id))
+
+    @property
+    def promotion_ids(self) -> Set[int]:
+        """Changed promotions; the products they apply to are already in product_ids"""
+        return self.ids.get("promotions", set())
+
+    def __len__(self) -> int:
+        return self.notifications
+
+    def __repr__(self) -> str:
+        tables = {t: len(ids) for t, ids in self.ids.items()}
+        return f"ChangeBatch(notifications={self.notifications}, products={len(self.product_ids)}, tables={tables}, resync={self.resync})"
+
+
+Subscriber = Callable[[ChangeBatch], Union[None, Awaitable[None]]]
+
+
+class CatalogChangeListener:
+    def __init__(self, database_url: Optional[str] = None):
+        self.database_url = database_url
+        self._subscribers: List[Subscriber] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.notifications = 0
+        self.batches = 0
+        self.reconnects = 0
+        self.last_lag_ms = 0.0
+
+    def subscribe(self, callback: Subscriber):
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def start(self) -> bool:
+        """Start listening once per process; False if DATABASE_URL is not configured"""
+        if self._task is not None:
+            return True
+        self.database_url = self.database_url or os.getenv("DATABASE_URL")
+        if not self.database_url:
+            logger.info("DATABASE_URL not set, catalog change stream disabled")
+            return False
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        # Fresh context: subscriber backend calls must not count towards the action that started us
+        self._task = contextvars.Context().run(loop.create_task, self._run())
+        return True
+
+    # ---------- connection ----------
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(self.database_url, **KEEPALIVE_OPTIONS)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL};")
+        return conn
+
+    def _drain(self, conn):
+        """Reader callback: move pending notifications into the queue"""
+        try:
+            conn.poll()
+        except Exception as e:
+            self._queue.put_nowait(e)
+            return
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            try:
+                payload = json.loads(notify.payload)
+            except ValueError:
+                logger.warning("Ignoring malformed catalog notification: %r", notify.payload)
+                continue
+            self._queue.put_nowait(payload)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        backoff = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await loop.run_in_executor(None, self._connect)
+                loop.add_reader(conn.fileno(), self._drain, conn)
+                self.connected = True
+                backoff = 1.0
+                logger.info("Listening for catalog changes on %s", CHANNEL)
+                # Anything that changed while we were not listening is unknown
+                await self._dispatch(ChangeBatch(resync=True))
+                await self._consume()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Catalog change stream lost (%s), reconnecting in %.0fs", e, backoff)
+            finally:
+                self.connected = False
+                if conn is not None:
+                    loop.remove_reader(conn.fileno())
+                    conn.close()
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+
+    async def _consume(self):
+        window = CATALOG_CHANGES_BATCH_MS / 1000
+        while True:
+            item = await self._queue.get()
+            if isinstance(item, Exception):
+                raise item
+            batch = ChangeBatch()
+            batch.add(item)
+            deadline = batch.first_seen + window
+            # Coalesce whatever arrives within the batch window
+            while len(batch) < CATALOG_CHANGES_MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if isinstance(item, Exception):
+                    await self._dispatch(batch)
+                    raise item
+                batch.add(item)
+            self.notifications += len(batch)
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: ChangeBatch):
+        self.batches += 1
+        for callback in list(self._subscribers):
+            try:
+                result = callback(batch)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Catalog change subscriber %r failed on %r", callback, batch)
+        self.last_lag_ms = (time.monotonic() - batch.first_seen) * 1000
+        logger.debug("Dispatched %r in %.1fms", batch, self.last_lag_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "subscribers": len(self._subscribers),
+            "notifications": self.notifications,
+            "batches": self.batches,
+            "reconnects": self.reconnects,
+            "last_lag_ms": round(self.last_lag_ms, 1),
+        }
+
+
+# Shared instance; catalog_index subscribes itself when it is built
+catalog_changes = CatalogChangeListener()
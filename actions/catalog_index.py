@@ -0,0 +1,312 @@
+"""
+In-memory inverted index over the product catalog for chatbot search.
+
+Built in a background task from /internal/products (updated_since/after_id
+keyset paging; the watermark advances per page, so a failed build resumes
+where it stopped) and kept fresh by re-reading only products whose updated_at moved past the stored
+watermark. Lets the search actions answer without a backend round trip:
+
+- Diacritic-insensitive character trigrams over name, category, colors and
+  description, with per-field weights and IDF ranking
+- Sorted price index for range filters (ActionSearchByPrice)
+- Changed products are also dropped from search_cache
+- With DATABASE_URL set, Postgres change notifications (actions.catalog_changes)
+  re-read exactly the changed products within milliseconds; polling remains
+  as a safety net
+
+Usage:
+
+    from actions.catalog_index import catalog_index
+
+    if await catalog_index.ensure_ready():
+        products = catalog_index.search("áo thun đen", max_price=300000)
+
+ensure_ready() never waits for the build: the first call starts it and
+returns False, and callers use backend search until the index is ready.
+"""
+
+import os
+import re
+import math
+import time
+import asyncio
+import bisect
+import contextvars
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from actions.http_client import backend, BackendError
+from actions.catalog_changes import ChangeBatch, catalog_changes
+from actions.search_cache import normalize_text, search_cache
+
+logger = logging.getLogger(__name__)
+
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+CATALOG_PAGE_SIZE = 500
+# Max ids per /internal/products?ids= request
+CATALOG_BATCH_IDS = 100
+
+NGRAM = 3
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "color": 1.5, "description": 0.5}
+# Share of the query's (IDF-weighted) trigrams a product must contain to match
+MIN_COVERAGE = 0.6
+
+# Fields kept per product; images/variants stay in the backend
+STORED_FIELDS = (
+    "id", "name", "slug", "selling_price", "thumbnail_url", "category_name",
+    "category_slug", "available_sizes", "available_colors", "total_stock",
+)
+
+EPOCH = "1970-01-01T00:00:00.000Z"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(normalize_text(text))
+
+
+def ngrams(text: Optional[str]) -> Set[str]:
+    """Padded character trigrams of every word: 'áo thun' -> {' ao', 'ao ', ' th', 'thu', 'hun', 'un '}"""
+    grams = set()
+    for word in tokenize(text):
+        padded = f" {word} "
+        for i in range(max(1, len(padded) - NGRAM + 1)):
+            grams.add(padded[i:i + NGRAM])
+    return grams
+
+
+class CatalogIndex:
+    def __init__(self):
+        self.products: Dict[int, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._doc_grams: Dict[int, Tuple[str, ...]] = {}
+        self._prices: List[Tuple[float, int]] = []
+        self.cursor: Tuple[str, int] = (EPOCH, 0)
+        self.ready = False
+        self.last_refresh = 0.0
+        self._lock = asyncio.Lock()
+        self._build_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    # ---------- building ----------
+    def upsert(self, product: Dict[str, Any]):
+        pid = int(product["id"])
+        self.remove(pid)
+        if product.get("status", "active") != "active" or product.get("deleted_at"):
+            return
+
+        weights: Dict[str, float] = defaultdict(float)
+        fields = {
+            "name": product.get("name"),
+            "category": product.get("category_name"),
+            "color": " ".join(product.get("available_colors") or []),
+            "description": product.get("description"),
+        }
+        for field, text in fields.items():
+            for gram in ngrams(text):
+                weights[gram] += FIELD_WEIGHTS[field]
+
+        for gram, weight in weights.items():
+            self._postings[gram][pid] = weight
+        self._doc_grams[pid] = tuple(weights)
+
+        stored = {k: product.get(k) for k in STORED_FIELDS}
+        stored["id"] = pid
+        stored["selling_price"] = float(product.get("selling_price") or 0)
+        self.products[pid] = stored
+        bisect.insort(self._prices, (stored["selling_price"], pid))
+
+    def remove(self, pid: int):
+        product = self.products.pop(pid, None)
+        if product is None:
+            return
+        for gram in self._doc_grams.pop(pid, ()):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.pop(pid, None)
+                if not postings:
+                    del self._postings[gram]
+        i = bisect.bisect_left(self._prices, (product["selling_price"], pid))
+        if i < len(self._prices) and self._prices[i][1] == pid:
+            del self._prices[i]
+
+    async def refresh(self) -> int:
+        """Pull products changed since the watermark; returns how many changed"""
+        changed: List[int] = []
+        try:
+            async with self._lock:
+                while True:
+                    updated_since, after_id = self.cursor
+                    data = await backend.get("/internal/products", params={
+                        "updated_since": updated_since,
+                        "after_id": after_id,
+                        "limit": CATALOG_PAGE_SIZE,
+                    })
+                    for product in data.get("products", []):
+                        self.upsert(product)
+                        changed.append(int(product["id"]))
+                        # Per page, so a failure on page N does not re-read pages 1..N-1
+                        self.cursor = (product["updated_at"], int(product["id"]))
+                    if not data.get("next_cursor"):
+                        break
+                self.last_refresh = time.monotonic()
+        finally:
+            if changed and self.ready:
+                search_cache.invalidate_products(changed)
+        return len(changed)
+
+    async def apply_changes(self, batch: ChangeBatch):
+        """catalog_changes subscriber: re-read exactly the products that changed"""
+        if not self.ready:
+            return
+        if batch.resync:
+            # Notifications may have been missed; catch up through the watermark
+            await self.refresh()
+            return
+        if not batch.product_ids:
+            return
+
+        for pid in batch.deleted_product_ids:
+            self.remove(pid)
+        ids = sorted(batch.product_ids - batch.deleted_product_ids)
+        async with self._lock:
+            for i in range(0, len(ids), CATALOG_BATCH_IDS):
+                chunk = ids[i:i + CATALOG_BATCH_IDS]
+                data = await backend.get("/internal/products", params={"ids": ",".join(map(str, chunk))})
+                for product in data.get("products", []):
+                    self.upsert(product)
+                # Inactive or deleted since the notification
+                for pid in data.get("missing_ids", []):
+                    self.remove(int(pid))
+        search_cache.invalidate_products(batch.product_ids)
+
+    def start(self) -> bool:
+        """Start building the index in the background (once per process). Needs a running loop."""
+        if self.ready or self._build_task is not None:
+            return False
+        loop = asyncio.get_running_loop()
+        # Fresh context: the build must not run under the deadline or trace of the action that started it
+        self._build_task = contextvars.Context().run(loop.create_task, self._build())
+        return True
+
+    async def ensure_ready(self) -> bool:
+        """True once the index is built. Never waits: the first call starts the build, callers
+        fall back to backend search until it is done."""
+        if not self.ready:
+            self.start()
+        return self.ready
+
+    async def _build(self):
+        started = time.perf_counter()
+        backoff = 1.0
+        while True:
+            try:
+                await self.refresh()
+                break
+            except BackendError as e:
+                logger.warning(
+                    "Catalog index build failed at %s (%d products so far), retrying in %.0fs: %s",
+                    self.cursor[0], len(self.products), backoff, e,
+                )
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, CATALOG_REFRESH_SECONDS)
+        self.ready = True
+        logger.info(
+            "Catalog index built: %d products, %d grams in %.0fms",
+            len(self.products), len(self._postings), (time.perf_counter() - started) * 1000,
+        )
+        self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+        catalog_changes.subscribe(self.apply_changes)
+        catalog_changes.start()
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+            try:
+                changed = await self.refresh()
+                if changed:
+                    logger.info("Catalog index refreshed: %d products changed", changed)
+            except BackendError as e:
+                logger.warning("Catalog index refresh failed: %s", e)
+
+    # ---------- querying ----------
+    def price_range(self, min_price: Optional[float] = None, max_price: Optional[float] = None) -> List[int]:
+        """Product ids with min_price <= selling_price <= max_price, cheapest first"""
+        lo = bisect.bisect_left(self._prices, (min_price, -1)) if min_price is not None else 0
+        hi = bisect.bisect_right(self._prices, (max_price, math.inf)) if max_price is not None else len(self._prices)
+        return [pid for _, pid in self._prices[lo:hi]]
+
+    def _matches_category(self, pid: int, category: str) -> bool:
+        """category may be a slug (ao-thun) or a display name (Áo Thun)"""
+        product = self.products[pid]
+        wanted = tokenize(category)
+        return wanted in (tokenize(product.get("category_slug")), tokenize(product.get("category_name")))
+
+    def search(
+        self,
+        query: Optional[str],
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        allowed: Optional[Set[int]] = None
+        if min_price is not None or max_price is not None:
+            allowed = set(self.price_range(min_price, max_price))
+
+        query_grams = ngrams(query)
+        if not query_grams:
+            pids: Iterable[int] = self.price_range(min_price, max_price) if allowed is not None else self.products
+            if category:
+                pids = [pid for pid in pids if self._matches_category(pid, category)]
+            return [dict(self.products[pid], relevance_score=1.0) for pid in list(pids)[:limit]]
+
+        total_docs = max(1, len(self.products))
+        scores: Dict[int, float] = defaultdict(float)
+        covered: Dict[int, float] = defaultdict(float)
+        query_weight = 0.0
+        for gram in query_grams:
+            postings = self._postings.get(gram)
+            idf = math.log(1 + total_docs / (len(postings) if postings else 1))
+            query_weight += idf
+            if not postings:
+                continue
+            for pid, weight in postings.items():
+                if allowed is not None and pid not in allowed:
+                    continue
+                scores[pid] += idf * weight
+                covered[pid] += idf
+
+        max_weight = sum(FIELD_WEIGHTS.values())
+        ranked = []
+        for pid, score in scores.items():
+            coverage = covered[pid] / query_weight
+            if coverage < MIN_COVERAGE:
+                continue
+            if category and not self._matches_category(pid, category):
+                continue
+            relevance = coverage * (score / (query_weight * max_weight)) ** 0.5
+            ranked.append((relevance, pid))
+        ranked.sort(reverse=True)
+
+        return [
+            dict(self.products[pid], relevance_score=round(min(1.0, relevance), 3))
+            for relevance, pid in ranked[:limit]
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "building": self._build_task is not None and not self.ready,
+            "products": len(self.products),
+            "grams": len(self._postings),
+            "postings": sum(len(p) for p in self._postings.values()),
+            "watermark": self.cursor[0],
+            "seconds_since_refresh": round(time.monotonic() - self.last_refresh, 1) if self.last_refresh else None,
+        }
+
+
+# Shared instance used by the search actions
+catalog_index = CatalogIndex()
@@ -0,0 +1,263 @@
+"""
+Per-sender customer context (identity, orders, cart) for the order and cart actions.
+
+ActionTrackOrder, ActionViewCart and ActionCancelOrder all need the same
+customer's orders or cart; without this every turn re-fetched them. The first
+authenticated turn (ChatService puts customer_id and user_jwt_token into the
+message metadata) that reaches any TracedAction starts loading orders and cart
+in the background, later turns read them from memory:
+
+    from actions.customer_context import customer_context
+
+    orders = await customer_context.orders(tracker)
+    cart = await customer_context.cart(tracker)
+
+    # after a mutating call
+    customer_context.invalidate(tracker.sender_id, "cart")
+
+Orders and cart expire after CUSTOMER_CONTEXT_TTL_SECONDS; if the refresh fails
+the expired copy is returned instead of an error. A fetch that was
+already running when invalidate() was called is not stored, so an action never
+re-caches data from before its own mutation.
+
+The sender id is the browser's visitor id, so one sender can be several
+customers over time. A context belongs to the customer_id / user_jwt_token pair
+it was created for: any change (login, logout, another account) starts a new
+one, and a turn without either (guest) drops the sender's context. The customer
+is only ever taken from a verified token, never from metadata alone.
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from rasa_sdk import Tracker
+
+from actions.http_client import backend, BackendError
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER_CONTEXT_TTL_SECONDS = float(os.getenv("CUSTOMER_CONTEXT_TTL_SECONDS", "60"))
+CUSTOMER_IDENTITY_TTL_SECONDS = float(os.getenv("CUSTOMER_IDENTITY_TTL_SECONDS", "900"))
+CUSTOMER_CONTEXT_MAX_SENDERS = int(os.getenv("CUSTOMER_CONTEXT_MAX_SENDERS", "5000"))
+
+PARTS = ("orders", "cart")
+
+
+class _SenderContext:
+    __slots__ = ("key", "customer_id", "email", "identity_expires", "parts", "inflight", "generation")
+
+    def __init__(self, key: Tuple[Optional[int], Optional[str]]):
+        # (customer_id from metadata, jwt); customer_id below is the verified one
+        self.key = key
+        self.customer_id: Optional[int] = None
+        self.email: Optional[str] = None
+        self.identity_expires = 0.0
+        self.parts: Dict[str, Tuple[float, Any]] = {}
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.generation = 0
+
+
+def _metadata(tracker: Tracker) -> Dict[str, Any]:
+    return tracker.latest_message.get('metadata') or {}
+
+
+class CustomerContextCache:
+    def __init__(
+        self,
+        ttl: float = CUSTOMER_CONTEXT_TTL_SECONDS,
+        identity_ttl: float = CUSTOMER_IDENTITY_TTL_SECONDS,
+        max_senders: int = CUSTOMER_CONTEXT_MAX_SENDERS,
+    ):
+        self.ttl = ttl
+        self.identity_ttl = identity_ttl
+        self.max_senders = max_senders
+        self._senders: "OrderedDict[str, _SenderContext]" = OrderedDict()
+        self._prefetches: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_served = 0
+
+    def _context(self, tracker: Tracker) -> _SenderContext:
+        metadata = _metadata(tracker)
+        raw_id = metadata.get('customer_id')
+        key = (int(raw_id) if raw_id else None, metadata.get('user_jwt_token') or None)
+        if key == (None, None):
+            # Guest turn (e.g. after logout): forget the previous customer, cache nothing
+            self._senders.pop(tracker.sender_id, None)
+            return _SenderContext(key)
+        ctx = self._senders.get(tracker.sender_id)
+        if ctx is None or ctx.key != key:
+            ctx = _SenderContext(key)
+            self._senders[tracker.sender_id] = ctx
+            while len(self._senders) > self.max_senders:
+                self._senders.popitem(last=False)
+        self._senders.move_to_end(tracker.sender_id)
+        return ctx
+
+    # ---------- identity ----------
+    async def identity(self, tracker: Tracker) -> Dict[str, Any]:
+        """{customer_id, email} of the logged-in customer, {} for guests"""
+        return await self._identity(self._context(tracker))
+
+    async def _identity(self, ctx: _SenderContext) -> Dict[str, Any]:
+        jwt_token = ctx.key[1]
+        if not jwt_token:
+            return {}
+        if ctx.customer_id and ctx.identity_expires > time.monotonic():
+            return {"customer_id": ctx.customer_id, "email": ctx.email}
+
+        pending = ctx.inflight.get("identity")
+        if pending is None:
+            # Orders and cart load concurrently; verify the token only once
+            pending = asyncio.ensure_future(
+                backend.post("/api/chatbot/auth/verify", json={"jwt_token": jwt_token})
+            )
+            ctx.inflight["identity"] = pending
+        try:
+            verified = await asyncio.shield(pending)
+        finally:
+            if ctx.inflight.get("identity") is pending:
+                del ctx.inflight["identity"]
+        data = verified.get('data') or {}
+        if not data.get('customer_id'):
+            return {}
+        if ctx.key[0] is not None and int(data['customer_id']) != ctx.key[0]:
+            logger.warning("Metadata customer_id %s does not match the verified token", ctx.key[0])
+        ctx.customer_id = int(data['customer_id'])
+        ctx.email = data.get('email')
+        ctx.identity_expires = time.monotonic() + self.identity_ttl
+        return {"customer_id": ctx.customer_id, "email": ctx.email}
+
+    # ---------- parts ----------
+    async def _fetch_orders(self, ctx: _SenderContext) -> list:
+        email = (await self._identity(ctx)).get('email')
+        if not email:
+            return []
+        data = await backend.get("/internal/customers/orders", params={"email": email})
+        return data.get("orders", [])
+
+    async def _fetch_cart(self, ctx: _SenderContext) -> Dict[str, Any]:
+        customer_id = (await self._identity(ctx)).get('customer_id')
+        if not customer_id:
+            return {}
+        data = await backend.get(f"/api/chatbot/cart/{customer_id}")
+        return data.get('data') or {}
+
+    def _fetcher(self, part: str) -> Callable[[_SenderContext], Awaitable[Any]]:
+        return {"orders": self._fetch_orders, "cart": self._fetch_cart}[part]
+
+    async def _load(self, ctx: _SenderContext, part: str) -> Any:
+        pending = ctx.inflight.get(part)
+        while pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The caller that was loading got cancelled, not us: load ourselves
+                pending = ctx.inflight.get(part)
+
+        future = asyncio.get_running_loop().create_future()
+        ctx.inflight[part] = future
+        generation = ctx.generation
+        try:
+            value = await self._fetcher(part)(ctx)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            if ctx.generation == generation:
+                ctx.parts[part] = (time.monotonic() + self.ttl, value)
+            future.set_result(value)
+            return value
+        finally:
+            if ctx.inflight.get(part) is future:
+                del ctx.inflight[part]
+
+    async def get(self, tracker: Tracker, part: str) -> Any:
+        ctx = self._context(tracker)
+        cached = ctx.parts.get(part)
+        if cached and cached[0] > time.monotonic():
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        # First miss also starts loading the other parts for the next turns
+        self._warm(ctx)
+        try:
+            return await self._load(ctx, part)
+        except BackendError:
+            if cached is None:
+                raise
+            # Backend down or circuit open: expired (but never invalidated) data beats an error
+            self.stale_served += 1
+            return cached[1]
+
+    async def orders(self, tracker: Tracker) -> list:
+        return await self.get(tracker, "orders")
+
+    async def cart(self, tracker: Tracker) -> Dict[str, Any]:
+        return await self.get(tracker, "cart")
+
+    def warm(self, tracker: Tracker):
+        """Start loading missing parts in the background for an authenticated sender.
+        Called by actions.tracing at the start of every action run."""
+        self._warm(self._context(tracker))
+
+    def _warm(self, ctx: _SenderContext):
+        if not ctx.key[1]:
+            return
+        now = time.monotonic()
+        missing = [
+            part for part in PARTS
+            if part not in ctx.inflight and not (part in ctx.parts and ctx.parts[part][0] > now)
+        ]
+        if not missing:
+            return
+
+        async def load_missing():
+            results = await asyncio.gather(*(self._load(ctx, part) for part in missing), return_exceptions=True)
+            for failure in results:
+                if isinstance(failure, BackendError):
+                    logger.warning("Customer context prefetch failed: %s", failure)
+
+        # Fresh context: prefetch calls must not count towards the current action run
+        loop = asyncio.get_running_loop()
+        task = contextvars.Context().run(loop.create_task, load_missing())
+        # The loop only keeps a weak reference to tasks
+        self._prefetches.add(task)
+        task.add_done_callback(self._prefetches.discard)
+
+    def invalidate(self, sender_id: str, *parts: str):
+        """Drop cached parts (all when none given) after a mutating call"""
+        ctx = self._senders.get(sender_id)
+        if ctx is None:
+            return
+        ctx.generation += 1
+        for part in parts or PARTS:
+            if ctx.parts.pop(part, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "senders": len(self._senders),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "stale_served": self.stale_served,
+        }
+
+
+# Shared instance used by the order and cart actions
+customer_context = CustomerContextCache()
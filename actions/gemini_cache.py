@@ -0,0 +1,292 @@
+"""
+Response cache in front of ActionAskGemini (/api/chatbot/gemini/ask).
+
+Most free-form questions are the same handful of shipping / returns / sizing
+questions worded slightly differently. Two tiers:
+
+1. Exact: normalized text (unaccented, lowercase, punctuation stripped)
+2. Approximate: MinHash signatures over word uni/bigrams with LSH banding;
+   a cached answer is reused when the estimated Jaccard similarity of the
+   questions is >= GEMINI_CACHE_SIMILARITY and both carry the same identifier
+   tokens (anything with a digit, upper-case codes): "đơn ORD001 ở đâu" and
+   "đơn ORD999 ở đâu" are 0.7 similar but must never share an answer
+
+Concurrent misses for the same question share one LLM call. Entries expire after a TTL and the least recently used entry is evicted past
+max_entries. Fallback answers (error: true) are never cached.
+
+The LLM call is injected, so the cache runs against a local stub:
+
+    python -m actions.gemini_cache --demo
+"""
+
+import os
+import re
+import sys
+import time
+import asyncio
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+import numpy as np
+
+from actions.http_client import backend
+from actions.search_cache import normalize_text
+
+GEMINI_CACHE_TTL_SECONDS = float(os.getenv("GEMINI_CACHE_TTL_SECONDS", str(24 * 3600)))
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "5000"))
+GEMINI_CACHE_SIMILARITY = float(os.getenv("GEMINI_CACHE_SIMILARITY", "0.6"))
+
+NUM_PERM = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: ~50% candidate chance at Jaccard 0.42, ~98% at 0.8
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_rng = np.random.RandomState(1204)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CODE = re.compile(r"\b[A-Z][A-Z0-9_-]{2,}\b")
+
+AskFn = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(_WORD.findall(normalize_text(question)))
+
+
+def shingles(normalized: str) -> Set[str]:
+    words = normalized.split()
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def identifiers(question: str, normalized: str) -> FrozenSet[str]:
+    """Tokens an answer is specific to: order numbers, sizes, prices, promo codes"""
+    codes = {normalize_text(code) for code in _CODE.findall(question)}
+    return frozenset(codes | {word for word in normalized.split() if any(c.isdigit() for c in word)})
+
+
+def minhash(tokens: Set[str]) -> np.ndarray:
+    """MinHash signature (uint64[NUM_PERM]) of a token set, vectorized over all permutations"""
+    if not tokens:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint64, count=len(tokens))
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+def _bands(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+    rows = NUM_PERM // LSH_BANDS
+    return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+
+class _Entry:
+    __slots__ = ("question", "response", "signature", "identifiers", "expires_at")
+
+    def __init__(
+        self,
+        question: str,
+        response: Dict[str, Any],
+        signature: np.ndarray,
+        identifiers: FrozenSet[str],
+        expires_at: float,
+    ):
+        self.question = question
+        self.response = response
+        self.signature = signature
+        self.identifiers = identifiers
+        self.expires_at = expires_at
+
+
+class GeminiResponseCache:
+    def __init__(
+        self,
+        ttl: float = GEMINI_CACHE_TTL_SECONDS,
+        max_entries: int = GEMINI_CACHE_MAX_ENTRIES,
+        similarity: float = GEMINI_CACHE_SIMILARITY,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = defaultdict(set)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.exact_hits = 0
+        self.approx_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.identifier_mismatches = 0
+
+    # ---------- lookup ----------
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        key = normalize_question(question)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return dict(entry.response, cache="exact")
+
+        signature = minhash(shingles(key))
+        wanted = identifiers(question, key)
+        best_key, best_score = None, 0.0
+        for candidate in self._candidates(signature):
+            cached = self._entries[candidate]
+            if cached.expires_at <= now:
+                continue
+            if cached.identifiers != wanted:
+                self.identifier_mismatches += 1
+                continue
+            score = float(np.mean(cached.signature == signature))
+            if score > best_score:
+                best_key, best_score = candidate, score
+
+        if best_key is not None and best_score >= self.similarity:
+            self._entries.move_to_end(best_key)
+            self.approx_hits += 1
+            return dict(self._entries[best_key].response, cache="approximate", similarity=round(best_score, 3))
+
+        self.misses += 1
+        return None
+
+    def _candidates(self, signature: np.ndarray) -> Set[str]:
+        found: Set[str] = set()
+        for band in _bands(signature):
+            found |= self._buckets.get(band, set())
+        return found
+
+    # ---------- storing ----------
+    def store(self, question: str, response: Dict[str, Any]):
+        if response.get("error"):
+            return
+        key = normalize_question(question)
+        if not key:
+            return
+        if key in self._entries:
+            self._remove(key)
+        signature = minhash(shingles(key))
+        self._entries[key] = _Entry(
+            question, response, signature, identifiers(question, key), time.monotonic() + self.ttl
+        )
+        for band in _bands(signature):
+            self._buckets[band].add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        for band in _bands(entry.signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def invalidate(self):
+        self._entries.clear()
+        self._buckets.clear()
+
+    async def get_or_ask(self, question: str, ask: AskFn) -> Dict[str, Any]:
+        """Cached answer, or one ask() shared by every concurrent caller with the same question"""
+        cached = self.lookup(question)
+        if cached is not None:
+            return cached
+
+        key = normalize_question(question)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The caller that was asking got cancelled, not us: ask ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await ask(question)
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            self.store(question, response)
+            future.set_result(response)
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.approx_hits + self.misses
+        hits = self.exact_hits + self.approx_hits
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "approx_hits": self.approx_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "identifier_mismatches": self.identifier_mismatches,
+        }
+
+
+async def ask_backend(question: str) -> Dict[str, Any]:
+    data = await backend.post("/api/chatbot/gemini/ask", json={"question": question})
+    return data.get("data") or {}
+
+
+# Shared instance used by ActionAskGemini
+gemini_cache = GeminiResponseCache()
+
+
+async def ask_gemini(question: str) -> Dict[str, Any]:
+    return await gemini_cache.get_or_ask(question, ask_backend)
+
+
+# ====================================
+# Demo with a local stub instead of the LLM
+# ====================================
+DEMO_QUESTIONS = [
+    "Phí ship bao nhiêu?",
+    "phi ship bao nhieu",
+    "Phí ship là bao nhiêu vậy shop?",
+    "Shop có cho đổi trả không?",
+    "shop có cho đổi trả hàng không ạ",
+    "Mình cao 1m70 nặng 65kg mặc size gì?",
+    "Mình cao 1m70 nặng 65kg thì mặc size gì",
+    "Áo thun trắng phối với gì đẹp?",
+    "Đơn ORD001 của mình giao tới đâu rồi?",
+    "Đơn ORD999 của mình giao tới đâu rồi?",
+]
+
+
+async def _demo():
+    calls = []
+
+    async def stub_llm(question: str) -> Dict[str, Any]:
+        calls.append(question)
+        await asyncio.sleep(0.5)  # stand-in for Gemini latency
+        return {"question": question, "answer": f"stub answer #{len(calls)}", "source": "Stub"}
+
+    cache = GeminiResponseCache()
+    for question in DEMO_QUESTIONS:
+        started = time.perf_counter()
+        response = await cache.get_or_ask(question, stub_llm)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"{elapsed_ms:8.1f}ms  {response.get('cache', 'llm'):<12} {response['answer']:<16} {question}")
+    print(f"LLM calls: {len(calls)}/{len(DEMO_QUESTIONS)}  stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    if "--demo" in sys.argv:
+        asyncio.run(_demo())
+    else:
+        print("usage: python -m actions.gemini_cache --demo")
@@ -0,0 +1,310 @@
+"""
+Shared async HTTP client for calling the NestJS backend from Rasa actions.
+
+- One keep-alive connection pool for /internal/* and /api/chatbot/*
+- Per-endpoint timeouts (Gemini is slow, product lookups are not)
+- Latency metrics per endpoint, see BackendClient.metrics()
+- Trace id of the running action forwarded as X-Trace-Id (actions.tracing)
+- gather_limited() for per-item fan-out with a bound on in-flight requests
+- Per-endpoint circuit breakers and hedged GETs (actions.resilience); every
+  timeout is capped by what is left of the running action's deadline
+
+Usage inside an action:
+
+    from actions.http_client import backend
+
+    data = await backend.get("/internal/products", params={"search": "áo thun"})
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from actions.resilience import CLOSED, CircuitBreaker, HedgePolicy
+from actions.tracing import TRACE_HEADER, current_trace_id, record_backend_call, remaining_budget
+
+logger = logging.getLogger(__name__)
+
+# ====================================
+# Config
+# ====================================
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:3001").rstrip("/")
+INTERNAL_API_KEY = os.getenv("INTERNAL_API_KEY", "")
+
+POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "50"))
+# Max concurrent requests from one action's fan-out, so a 20-item compare
+# cannot take the whole pool from other conversations
+FANOUT_LIMIT = int(os.getenv("BACKEND_FANOUT_LIMIT", "8"))
+KEEPALIVE_SECONDS = 30
+
+# Longest matching prefix wins. Values are total seconds per request.
+ENDPOINT_TIMEOUTS = {
+    "/internal/products": 3.0,
+    "/internal/variants": 3.0,
+    "/internal/customers/orders": 4.0,
+    "/internal/promotions": 3.0,
+    "/internal/faq": 3.0,
+    "/internal/pages": 3.0,
+    "/api/chatbot/cart": 3.0,
+    "/api/chatbot/orders": 5.0,
+    "/api/chatbot/size": 2.0,
+    "/api/chatbot/auth": 2.0,
+    "/api/chatbot/products": 3.0,
+    "/api/chatbot/gemini": 15.0,
+}
+DEFAULT_TIMEOUT = 5.0
+# Don't start a request with less than this left of the action's deadline
+MIN_REQUEST_SECONDS = 0.05
+
+# Keep this many recent samples per endpoint for percentiles
+LATENCY_WINDOW = 1000
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class BackendError(Exception):
+    """Backend call failed (network error, timeout, non-2xx or non-JSON response)"""
+
+    def __init__(self, endpoint: str, message: str, status: Optional[int] = None):
+        super().__init__(f"{endpoint}: {message}")
+        self.endpoint = endpoint
+        self.status = status
+
+
+def endpoint_label(method: str, path: str) -> str:
+    """Metric label for a request, with numeric ids collapsed: GET /internal/products/:id"""
+    return f"{method} {_ID_SEGMENT.sub('/:id', path)}"
+
+
+def timeout_for(path: str) -> float:
+    best = None
+    for prefix in ENDPOINT_TIMEOUTS:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return ENDPOINT_TIMEOUTS[best] if best else DEFAULT_TIMEOUT
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+class LatencyStats:
+    """Per-endpoint call counters and a sliding window of latencies (ms)"""
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.samples = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def record(self, endpoint: str, elapsed_ms: float, ok: bool):
+        self.calls[endpoint] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+        self.samples[endpoint].append(elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for endpoint, window in self.samples.items():
+            ordered = sorted(window)
+            result[endpoint] = {
+                "calls": self.calls[endpoint],
+                "errors": self.errors[endpoint],
+                "p50_ms": round(_percentile(ordered, 50), 1),
+                "p95_ms": round(_percentile(ordered, 95), 1),
+                "p99_ms": round(_percentile(ordered, 99), 1),
+                "max_ms": round(ordered[-1], 1) if ordered else 0.0,
+            }
+        return result
+
+
+class BackendClient:
+    """Pooled aiohttp client shared by every action in the process"""
+
+    def __init__(self, base_url: str = BACKEND_URL, api_key: str = INTERNAL_API_KEY, pool_size: int = POOL_SIZE):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.stats = LatencyStats()
+        self.breakers: Dict[str, CircuitBreaker] = defaultdict(CircuitBreaker)
+        self.hedging = HedgePolicy()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the action server's running loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                base_url=self.base_url,
+                connector=connector,
+                headers={
+                    # /internal/* checks x-api-key, /api/chatbot/* checks X-Internal-Api-Key
+                    "x-api-key": self.api_key,
+                    "X-Internal-Api-Key": self.api_key,
+                },
+            )
+        return self._session
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Any:
+        endpoint = endpoint_label(method, path)
+        budget = timeout or timeout_for(path)
+        remaining = remaining_budget()
+        if remaining is not None:
+            if remaining < MIN_REQUEST_SECONDS:
+                raise BackendError(endpoint, "action deadline exceeded")
+            budget = min(budget, remaining)
+
+        breaker = self.breakers[endpoint]
+        if not breaker.allow():
+            raise BackendError(endpoint, "circuit open")
+
+        if params:
+            params = {k: str(v).lower() if isinstance(v, bool) else v for k, v in params.items() if v is not None}
+        trace_id = current_trace_id()
+        if trace_id:
+            headers = {TRACE_HEADER: trace_id, **(headers or {})}
+
+        def attempt():
+            return self._attempt(endpoint, method, path, params, json, budget, headers)
+
+        try:
+            hedge_after = self.hedging.delay(self.stats.samples[endpoint], budget) if method == "GET" else None
+            if hedge_after is None:
+                data = await attempt()
+            else:
+                data = await self._hedged(attempt, hedge_after)
+        except BackendError as e:
+            # 4xx: the backend answered, it is not the backend that is unhealthy
+            breaker.record(e.status is not None and e.status < 500)
+            raise
+        except BaseException:
+            # Deadline / hedge cancellation or a bug: must not leave a half-open probe in flight
+            breaker.release()
+            raise
+        breaker.record(True)
+        return data
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[Any]], hedge_after: float) -> Any:
+        """Start a second copy of the request if the first is slower than hedge_after; first success wins"""
+        pending = {asyncio.ensure_future(attempt())}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return done.pop().result()
+
+            self.hedging.hedges += 1
+            hedge = asyncio.ensure_future(attempt())
+            pending.add(hedge)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedging.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _attempt(
+        self,
+        endpoint: str,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]],
+        json: Optional[Dict[str, Any]],
+        budget: float,
+        headers: Optional[Dict[str, str]],
+    ) -> Any:
+        client_timeout = aiohttp.ClientTimeout(total=budget)
+        start = time.perf_counter()
+        ok = False
+        try:
+            async with self._get_session().request(
+                method, path, params=params, json=json, timeout=client_timeout, headers=headers
+            ) as response:
+                if response.status >= 400:
+                    body = await response.text()
+                    raise BackendError(endpoint, f"HTTP {response.status}: {body[:200]}", response.status)
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError as e:
+                    # 2xx with an HTML error page or an empty body (proxy, crashed handler)
+                    raise BackendError(endpoint, f"invalid JSON response (HTTP {response.status}): {e}")
+                ok = True
+                return data
+        except asyncio.TimeoutError:
+            raise BackendError(endpoint, f"timed out after {budget:.2f}s")
+        except aiohttp.ClientError as e:
+            raise BackendError(endpoint, f"{type(e).__name__}: {e}")
+        except asyncio.CancelledError:
+            # Losing copy of a hedged request: not a backend failure
+            start = None
+            raise
+        finally:
+            if start is not None:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.stats.record(endpoint, elapsed_ms, ok)
+                record_backend_call(endpoint, elapsed_ms, ok)
+                logger.debug("%s %.1fms ok=%s", endpoint, elapsed_ms, ok)
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        return await self.request("GET", path, params=params, **kwargs)
+
+    async def post(self, path: str, json: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        return await self.request("POST", path, json=json, **kwargs)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        result = self.stats.snapshot()
+        for endpoint, breaker in self.breakers.items():
+            result.setdefault(endpoint, {})["breaker"] = breaker.snapshot()
+        return result
+
+    def resilience_metrics(self) -> Dict[str, Any]:
+        return {
+            "hedging": self.hedging.snapshot(),
+            "open_circuits": [e for e, b in self.breakers.items() if b.state != CLOSED],
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+async def gather_limited(aws: Iterable[Awaitable[Any]], limit: int = FANOUT_LIMIT) -> List[Any]:
+    """asyncio.gather with at most `limit` awaitables running; results keep input order.
+    Failures are returned as exception objects instead of cancelling the rest."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=True)
+
+
+# Shared instance, import this from actions
+backend = BackendClient()
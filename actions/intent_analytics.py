@@ -0,0 +1,288 @@
+"""
+Chat intent analytics job: chat_messages -> chat_intent_daily rollups.
+
+    python -m actions.intent_analytics            # fold in messages since the last run
+    python -m actions.intent_analytics --rebuild  # truncate rollups and start from id 0
+
+Streams chat_messages with a server-side cursor from the id watermark in
+analytics_watermarks and computes, per (day, intent), in numpy batches:
+
+- turns          bot replies that directly follow a customer message
+- fallbacks      turns whose intent is a fallback intent
+- handoffs       first admin message of a session, credited to the session's last turn intent
+- response time  customer message -> first bot reply (sum, max, histogram)
+
+Tables: migrations/010_create_chat_intent_rollups.sql. Rollup upserts and the
+new watermark commit in the same transaction per batch, so a crashed run is
+simply re-run. Messages younger than SAFETY_LAG_SECONDS are left for the next
+run so rows from transactions that commit late are not skipped.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "chat_intent_daily"
+STREAM_BATCH_SIZE = 50000
+SAFETY_LAG_SECONDS = 120
+TZ_OFFSET_SECONDS = 7 * 3600  # days are Vietnam time
+# Sessions idle for longer than this are dropped from the carry state
+CARRY_MAX_IDLE_SECONDS = 2 * 86400
+
+FALLBACK_INTENTS = {"nlu_fallback", "out_of_scope"}
+UNKNOWN_INTENT = "unknown"
+RESPONSE_BUCKETS_MS = np.array([250, 500, 1000, 2000, 5000, 10000], dtype=np.float64)
+
+# chat_intent_daily counter columns, followed by the response time histogram
+COLUMNS = ("turns", "bot_messages", "fallbacks", "handoffs", "response_ms_sum", "response_ms_max")
+
+CUSTOMER, BOT, ADMIN = 0, 1, 2
+SENDER_CODES = {"customer": CUSTOMER, "bot": BOT, "admin": ADMIN}
+NONE = -1
+
+
+# ====================================
+# Streaming
+# ====================================
+def stream_messages(conn, after_id: int, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Dict[str, np.ndarray]]:
+    cur = conn.cursor(name="intent_analytics_messages")
+    cur.itersize = batch_size
+    cur.execute("""
+        SELECT id, session_id, sender, intent, EXTRACT(EPOCH FROM created_at)
+        FROM chat_messages
+        WHERE id > %s AND session_id IS NOT NULL
+          AND created_at < now() - make_interval(secs => %s)
+        ORDER BY id
+    """, (after_id, SAFETY_LAG_SECONDS))
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        n = len(rows)
+        yield {
+            "id": np.fromiter((r[0] for r in rows), dtype=np.int64, count=n),
+            "session": np.fromiter((r[1] for r in rows), dtype=np.int64, count=n),
+            "sender": np.fromiter((SENDER_CODES.get(r[2], NONE) for r in rows), dtype=np.int8, count=n),
+            "intent": np.array([r[3] or UNKNOWN_INTENT for r in rows], dtype=object),
+            "ts": np.fromiter((float(r[4]) for r in rows), dtype=np.float64, count=n),
+        }
+    cur.close()
+
+
+def _ffill_in_segments(values: np.ndarray, seg_first: np.ndarray) -> np.ndarray:
+    """Index of the last row <= i (within i's segment) where values is set; -1 if none"""
+    idx = np.where(values, np.arange(len(values)), -1)
+    last = np.maximum.accumulate(idx)
+    return np.where(last >= seg_first, last, -1)
+
+
+class IntentRollup:
+    """Per (day, intent) aggregates plus the per-session state that spans batches"""
+
+    def __init__(self, carry: Dict[str, list] = None):
+        # session_id -> [last_sender, last_customer_ts, last_turn_intent, handed_off, last_ts]
+        self.carry: Dict[int, list] = {int(k): v for k, v in (carry or {}).items()}
+        self.rows: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def add_batch(self, batch: Dict[str, np.ndarray]):
+        order = np.lexsort((batch["id"], batch["session"]))
+        session = batch["session"][order]
+        sender = batch["sender"][order]
+        intent = batch["intent"][order]
+        ts = batch["ts"][order]
+        n = len(order)
+        rows = np.arange(n)
+
+        seg_start = np.ones(n, dtype=bool)
+        seg_start[1:] = session[1:] != session[:-1]
+        seg_first = np.maximum.accumulate(np.where(seg_start, rows, 0))
+
+        # State carried in from earlier batches / runs, per row of its session
+        first_rows = rows[seg_start]
+        carried = [self.carry.get(int(s)) for s in session[first_rows]]
+        seg_index = np.cumsum(seg_start) - 1
+        c_sender = np.array([c[0] if c else NONE for c in carried], dtype=np.int8)[seg_index]
+        c_cust_ts = np.array([c[1] if c and c[1] is not None else np.nan for c in carried])[seg_index]
+        c_intent = np.array([c[2] if c and c[2] else UNKNOWN_INTENT for c in carried], dtype=object)[seg_index]
+        c_handed = np.array([bool(c and c[3]) for c in carried])[seg_index]
+
+        prev_sender = np.empty(n, dtype=np.int8)
+        prev_sender[1:] = sender[:-1]
+        prev_sender[seg_start] = c_sender[seg_start]
+
+        is_customer = sender == CUSTOMER
+        is_admin = sender == ADMIN
+        turn = (sender == BOT) & (prev_sender == CUSTOMER)
+
+        # Response time: turn ts - last customer message ts in the session
+        last_cust = _ffill_in_segments(is_customer, seg_first)
+        cust_ts = np.where(last_cust >= 0, ts[np.maximum(last_cust, 0)], c_cust_ts)
+        response_ms = np.where(turn, (ts - cust_ts) * 1000, np.nan)
+        timed = turn & ~np.isnan(response_ms)
+
+        # Handoff: first admin message of a session, credited to the last turn intent before it
+        admin_upto = _ffill_in_segments(is_admin, seg_first)
+        admin_before = np.zeros(n, dtype=bool)
+        admin_before[1:] = (admin_upto[:-1] >= 0) & ~seg_start[1:]
+        first_admin = is_admin & ~admin_before & ~c_handed
+        last_turn = _ffill_in_segments(turn, seg_first)
+        turn_intent = np.where(last_turn >= 0, intent[np.maximum(last_turn, 0)], c_intent)
+
+        day = ((ts + TZ_OFFSET_SECONDS) // 86400).astype("int64").astype("datetime64[D]").astype(str)
+        is_fallback = np.isin(intent, list(FALLBACK_INTENTS))
+        bucket = np.searchsorted(RESPONSE_BUCKETS_MS, np.nan_to_num(response_ms), side="left")
+
+        bot = sender == BOT
+        self._accumulate(day[bot], intent[bot], bot_messages=1)
+        self._accumulate(day[turn], intent[turn], turns=1, fallbacks=is_fallback[turn])
+        self._accumulate(day[timed], intent[timed], response_ms=response_ms[timed], bucket=bucket[timed])
+        self._accumulate(day[first_admin], turn_intent[first_admin], handoffs=1)
+
+        # Carry out: state at the last row of every session
+        seg_last = np.append(first_rows[1:] - 1, n - 1)
+        handed = c_handed | (admin_upto >= 0)
+        for i in seg_last:
+            self.carry[int(session[i])] = [
+                int(sender[i]),
+                None if np.isnan(cust_ts[i]) else float(cust_ts[i]),
+                str(turn_intent[i]),
+                bool(handed[i]),
+                float(ts[i]),
+            ]
+
+    def _accumulate(self, day: np.ndarray, intent: np.ndarray, response_ms=None, bucket=None, **counts):
+        """Add per-row counts (scalar or array) to the (day, intent) rows; columns as in COLUMNS"""
+        if len(day) == 0:
+            return
+        keys = np.char.add(np.char.add(day.astype(str), "|"), intent.astype(str))
+        unique, inverse = np.unique(keys, return_inverse=True)
+        totals = np.zeros((len(unique), len(COLUMNS) + len(RESPONSE_BUCKETS_MS) + 1), dtype=np.int64)
+        for name, weight in counts.items():
+            weights = np.broadcast_to(np.asarray(weight, dtype=np.float64), inverse.shape)
+            totals[:, COLUMNS.index(name)] = np.bincount(inverse, weights=weights, minlength=len(unique))
+        if response_ms is not None:
+            totals[:, COLUMNS.index("response_ms_sum")] = np.bincount(inverse, weights=response_ms, minlength=len(unique)).round()
+            maxes = np.zeros(len(unique))
+            np.maximum.at(maxes, inverse, response_ms)
+            totals[:, COLUMNS.index("response_ms_max")] = maxes.round()
+            np.add.at(totals, (inverse, len(COLUMNS) + bucket), 1)
+
+        max_col = COLUMNS.index("response_ms_max")
+        for key, values in zip(unique, totals):
+            day_str, intent_str = key.split("|", 1)
+            current = self.rows.get((day_str, intent_str))
+            if current is None:
+                self.rows[(day_str, intent_str)] = values
+            else:
+                peak = max(current[max_col], values[max_col])
+                current += values
+                current[max_col] = peak
+
+    def prune_carry(self, now: float):
+        self.carry = {s: c for s, c in self.carry.items() if now - c[4] < CARRY_MAX_IDLE_SECONDS}
+
+    def drain(self) -> List[tuple]:
+        rows = [
+            (day, intent, *(int(x) for x in v[:len(COLUMNS)]), [int(x) for x in v[len(COLUMNS):]])
+            for (day, intent), v in self.rows.items()
+        ]
+        self.rows = {}
+        return rows
+
+
+# ====================================
+# Persistence
+# ====================================
+UPSERT_SQL = """
+    INSERT INTO chat_intent_daily
+        (day, intent, turns, bot_messages, fallbacks, handoffs, response_ms_sum, response_ms_max, response_ms_hist)
+    VALUES %s
+    ON CONFLICT (day, intent) DO UPDATE SET
+        turns = chat_intent_daily.turns + EXCLUDED.turns,
+        bot_messages = chat_intent_daily.bot_messages + EXCLUDED.bot_messages,
+        fallbacks = chat_intent_daily.fallbacks + EXCLUDED.fallbacks,
+        handoffs = chat_intent_daily.handoffs + EXCLUDED.handoffs,
+        response_ms_sum = chat_intent_daily.response_ms_sum + EXCLUDED.response_ms_sum,
+        response_ms_max = GREATEST(chat_intent_daily.response_ms_max, EXCLUDED.response_ms_max),
+        response_ms_hist = ARRAY(
+            SELECT a + b FROM unnest(chat_intent_daily.response_ms_hist, EXCLUDED.response_ms_hist) AS h(a, b)
+        )
+"""
+
+
+def load_watermark(conn) -> Tuple[int, dict]:
+    with conn.cursor() as cur:
+        cur.execute("SELECT last_id, state FROM analytics_watermarks WHERE job = %s", (JOB_NAME,))
+        row = cur.fetchone()
+    return (int(row[0]), row[1] or {}) if row else (0, {})
+
+
+def commit_batch(conn, rollup: IntentRollup, last_id: int):
+    from psycopg2.extras import execute_values
+
+    with conn.cursor() as cur:
+        rows = rollup.drain()
+        if rows:
+            execute_values(cur, UPSERT_SQL, rows)
+        cur.execute("""
+            INSERT INTO analytics_watermarks (job, last_id, state, updated_at)
+            VALUES (%s, %s, %s, now())
+            ON CONFLICT (job) DO UPDATE SET last_id = EXCLUDED.last_id, state = EXCLUDED.state, updated_at = now()
+        """, (JOB_NAME, last_id, json.dumps({"carry": rollup.carry})))
+    conn.commit()
+
+
+def run_job(rebuild: bool = False, database_url: str = None) -> Dict[str, int]:
+    import psycopg2
+
+    started = time.perf_counter()
+    url = database_url or os.environ["DATABASE_URL"]
+    reader = psycopg2.connect(url)
+    writer = psycopg2.connect(url)
+    try:
+        if rebuild:
+            with writer.cursor() as cur:
+                cur.execute("TRUNCATE chat_intent_daily")
+                cur.execute("DELETE FROM analytics_watermarks WHERE job = %s", (JOB_NAME,))
+            writer.commit()
+        last_id, state = load_watermark(writer)
+        rollup = IntentRollup(state.get("carry"))
+
+        messages = 0
+        for batch in stream_messages(reader, last_id):
+            rollup.add_batch(batch)
+            last_id = int(batch["id"].max())
+            messages += len(batch["id"])
+            rollup.prune_carry(float(batch["ts"].max()))
+            commit_batch(writer, rollup, last_id)
+            logger.info("... %d messages (watermark id %d)", messages, last_id)
+    finally:
+        reader.close()
+        writer.close()
+
+    logger.info("%d messages folded into %s in %.1fs", messages, JOB_NAME, time.perf_counter() - started)
+    return {"messages": messages, "watermark": last_id}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%H:%M:%S")
+    parser = argparse.ArgumentParser(description="Roll up chat_messages into chat_intent_daily")
+    parser.add_argument("--rebuild", action="store_true", help="truncate rollups and reprocess every message")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        logger.error("DATABASE_URL is not set")
+        sys.exit(1)
+    run_job(args.rebuild)
+
+
+if __name__ == "__main__":
+    main()
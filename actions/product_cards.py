@@ -0,0 +1,115 @@
+"""
+Compact product_list payloads for chatbot messages.
+
+Every custom product_list goes Rasa -> ChatService -> chat_messages -> frontend,
+so actions send product cards (id, name, price, thumbnail, slug) instead of full
+backend product dicts, a page at a time:
+
+    dispatcher.utter_message(
+        text=...,
+        custom=product_list_payload(products, tracker.sender_id),
+    )
+
+The rest of the result set stays in the action server under a short-lived
+list id; the payload carries next_cursor, and "xem thêm" (ActionShowMoreProducts)
+passes it back to product_pages.page() for the following cards. The cursor
+reaches that action two ways:
+
+- every list action returns cursor_events(payload), which sets the
+  product_list_cursor slot (declare it in domain.yml:
+  `product_list_cursor: {type: text, influence_conversation: false, mappings: [{type: custom}]}`)
+- the frontend can send a specific list's next_cursor as `cursor` in
+  POST /api/v1/chat/send; ChatService forwards it as metadata.cursor
+
+Card keys differ from backend product dicts: selling_price -> price,
+thumbnail_url -> thumbnail (documented for the frontend in
+FRONTEND_API_DOCUMENTATION.md).
+"""
+
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from rasa_sdk.events import SlotSet
+
+PRODUCT_PAGE_SIZE = int(os.getenv("PRODUCT_PAGE_SIZE", "5"))
+PRODUCT_LIST_TTL_SECONDS = float(os.getenv("PRODUCT_LIST_TTL_SECONDS", "1800"))
+PRODUCT_LIST_MAX_LISTS = int(os.getenv("PRODUCT_LIST_MAX_LISTS", "10000"))
+# Upper bound of results kept for paging per search
+PRODUCT_LIST_MAX_RESULTS = 50
+CURSOR_SLOT = "product_list_cursor"
+
+
+def to_card(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Card fields only; accepts /internal/products, /internal/products/:id and catalog_index shapes"""
+    price = product.get("selling_price", product.get("price"))
+    return {
+        "id": product.get("id"),
+        "name": product.get("name"),
+        "price": float(price) if price is not None else None,
+        "thumbnail": product.get("thumbnail_url") or product.get("thumbnail"),
+        "slug": product.get("slug"),
+    }
+
+
+class ProductPages:
+    """Result sets kept per list id (bound to the sender), LRU + TTL bounded"""
+
+    def __init__(self, page_size: int = PRODUCT_PAGE_SIZE, ttl: float = PRODUCT_LIST_TTL_SECONDS, max_lists: int = PRODUCT_LIST_MAX_LISTS):
+        self.page_size = page_size
+        self.ttl = ttl
+        self.max_lists = max_lists
+        self._lists: "OrderedDict[str, Tuple[str, float, List[Dict[str, Any]]]]" = OrderedDict()
+
+    def _page(self, list_id: str, cards: List[Dict[str, Any]], offset: int) -> Dict[str, Any]:
+        end = offset + self.page_size
+        return {
+            "type": "product_list",
+            "products": cards[offset:end],
+            "total": len(cards),
+            "offset": offset,
+            "next_cursor": f"{list_id}:{end}" if end < len(cards) else None,
+        }
+
+    def first_page(self, products: List[Dict[str, Any]], sender_id: Optional[str] = None) -> Dict[str, Any]:
+        cards = [to_card(p) for p in products[:PRODUCT_LIST_MAX_RESULTS]]
+        list_id = uuid.uuid4().hex[:12]
+        if len(cards) > self.page_size:
+            self._lists[list_id] = (sender_id or "", time.monotonic() + self.ttl, cards)
+            while len(self._lists) > self.max_lists:
+                self._lists.popitem(last=False)
+        return self._page(list_id, cards, 0)
+
+    def page(self, cursor: Optional[str], sender_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Next page for a next_cursor, or None if it expired / belongs to another sender"""
+        try:
+            list_id, offset = cursor.split(":")
+            offset = int(offset)
+        except (AttributeError, ValueError):
+            return None
+        entry = self._lists.get(list_id)
+        if entry is None:
+            return None
+        owner, expires_at, cards = entry
+        if expires_at <= time.monotonic():
+            del self._lists[list_id]
+            return None
+        if owner != (sender_id or "") or offset < 0 or offset >= len(cards):
+            return None
+        self._lists.move_to_end(list_id)
+        return self._page(list_id, cards, offset)
+
+
+# Shared instance used by the product actions
+product_pages = ProductPages()
+
+
+def product_list_payload(products: List[Dict[str, Any]], sender_id: Optional[str] = None) -> Dict[str, Any]:
+    return product_pages.first_page(products, sender_id)
+
+
+def cursor_events(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Events for a list action to return: remember next_cursor for "xem thêm" (None clears it)"""
+    return [SlotSet(CURSOR_SLOT, payload.get("next_cursor"))]
@@ -0,0 +1,374 @@
+"""
+Promotion pricing job: promotions + promotion_products -> product_price_windows.
+
+    python -m actions.promotion_pricing            # refresh products whose pricing inputs changed
+    python -m actions.promotion_pricing --rebuild  # recompute every product
+    python -m actions.promotion_pricing --listen   # refresh on catalog_changes notifications
+
+For every product it takes the selling price plus every active or scheduled,
+not yet ended, non-coupon promotion attached through promotion_products
+(flash_sale_price, or discount_type / discount_value applied to the selling
+price) and splits the timeline at every promotion start/end. Each elementary
+segment gets the lowest candidate price; adjacent segments with the same
+winner are merged into one window. All products are handled at once with
+numpy (one sort for the boundaries, one lexsort for the winners), no per-row
+Python.
+
+Tables: migrations/011_create_product_price_windows.sql. Each product row set
+carries a fingerprint of its inputs; a refresh recomputes only products whose
+fingerprint changed (or that disappeared) and swaps their rows with
+DELETE + COPY in one transaction. Windows are absolute times, so a promotion
+starting or ending needs no refresh; only edits do. --listen reacts to the
+NOTIFYs from migration 009 and still refreshes every PRICING_REFRESH_SECONDS
+because NOTIFY is not durable.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import zlib
+import select
+import logging
+import argparse
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Promotion statuses / types that set a product price (coupons apply at checkout with a code)
+PRICED_STATUSES = ("active", "scheduled")
+EXCLUDED_TYPES = ("coupon",)
+PRICING_TABLES = {"products", "promotions", "promotion_products"}
+PRICING_DEBOUNCE_SECONDS = float(os.getenv("PRICING_DEBOUNCE_SECONDS", "2"))
+PRICING_REFRESH_SECONDS = float(os.getenv("PRICING_REFRESH_SECONDS", "600"))
+# Windows that ended this long ago are pruned
+HISTORY_SECONDS = 86400
+
+# Epoch-second sentinels for -infinity / infinity; times are packed next to a
+# product rank in one int64 key, so they must fit in 32 bits
+T_MIN, T_MAX = 0, 2 ** 32 - 1
+NO_PROMOTION = -1
+
+COPY_COLUMNS = (
+    "product_id", "valid_from", "valid_to", "promotion_id", "promotion_type", "list_price",
+    "selling_price", "effective_price", "discount_percent", "fingerprint",
+)
+
+
+# ====================================
+# Loading
+# ====================================
+def load_inputs(conn) -> Dict[str, np.ndarray]:
+    """Products and promotion candidates as numpy columns (times in epoch seconds)"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT id, selling_price, cost_price FROM products
+            WHERE deleted_at IS NULL ORDER BY id
+        """)
+        products = cur.fetchall()
+        cur.execute("""
+            SELECT pp.product_id, pr.id, pr.type, pr.discount_type, pr.discount_value, pp.flash_sale_price,
+                   EXTRACT(EPOCH FROM pr.start_date), EXTRACT(EPOCH FROM pr.end_date)
+            FROM promotion_products pp
+            JOIN promotions pr ON pr.id = pp.promotion_id
+            WHERE pr.status = ANY(%s) AND pr.type <> ALL(%s)
+              AND pr.end_date > now() AND pr.end_date > pr.start_date
+        """, (list(PRICED_STATUSES), list(EXCLUDED_TYPES)))
+        promos = cur.fetchall()
+
+    return {
+        "product_id": _column(products, 0, np.int64),
+        "selling_price": _column(products, 1),
+        "cost_price": _column(products, 2),
+        "promo_product_id": _column(promos, 0, np.int64),
+        "promotion_id": _column(promos, 1, np.int64),
+        "promotion_type": _column(promos, 2, object),
+        "discount_type": _column(promos, 3, object),
+        "discount_value": _column(promos, 4),
+        "flash_sale_price": _column(promos, 5),
+        "start": _column(promos, 6),
+        "end": _column(promos, 7),
+    }
+
+
+def _column(rows, i: int, dtype=np.float64) -> np.ndarray:
+    """Column i of DB rows; NULL numerics become NaN"""
+    if dtype is np.float64:
+        return np.array([np.nan if r[i] is None else float(r[i]) for r in rows], dtype=dtype)
+    return np.array([r[i] for r in rows], dtype=dtype)
+
+
+# ====================================
+# Pricing
+# ====================================
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, vectorized over uint64"""
+    x = x.astype(np.uint64)
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _lookup(sorted_ids: np.ndarray, ids: np.ndarray):
+    """(position, found) of each id in a sorted id array"""
+    pos = np.searchsorted(sorted_ids, ids)
+    found = pos < len(sorted_ids)
+    found[found] = sorted_ids[pos[found]] == ids[found]
+    return pos, found
+
+
+def _cents(values: np.ndarray) -> np.ndarray:
+    return np.round(np.nan_to_num(values, nan=-1.0) * 100).astype(np.int64)
+
+
+class PricingInputs:
+    """Candidates per product: index 0..n-1 follows the sorted product ids"""
+
+    def __init__(self, data: Dict[str, np.ndarray]):
+        self.product_id = data["product_id"]
+        self.selling = data["selling_price"]
+        self.list_price = np.fmax(self.selling, data["cost_price"])
+        n = len(self.product_id)
+
+        rank, known = _lookup(self.product_id, data["promo_product_id"])
+        rank = rank[known]
+        selling = self.selling[rank]
+        value = data["discount_value"][known]
+        derived = np.where(data["discount_type"][known] == "fixed", selling - value, selling * (1 - value / 100))
+        flash = data["flash_sale_price"][known]
+        price = np.where(np.isnan(flash) | (flash <= 0), derived, flash)
+
+        # Baseline candidate per product: selling price over the whole timeline
+        self.rank = np.concatenate([np.arange(n), rank])
+        self.price = np.round(np.maximum(np.concatenate([self.selling, price]), 0), 2)
+        self.promotion_id = np.concatenate([np.full(n, NO_PROMOTION, np.int64), data["promotion_id"][known]])
+        self.promotion_type = np.concatenate([np.full(n, None, dtype=object), data["promotion_type"][known]])
+        self.start = np.concatenate([np.full(n, T_MIN, np.int64),
+                                     np.clip(np.floor(data["start"][known]), T_MIN + 1, T_MAX - 1).astype(np.int64)])
+        self.end = np.concatenate([np.full(n, T_MAX, np.int64),
+                                   np.clip(np.ceil(data["end"][known]), T_MIN + 1, T_MAX - 1).astype(np.int64)])
+
+    def fingerprints(self) -> np.ndarray:
+        """int64 per product; changes whenever any pricing input of the product changes"""
+        n = len(self.product_id)
+        types, type_index = np.unique(self.promotion_type.astype(str), return_inverse=True)
+        type_code = np.array([zlib.crc32(t.encode("utf-8")) for t in types], dtype=np.uint64)[type_index]
+        row_hash = _mix(_mix(_mix(_mix(self.promotion_id) ^ self.start.astype(np.uint64)) ^ self.end.astype(np.uint64))
+                        ^ _cents(self.price).astype(np.uint64) ^ (type_code << np.uint64(32)))
+        order = np.argsort(self.rank, kind="stable")
+        # Order-independent sum per product (wraps modulo 2**64)
+        sums = np.add.reduceat(row_hash[order], np.searchsorted(self.rank[order], np.arange(n))) if n else row_hash[:0]
+        base = _mix(_cents(self.list_price).astype(np.uint64) ^ _mix(_cents(self.selling).astype(np.uint64)))
+        with np.errstate(over="ignore"):
+            return (sums + base).view(np.int64)
+
+    def subset(self, product_mask: np.ndarray) -> "PricingInputs":
+        """Same inputs restricted to some products (ranks are renumbered)"""
+        keep = product_mask[self.rank]
+        new_rank = np.cumsum(product_mask) - 1
+        sub = object.__new__(PricingInputs)
+        sub.product_id = self.product_id[product_mask]
+        sub.selling = self.selling[product_mask]
+        sub.list_price = self.list_price[product_mask]
+        sub.rank = new_rank[self.rank[keep]]
+        for name in ("price", "promotion_id", "promotion_type", "start", "end"):
+            setattr(sub, name, getattr(self, name)[keep])
+        return sub
+
+
+def compute_windows(inputs: PricingInputs, now: int) -> Dict[str, np.ndarray]:
+    """Best price per product and time window, windows ending before `now` dropped"""
+    # Boundaries of all products in one sorted key space: rank << 32 | time
+    rank_key = inputs.rank.astype(np.int64) << 32
+    start_key = rank_key | inputs.start
+    end_key = rank_key | inputs.end
+    bounds = np.unique(np.concatenate([start_key, end_key]))
+
+    # Candidate c covers elementary segments [lo, hi); segment s runs bounds[s] -> bounds[s + 1]
+    lo = np.searchsorted(bounds, start_key)
+    hi = np.searchsorted(bounds, end_key)
+    counts = hi - lo
+    cand = np.repeat(np.arange(len(counts)), counts)
+    within = np.arange(len(cand)) - np.repeat(np.cumsum(counts) - counts, counts)
+    seg = np.repeat(lo, counts) + within
+
+    # Lowest price per segment; ties go to the selling price, then the older promotion
+    order = np.lexsort((inputs.promotion_id[cand], inputs.price[cand], seg))
+    seg, cand = seg[order], cand[order]
+    first = np.ones(len(seg), dtype=bool)
+    first[1:] = seg[1:] != seg[:-1]
+    seg, win = seg[first], cand[first]
+
+    # Merge neighbouring segments of a product won by the same promotion at the same price
+    win_rank = inputs.rank[win]
+    change = np.ones(len(win), dtype=bool)
+    change[1:] = ((win_rank[1:] != win_rank[:-1])
+                  | (inputs.promotion_id[win][1:] != inputs.promotion_id[win][:-1])
+                  | (inputs.price[win][1:] != inputs.price[win][:-1]))
+    run_start = np.flatnonzero(change)
+    run_end = np.append(run_start[1:], len(seg))[:len(run_start)] - 1
+    win = win[run_start]
+    valid_from = bounds[seg[run_start]] & 0xFFFFFFFF
+    valid_to = bounds[seg[run_end] + 1] & 0xFFFFFFFF
+
+    keep = valid_to > now
+    win, valid_from, valid_to = win[keep], valid_from[keep], valid_to[keep]
+    rank = inputs.rank[win]
+    list_price = inputs.list_price[rank]
+    price = inputs.price[win]
+    discount = np.where(list_price > 0, (list_price - price) / np.where(list_price > 0, list_price, 1) * 100, 0.0)
+    return {
+        "rank": rank,
+        "product_id": inputs.product_id[rank],
+        "valid_from": valid_from,
+        "valid_to": valid_to,
+        "promotion_id": inputs.promotion_id[win],
+        "promotion_type": inputs.promotion_type[win],
+        "list_price": list_price,
+        "selling_price": inputs.selling[rank],
+        "effective_price": price,
+        "discount_percent": np.round(np.clip(discount, 0, 100), 2),
+    }
+
+
+# ====================================
+# Persistence
+# ====================================
+def _timestamps(seconds: np.ndarray) -> np.ndarray:
+    text = np.datetime_as_string(seconds.astype("datetime64[s]"), timezone="UTC").astype(object)
+    text[seconds <= T_MIN] = "-infinity"
+    text[seconds >= T_MAX] = "infinity"
+    return text
+
+
+def _copy_buffer(windows: Dict[str, np.ndarray], fingerprints: np.ndarray) -> io.StringIO:
+    promotion = windows["promotion_id"].astype(object)
+    promotion[windows["promotion_id"] == NO_PROMOTION] = r"\N"
+    promotion_type = np.where(windows["promotion_type"] == None, r"\N", windows["promotion_type"])  # noqa: E711
+    columns = [
+        windows["product_id"], _timestamps(windows["valid_from"]), _timestamps(windows["valid_to"]),
+        promotion, promotion_type, windows["list_price"], windows["selling_price"],
+        windows["effective_price"], windows["discount_percent"], fingerprints[windows["rank"]],
+    ]
+    lines = ("\t".join(map(str, row)) for row in zip(*(c.tolist() for c in columns)))
+    return io.StringIO("".join(line + "\n" for line in lines))
+
+
+def refresh(conn, rebuild: bool = False) -> Dict[str, int]:
+    """Recompute products whose pricing inputs changed; returns counts"""
+    started = time.perf_counter()
+    inputs = PricingInputs(load_inputs(conn))
+    fingerprints = inputs.fingerprints()
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT EXTRACT(EPOCH FROM now())::bigint")
+        now = int(cur.fetchone()[0])
+        if rebuild:
+            cur.execute("TRUNCATE product_price_windows")
+            stored_ids = np.empty(0, np.int64)
+            stored_fp = np.empty(0, np.int64)
+        else:
+            cur.execute("SELECT DISTINCT product_id, fingerprint FROM product_price_windows")
+            stored = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+            stored_ids, stored_fp = stored[:, 0], stored[:, 1]
+
+        # Changed: no stored rows or a different fingerprint; gone: stored but no longer a product
+        order = np.argsort(stored_ids)
+        stored_ids, stored_fp = stored_ids[order], stored_fp[order]
+        pos, found = _lookup(stored_ids, inputs.product_id)
+        changed = ~found
+        changed[found] = stored_fp[pos[found]] != fingerprints[found]
+        gone = np.setdiff1d(stored_ids, inputs.product_id)
+
+        windows = compute_windows(inputs.subset(changed), now)
+        replace_ids = np.concatenate([inputs.product_id[changed], gone]).tolist()
+        if replace_ids:
+            cur.execute("DELETE FROM product_price_windows WHERE product_id = ANY(%s)", (replace_ids,))
+        if len(windows["product_id"]):
+            cur.copy_expert(
+                f"COPY product_price_windows ({', '.join(COPY_COLUMNS)}) FROM STDIN",
+                _copy_buffer(windows, fingerprints[changed]),
+            )
+        cur.execute("DELETE FROM product_price_windows WHERE valid_to < now() - %s * INTERVAL '1 second'",
+                    (HISTORY_SECONDS,))
+        pruned = cur.rowcount
+    conn.commit()
+
+    stats = {
+        "products": int(len(inputs.product_id)),
+        "changed": int(changed.sum()),
+        "removed": int(len(gone)),
+        "windows": int(len(windows["product_id"])),
+        "pruned": int(pruned),
+    }
+    logger.info("Pricing refresh: %s in %.2fs", stats, time.perf_counter() - started)
+    return stats
+
+
+def listen(conn, database_url: str):
+    """Refresh after bursts of catalog_changes notifications touching prices, and periodically"""
+    import psycopg2
+    import psycopg2.extensions
+    from actions.catalog_changes import KEEPALIVE_OPTIONS
+
+    # Keepalives: a dead LISTEN socket fails in poll() instead of staying silent forever
+    listener = psycopg2.connect(database_url, **KEEPALIVE_OPTIONS)
+    listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with listener.cursor() as cur:
+        cur.execute("LISTEN catalog_changes")
+    logger.info("Listening on catalog_changes")
+
+    dirty_since: Optional[float] = None
+    last_refresh = time.monotonic()
+    while True:
+        timeout = PRICING_DEBOUNCE_SECONDS if dirty_since else PRICING_REFRESH_SECONDS
+        if select.select([listener], [], [], timeout) != ([], [], []):
+            listener.poll()
+            while listener.notifies:
+                payload = listener.notifies.pop(0).payload
+                try:
+                    table = json.loads(payload).get("t")
+                except ValueError:
+                    table = None
+                if table in PRICING_TABLES and dirty_since is None:
+                    dirty_since = time.monotonic()
+        quiet = dirty_since and time.monotonic() - dirty_since >= PRICING_DEBOUNCE_SECONDS
+        if quiet or time.monotonic() - last_refresh >= PRICING_REFRESH_SECONDS:
+            refresh(conn)
+            dirty_since = None
+            last_refresh = time.monotonic()
+
+
+def run_job(rebuild: bool = False, listen_changes: bool = False, database_url: str = None) -> Dict[str, int]:
+    import psycopg2
+
+    url = database_url or os.environ["DATABASE_URL"]
+    conn = psycopg2.connect(url)
+    try:
+        stats = refresh(conn, rebuild)
+        if listen_changes:
+            listen(conn, url)
+    finally:
+        conn.close()
+    return stats
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%H:%M:%S")
+    parser = argparse.ArgumentParser(description="Precompute effective product prices per promotion window")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every product")
+    parser.add_argument("--listen", action="store_true", help="keep running and refresh on catalog changes")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        logger.error("DATABASE_URL is not set")
+        sys.exit(1)
+    run_job(args.rebuild, args.listen)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Co-purchase recommendations ("customers who bought X also bought Y").
+
+Offline job (run from cron or after deploy):
+
+    python -m actions.recommendations build     # full rebuild from all delivered orders
+    python -m actions.recommendations update    # fold in orders delivered since the last run
+
+It streams delivered orders/order_items with a server-side cursor, builds a
+sparse product x product co-occurrence matrix (B.T @ B over order baskets),
+scores pairs with cosine similarity and writes the top-K neighbours of every
+product to RECOMMENDATIONS_DIR as .npy files that the action server memory-maps:
+
+    row_of.npy      int32[max_product_id + 1]   product id -> row (-1 = none)
+    neighbors.npy   int32[n_rows, K]            neighbour product ids (-1 padding)
+    scores.npy      float16[n_rows, K]
+    state.npz       raw counts + processed order ids, only used by `update`
+    meta.json       watermark and build info
+
+Lookup in actions is O(1): co_purchase.neighbors(product_id).
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_DIR = os.getenv("RECOMMENDATIONS_DIR", "data/recommendations")
+TOP_K = 20
+STREAM_BATCH_SIZE = 50000
+# Re-read orders updated this long before the watermark (late commits); already
+# processed orders are skipped by id, so the overlap never double counts
+WATERMARK_OVERLAP_SECONDS = 3600
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+# ====================================
+# Offline job
+# ====================================
+def stream_order_items(conn, since: datetime, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Tuple[np.ndarray, np.ndarray, datetime]]:
+    """Yield (order_ids, product_ids, max_updated_at) per batch; an order never spans two batches"""
+    cur = conn.cursor(name="co_purchase_items")
+    cur.itersize = batch_size
+    cur.execute("""
+        SELECT o.id, pv.product_id, o.updated_at
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        JOIN product_variants pv ON pv.id = oi.variant_id
+        WHERE o.fulfillment_status = 'delivered' AND o.updated_at >= %s
+        ORDER BY o.id
+    """, (since,))
+
+    carry: List[tuple] = []
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        rows = carry + rows
+        last_order = rows[-1][0]
+        split = len(rows)
+        while split > 0 and rows[split - 1][0] == last_order:
+            split -= 1
+        if split == 0:
+            # Whole batch is one order; keep reading until it ends
+            carry = rows
+            continue
+        batch, carry = rows[:split], rows[split:]
+        yield _to_arrays(batch)
+
+    if carry:
+        yield _to_arrays(carry)
+    cur.close()
+
+
+def _to_arrays(rows) -> Tuple[np.ndarray, np.ndarray, datetime]:
+    order_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    product_ids = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    return order_ids, product_ids, max(r[2] for r in rows)
+
+
+class CoPurchaseCounts:
+    """Raw co-occurrence counts in a growing product index space"""
+
+    def __init__(self):
+        from scipy import sparse
+
+        self.product_ids = np.empty(0, dtype=np.int64)   # sorted; index = matrix row/col
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.processed_orders = np.empty(0, dtype=np.int64)  # sorted
+        self.watermark = EPOCH
+
+    def _grow(self, new_product_ids: np.ndarray):
+        from scipy import sparse
+
+        merged = np.union1d(self.product_ids, new_product_ids)
+        if len(merged) == len(self.product_ids):
+            return
+        remap = np.searchsorted(merged, self.product_ids)
+        coo = self.counts.tocoo()
+        self.counts = sparse.csr_matrix(
+            (coo.data, (remap[coo.row], remap[coo.col])), shape=(len(merged), len(merged)), dtype=np.float32
+        )
+        self.product_ids = merged
+
+    def add_batch(self, order_ids: np.ndarray, product_ids: np.ndarray):
+        from scipy import sparse
+
+        fresh = ~np.isin(order_ids, self.processed_orders, assume_unique=False)
+        order_ids, product_ids = order_ids[fresh], product_ids[fresh]
+        if len(order_ids) == 0:
+            return 0
+
+        self._grow(product_ids)
+        unique_orders, order_idx = np.unique(order_ids, return_inverse=True)
+        product_idx = np.searchsorted(self.product_ids, product_ids)
+
+        baskets = sparse.csr_matrix(
+            (np.ones(len(order_idx), dtype=np.float32), (order_idx, product_idx)),
+            shape=(len(unique_orders), len(self.product_ids)),
+        )
+        baskets.data[:] = 1.0  # same product twice in one order counts once
+        self.counts = (self.counts + (baskets.T @ baskets)).tocsr()
+        self.processed_orders = np.union1d(self.processed_orders, unique_orders)
+        return len(unique_orders)
+
+    def top_k(self, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Cosine-scored top-k neighbours: returns (row_of, neighbors, scores)"""
+        n = len(self.product_ids)
+        item_counts = self.counts.diagonal().astype(np.float32)
+        coo = self.counts.tocoo()
+        off_diag = coo.row != coo.col
+        rows, cols, data = coo.row[off_diag], coo.col[off_diag], coo.data[off_diag]
+        sim = data / np.sqrt(item_counts[rows] * item_counts[cols])
+
+        # Sort by (row asc, score desc) once, then take the first k of each row
+        order = np.lexsort((-sim, rows))
+        rows, cols, sim = rows[order], cols[order], sim[order]
+        row_start = np.searchsorted(rows, np.arange(n))
+        rank = np.arange(len(rows)) - row_start[rows]
+        keep = rank < k
+
+        neighbors = np.full((n, k), -1, dtype=np.int32)
+        scores = np.zeros((n, k), dtype=np.float16)
+        neighbors[rows[keep], rank[keep]] = self.product_ids[cols[keep]]
+        scores[rows[keep], rank[keep]] = sim[keep]
+
+        max_id = int(self.product_ids[-1]) if n else 0
+        row_of = np.full(max_id + 1, -1, dtype=np.int32)
+        row_of[self.product_ids] = np.arange(n, dtype=np.int32)
+        return row_of, neighbors, scores
+
+    # ---------- persistence ----------
+    def save(self, directory: str, k: int):
+        os.makedirs(directory, exist_ok=True)
+        row_of, neighbors, scores = self.top_k(k)
+        _atomic_save(os.path.join(directory, "row_of.npy"), row_of)
+        _atomic_save(os.path.join(directory, "neighbors.npy"), neighbors)
+        _atomic_save(os.path.join(directory, "scores.npy"), scores)
+
+        state_tmp = os.path.join(directory, "state.tmp.npz")
+        np.savez_compressed(
+            state_tmp,
+            product_ids=self.product_ids,
+            processed_orders=self.processed_orders,
+            data=self.counts.data, indices=self.counts.indices, indptr=self.counts.indptr,
+        )
+        os.replace(state_tmp, os.path.join(directory, "state.npz"))
+
+        meta = {
+            "watermark": self.watermark.isoformat(),
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "products": int(len(self.product_ids)),
+            "orders": int(len(self.processed_orders)),
+            "pairs": int(self.counts.nnz),
+            "top_k": k,
+        }
+        meta_tmp = os.path.join(directory, "meta.json.tmp")
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        # meta.json last: readers reload when its mtime changes
+        os.replace(meta_tmp, os.path.join(directory, "meta.json"))
+        return meta
+
+    @classmethod
+    def load(cls, directory: str) -> "CoPurchaseCounts":
+        from scipy import sparse
+
+        model = cls()
+        state = np.load(os.path.join(directory, "state.npz"))
+        model.product_ids = state["product_ids"]
+        model.processed_orders = state["processed_orders"]
+        n = len(model.product_ids)
+        model.counts = sparse.csr_matrix((state["data"], state["indices"], state["indptr"]), shape=(n, n))
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            model.watermark = datetime.fromisoformat(json.load(f)["watermark"])
+        return model
+
+
+def _atomic_save(path: str, array: np.ndarray):
+    tmp = path + ".tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def run_job(mode: str, directory: str = RECOMMENDATIONS_DIR, k: int = TOP_K, database_url: Optional[str] = None):
+    import psycopg2
+
+    started = time.perf_counter()
+    if mode == "update" and os.path.exists(os.path.join(directory, "state.npz")):
+        model = CoPurchaseCounts.load(directory)
+        since = model.watermark.timestamp() - WATERMARK_OVERLAP_SECONDS
+        since = datetime.fromtimestamp(max(0, since), tz=timezone.utc)
+    else:
+        model = CoPurchaseCounts()
+        since = EPOCH
+
+    conn = psycopg2.connect(database_url or os.environ["DATABASE_URL"])
+    new_orders = 0
+    try:
+        for order_ids, product_ids, max_updated in stream_order_items(conn, since):
+            new_orders += model.add_batch(order_ids, product_ids)
+            model.watermark = max(model.watermark, max_updated)
+    finally:
+        conn.close()
+
+    meta = model.save(directory, k)
+    logger.info(
+        "%s: +%d orders, %d products, %d pairs in %.1fs",
+        mode, new_orders, meta["products"], meta["pairs"], time.perf_counter() - started,
+    )
+    return meta
+
+
+# ====================================
+# Lookup (action server)
+# ====================================
+class CoPurchaseIndex:
+    """Memory-mapped top-K neighbours, reloaded when the job publishes a new build"""
+
+    def __init__(self, directory: str = RECOMMENDATIONS_DIR):
+        self.directory = directory
+        self._mtime = None
+        self._row_of = None
+        self._neighbors = None
+        self._scores = None
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(os.path.join(self.directory, "meta.json")).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        self._row_of = np.load(os.path.join(self.directory, "row_of.npy"), mmap_mode="r")
+        self._neighbors = np.load(os.path.join(self.directory, "neighbors.npy"), mmap_mode="r")
+        self._scores = np.load(os.path.join(self.directory, "scores.npy"), mmap_mode="r")
+        self._mtime = mtime
+
+    def neighbors(self, product_id: int, k: int = 5) -> List[Tuple[int, float]]:
+        """[(product_id, score), ...] bought together with product_id, best first"""
+        self._reload_if_changed()
+        if self._row_of is None or product_id < 0 or product_id >= len(self._row_of):
+            return []
+        row = self._row_of[product_id]
+        if row < 0:
+            return []
+        ids = self._neighbors[row, :k]
+        scores = self._scores[row, :k]
+        return [(int(pid), float(score)) for pid, score in zip(ids, scores) if pid >= 0]
+
+
+# Shared instance used by the recommendation actions
+co_purchase = CoPurchaseIndex()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%H:%M:%S")
+    parser = argparse.ArgumentParser(description="Build co-purchase recommendations")
+    parser.add_argument("mode", choices=["build", "update"])
+    parser.add_argument("--dir", default=RECOMMENDATIONS_DIR)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        logger.error("DATABASE_URL is not set")
+        sys.exit(1)
+    run_job(args.mode, args.dir, args.top_k)
+
+
+if __name__ == "__main__":
+    main()
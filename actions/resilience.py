@@ -0,0 +1,124 @@
+"""
+Circuit breakers and hedging policy for backend calls (used by actions.http_client).
+
+Circuit breaker, one per endpoint label (GET /internal/products/:id, ...):
+
+    closed     calls go through; opens when >= BREAKER_FAILURE_RATIO of the
+               last BREAKER_WINDOW calls failed (at least BREAKER_MIN_CALLS)
+    open       calls fail immediately for BREAKER_OPEN_SECONDS, so actions
+               fall back (stale cache, apology message) instead of waiting
+               for a timeout
+    half-open  one probe call; success closes, failure re-opens
+
+Only timeouts, connection errors and 5xx count as failures; a 4xx means the
+backend is healthy.
+
+Hedging: an idempotent GET that has not answered after the endpoint's recent
+p95 gets a second identical request and the first answer wins. Hedges are
+capped at HEDGE_MAX_RATIO of all requests so a slow backend does not get
+double load.
+"""
+
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "10"))
+
+HEDGE_MIN_DELAY = 0.05
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+# Need this many latency samples before trusting the endpoint's p95
+HEDGE_MIN_SAMPLES = 20
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_ratio: float = BREAKER_FAILURE_RATIO,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+    ):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.results: deque = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, ok: bool):
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = False
+            if ok:
+                self.state = CLOSED
+                self.results.clear()
+            else:
+                self._open()
+            return
+        self.results.append(ok)
+        if len(self.results) >= self.min_calls:
+            failures = self.results.count(False)
+            if failures / len(self.results) >= self.failure_ratio:
+                self._open()
+
+    def release(self):
+        """Call ended without telling anything about backend health (cancelled, local error):
+        free the half-open probe slot so the next call can probe again"""
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self.results.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "rejected": self.rejected, "times_opened": self.times_opened}
+
+
+class HedgePolicy:
+    """When to send a second copy of a slow GET, with a global hedge budget"""
+
+    def __init__(self, max_ratio: float = HEDGE_MAX_RATIO):
+        self.max_ratio = max_ratio
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self, samples_ms, timeout: float) -> Optional[float]:
+        """Seconds to wait before hedging, or None to not hedge this request"""
+        self.requests += 1
+        if len(samples_ms) < HEDGE_MIN_SAMPLES:
+            return None
+        if self.hedges >= self.max_ratio * self.requests:
+            return None
+        ordered = sorted(samples_ms)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] / 1000
+        delay = max(HEDGE_MIN_DELAY, p95)
+        # A hedge sent this late cannot finish before the deadline anyway
+        return delay if delay < timeout / 2 else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
@@ -0,0 +1,242 @@
+"""
+In-process product search cache for the action server.
+
+The backend answers /internal/products with unaccent(...) ILIKE scans, and
+the same few queries ("áo thun", "quần jean") come in all day. Results are
+cached here keyed by the normalized, unaccented query plus filters:
+
+- LRU eviction bounded by an approximate byte budget
+- TTL per entry
+- Explicit invalidation (all, one query, or any entry containing a product)
+- Concurrent misses for the same key share one backend call
+- Stale-while-revalidate: for SEARCH_CACHE_STALE_SECONDS after the TTL an entry
+  is still served by get_or_fetch() while one background call refreshes it, so
+  a slow or failing backend does not block searches that were answered before
+- hits / misses / evictions counters via SearchCache.stats()
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import contextvars
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+SEARCH_CACHE_STALE_SECONDS = float(os.getenv("SEARCH_CACHE_STALE_SECONDS", "600"))
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase, strip Vietnamese diacritics (đ -> d) and collapse whitespace"""
+    if not text:
+        return ""
+    text = text.lower().replace("đ", "d")
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return " ".join(text.split())
+
+
+def make_key(query: str, filters: Optional[Dict[str, Any]] = None) -> CacheKey:
+    items = tuple(sorted(
+        (k, normalize_text(str(v))) for k, v in (filters or {}).items() if v is not None
+    ))
+    return normalize_text(query), items
+
+
+def _estimate_bytes(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def _product_ids(products: Any) -> frozenset:
+    if not isinstance(products, list):
+        return frozenset()
+    return frozenset(p.get("id") or p.get("product_id") for p in products if isinstance(p, dict))
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "product_ids")
+
+    def __init__(self, value: Any, expires_at: float, size: int, product_ids: frozenset):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.product_ids = product_ids
+
+
+class SearchCache:
+    """Byte-bounded LRU + TTL cache of product search results"""
+
+    def __init__(
+        self,
+        max_bytes: int = SEARCH_CACHE_MAX_BYTES,
+        ttl: float = SEARCH_CACHE_TTL_SECONDS,
+        stale_seconds: float = SEARCH_CACHE_STALE_SECONDS,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_served = 0
+        self.revalidation_failures = 0
+
+    def get(self, query: str, filters: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        key = make_key(query, filters)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            # Kept for get_or_fetch() during the stale window
+            self._expire_if_dead(key, entry)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def _expire_if_dead(self, key: CacheKey, entry: _Entry) -> bool:
+        if entry.expires_at + self.stale_seconds <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return True
+        return False
+
+    def put(self, query: str, filters: Optional[Dict[str, Any]], value: Any, ttl: Optional[float] = None):
+        key = make_key(query, filters)
+        size = _estimate_bytes(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, time.monotonic() + (ttl or self.ttl), size, _product_ids(value))
+        self.bytes_used += size
+        while self.bytes_used > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def get_or_fetch(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]],
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached result or call fetch() once, even for concurrent callers.
+        A stale entry is returned right away and refreshed in the background."""
+        cached = self.get(query, filters)
+        if cached is not None:
+            return cached
+
+        key = make_key(query, filters)
+        stale = self._entries.get(key)
+        if stale is not None:
+            self.stale_served += 1
+            if key not in self._inflight:
+                # Fresh context: the refresh must not use the current action's deadline
+                loop = asyncio.get_running_loop()
+                task = contextvars.Context().run(loop.create_task, self._revalidate(key, query, filters, fetch))
+                # The loop only keeps a weak reference to tasks
+                self._refreshes.add(task)
+                task.add_done_callback(self._refreshes.discard)
+            return stale.value
+
+        return await self._fetch_once(key, query, filters, fetch)
+
+    async def _revalidate(self, key: CacheKey, query: str, filters: Optional[Dict[str, Any]], fetch):
+        try:
+            await self._fetch_once(key, query, filters, fetch)
+        except Exception as e:
+            self.revalidation_failures += 1
+            logger.debug("Search cache refresh failed for %r: %s", query, e)
+
+    async def _fetch_once(self, key: CacheKey, query: str, filters: Optional[Dict[str, Any]], fetch) -> Any:
+        pending = self._inflight.get(key)
+        while pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The caller that was fetching got cancelled, not us: the first
+                # waiter to wake up fetches, the others wait on it
+                pending = self._inflight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            self.put(query, filters, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, query: Optional[str] = None, filters: Optional[Dict[str, Any]] = None):
+        """Drop one query (with these filters), or everything when query is None"""
+        if query is None:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self.bytes_used = 0
+            return
+        key = make_key(query, filters)
+        if key in self._entries:
+            self._remove(key)
+            self.invalidations += 1
+
+    def invalidate_products(self, product_ids: Iterable[int]):
+        """Drop every cached result that contains one of these products"""
+        targets = set(product_ids)
+        stale = [key for key, entry in self._entries.items() if entry.product_ids & targets]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self.bytes_used -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_served": self.stale_served,
+            "revalidation_failures": self.revalidation_failures,
+        }
+
+
+# Shared instance used by the search actions
+search_cache = SearchCache()
+
@@ -0,0 +1,179 @@
+"""
+Local size advice for ActionGetSizingAdvice.
+
+Replaces the POST /api/chatbot/size-advice round trip per question with
+precomputed lookup tables. The rules are not duplicated here: they come from
+GET /api/chatbot/size-rules (src/modules/chatbot/size-rules.ts, the same
+rules ChatbotService.getSizeAdvice evaluates), per category, first match wins.
+
+SizeAdviceDto only accepts integers inside height_range / weight_range, so the
+rules are closed integer intervals and are evaluated once per category into a
+dense (height x weight) table; advice is a single array lookup and
+advise_many() answers a whole batch with one fancy-indexing call. Measurements
+the DTO would reject get no advice (None) instead of being clipped.
+
+Rules are re-fetched after SIZE_RULES_TTL_SECONDS; while the backend is down
+the last loaded rules keep being used. Size chart image URLs
+(GET /api/chatbot/size-chart/:category) are cached for SIZE_CHART_TTL_SECONDS.
+"""
+
+import os
+import time
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from actions.http_client import backend, BackendError
+
+logger = logging.getLogger(__name__)
+
+SIZE_RULES_TTL_SECONDS = float(os.getenv("SIZE_RULES_TTL_SECONDS", "600"))
+SIZE_CHART_TTL_SECONDS = float(os.getenv("SIZE_CHART_TTL_SECONDS", "3600"))
+
+
+def _in_interval(values: np.ndarray, interval: Sequence[Optional[int]]) -> np.ndarray:
+    lo, hi = interval
+    mask = np.ones(values.shape, dtype=bool)
+    if lo is not None:
+        mask &= values >= lo
+    if hi is not None:
+        mask &= values <= hi
+    return mask
+
+
+class SizeTable:
+    """Outcome index per (height, weight) cell for one category"""
+
+    def __init__(
+        self,
+        rules: List[Dict[str, Any]],
+        fallback: Dict[str, Any],
+        height_range: Tuple[int, int],
+        weight_range: Tuple[int, int],
+    ):
+        self.outcomes = [(r["size"], r["confidence"], r["reason"]) for r in rules]
+        self.outcomes.append((fallback["size"], fallback["confidence"], fallback["reason"]))
+        self.height_range = height_range
+        self.weight_range = weight_range
+
+        heights = np.arange(height_range[0], height_range[1] + 1)[:, None]
+        weights = np.arange(weight_range[0], weight_range[1] + 1)[None, :]
+        table = np.full((len(heights), weights.shape[1]), len(rules), dtype=np.int8)
+        # Paint rules last to first so the first matching rule wins
+        for index in range(len(rules) - 1, -1, -1):
+            rule = rules[index]
+            h_mask = _in_interval(heights, rule["height"])
+            w_mask = _in_interval(weights, rule["weight"])
+            hit = (h_mask & w_mask) if rule.get("match", "all") == "all" else (h_mask | w_mask)
+            table[hit] = index
+        self.table = table
+
+    def accepts(self, heights: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Same check as SizeAdviceDto's @Min/@Max"""
+        return (
+            (heights >= self.height_range[0]) & (heights <= self.height_range[1])
+            & (weights >= self.weight_range[0]) & (weights <= self.weight_range[1])
+        )
+
+    def lookup(self, heights: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Outcome index per pair; callers filter out pairs accepts() rejects"""
+        h = np.clip(heights, *self.height_range) - self.height_range[0]
+        w = np.clip(weights, *self.weight_range) - self.weight_range[0]
+        return self.table[h, w]
+
+
+class SizeAdvisor:
+    def __init__(self):
+        self.note = ""
+        self._default: Optional[SizeTable] = None
+        self._tables: Dict[str, SizeTable] = {}
+        self._rules_expire_at = 0.0
+        self._charts: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._default is not None
+
+    async def load_rules(self) -> bool:
+        """Fetch the rules if the loaded ones are older than SIZE_RULES_TTL_SECONDS.
+        False only if no rules were ever loaded."""
+        if self.ready and self._rules_expire_at > time.monotonic():
+            return True
+        try:
+            data = (await backend.get("/api/chatbot/size-rules")).get("data") or {}
+            height_range = tuple(data["height_range"])
+            weight_range = tuple(data["weight_range"])
+            tables = {
+                category.lower(): SizeTable(rules, data["fallback"], height_range, weight_range)
+                for category, rules in data["rules"].items()
+            }
+            default = tables.pop("default")
+        except BackendError as e:
+            logger.warning("Size rules not refreshed, %s: %s", "keeping the loaded ones" if self.ready else "no advice", e)
+            return self.ready
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Ignoring invalid size rules from the backend: %s", e)
+            return self.ready
+        self._default, self._tables, self.note = default, tables, data.get("note", "")
+        self._rules_expire_at = time.monotonic() + SIZE_RULES_TTL_SECONDS
+        logger.info("Size tables loaded: default + %s", sorted(tables) or "no category rules")
+        return True
+
+    def _table(self, category: Optional[str]) -> SizeTable:
+        if self._default is None:
+            raise RuntimeError("size rules not loaded, await size_advisor.load_rules() first")
+        return self._tables.get((category or "").lower(), self._default)
+
+    def limits(self, category: Optional[str] = None) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        table = self._table(category)
+        return table.height_range, table.weight_range
+
+    def advise_many(
+        self, heights: Sequence[float], weights: Sequence[float], category: Optional[str] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Same response shape as /api/chatbot/size-advice for every (height, weight) pair,
+        None where the backend would reject the measurements. Values are rounded like the DTO's integers."""
+        table = self._table(category)
+        heights = np.rint(np.asarray(heights, dtype=np.float64)).astype(np.int64)
+        weights = np.rint(np.asarray(weights, dtype=np.float64)).astype(np.int64)
+        valid = table.accepts(heights, weights)
+        indices = table.lookup(heights, weights)
+        results: List[Optional[Dict[str, Any]]] = []
+        for height, weight, ok, index in zip(heights.tolist(), weights.tolist(), valid.tolist(), indices.tolist()):
+            if not ok:
+                results.append(None)
+                continue
+            size, confidence, reason = table.outcomes[index]
+            results.append({
+                "recommended_size": size,
+                "confidence": confidence,
+                "reason": reason,
+                "note": self.note,
+                "measurements": {"height": f"{height} cm", "weight": f"{weight} kg"},
+            })
+        return results
+
+    def advise(self, height: float, weight: float, category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return self.advise_many([height], [weight], category)[0]
+
+    async def size_chart(self, category: str) -> Optional[Dict[str, Any]]:
+        """{category, image_url, description} or None for categories without a chart"""
+        key = category.lower()
+        cached = self._charts.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        try:
+            data = await backend.get(f"/api/chatbot/size-chart/{key}")
+            chart = data.get("data")
+        except BackendError as e:
+            if e.status != 404:
+                # Keep serving the old URL while the backend is unavailable
+                return cached[1] if cached else None
+            chart = None
+        self._charts[key] = (time.monotonic() + SIZE_CHART_TTL_SECONDS, chart)
+        return chart
+
+
+# Shared instance used by ActionGetSizingAdvice
+size_advisor = SizeAdvisor()
@@ -0,0 +1,128 @@
+"""
+Defensive parsing of free-text slot values.
+
+Slots filled from entities keep whatever the customer typed, so a price slot
+holds "300k", "1tr5" or "300.000đ" rather than a number. Every parser returns
+None for text it cannot read; the action then asks again or drops the filter
+instead of failing on float().
+
+    parse_price("300k")       -> 300000.0
+    parse_price("1tr5")       -> 1500000.0
+    parse_price("1,2 triệu")  -> 1200000.0
+    parse_price("300.000đ")   -> 300000.0
+    parse_price("1 triệu 2")  -> 1200000.0
+    parse_price("200-500k")   -> 200000.0   (first number of a range, unit from the last)
+    parse_price("500")        -> 500000.0   (no unit and under 1000: thousands)
+    parse_height_cm("1m70")   -> 170.0
+    parse_weight_kg("65 ký")  -> 65.0
+"""
+
+import re
+from typing import Any, Optional
+
+from actions.search_cache import normalize_text
+
+_PRICE_UNITS = {
+    "trieu": 1_000_000, "tr": 1_000_000, "cu": 1_000_000,
+    "nghin": 1_000, "ngan": 1_000, "k": 1_000,
+    "vnd": 1, "dong": 1, "d": 1,
+}
+# Units longest first so "trieu" is not read as "tr" + "ieu"
+_UNIT = "(" + "|".join(sorted(_PRICE_UNITS, key=len, reverse=True)) + ")"
+_PRICE = re.compile(r"(\d+(?:[.,]\d+)*)\s*" + _UNIT + r"?(\s*\d{1,3})?(?![a-z\d])")
+# "200-500k", "200 đến 500k": the unit written once at the end applies to both numbers
+_RANGE_UNIT = re.compile(r"\s*(?:-|–|~|den|toi)\s*\d+(?:[.,]\d+)*\s*" + _UNIT + r"(?![a-z])")
+# Nobody sells a shirt for 500 dong: a bare amount under this is in thousands
+_BARE_THOUSANDS_BELOW = 1_000
+
+_METERS_CM = re.compile(r"(\d)\s*(?:m|met)\s*(\d{1,2})(?!\d)")
+_LENGTH = re.compile(r"(\d+(?:[.,]\d+)?)\s*(cm|m|met)?(?![a-z\d])")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def parse_number(text: str) -> Optional[float]:
+    """'300.000' / '300,000' -> 300000, '1.5' / '1,5' -> 1.5"""
+    groups = re.split(r"[.,]", text)
+    if len(groups) > 1 and all(len(g) == 3 for g in groups[1:]):
+        return float("".join(groups))
+    if len(groups) == 2:
+        return float(f"{groups[0]}.{groups[1]}")
+    if len(groups) == 1:
+        return float(groups[0])
+    return None
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """VND amount from a slot value: k / nghìn / tr / triệu / đ suffixes are applied, '1tr5'
+    and '1 triệu 2' mean 1.x triệu, a range gives its first number. An amount without a unit
+    under 1000 is read as thousands. None if there is no positive amount in the text."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        amount = float(value)
+        if 0 < amount < _BARE_THOUSANDS_BELOW:
+            amount *= 1_000
+        return amount if amount > 0 else None
+
+    text = normalize_text(str(value))
+    match = _PRICE.search(text)
+    if not match:
+        return None
+    number, unit, fraction = match.groups()
+    amount = parse_number(number)
+    if amount is None:
+        return None
+    if unit is None:
+        range_unit = _RANGE_UNIT.match(text, match.end())
+        if range_unit:
+            unit = range_unit.group(1)
+    multiplier = _PRICE_UNITS.get(unit, 1)
+    if fraction and fraction[0].isspace() and multiplier < 1_000_000:
+        # "500k 2 cái" is not 500.2k: only triệu takes a separated fraction
+        fraction = None
+    if fraction and multiplier > 1:
+        # 1tr5 = 1.5tr, 2tr25 = 2.25tr, 1 triệu 2 = 1.2tr
+        amount += float(f"0.{fraction.strip()}")
+    if unit is None and amount < _BARE_THOUSANDS_BELOW:
+        amount *= 1_000
+    else:
+        amount *= multiplier
+    return amount if amount > 0 else None
+
+
+def parse_height_cm(value: Any) -> Optional[float]:
+    """Height in cm: '170', '170cm', '1m70', '1m7', '1 mét 7', '1.7m', '1,70'.
+    Numbers below 3 are read as meters."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        height = float(value)
+    else:
+        text = normalize_text(str(value))
+        meters_cm = _METERS_CM.search(text)
+        match = _LENGTH.search(text)
+        if meters_cm:
+            meters, rest = meters_cm.groups()
+            # "1m7" is 1m70, not 1m07
+            height = float(int(meters) * 100 + int(rest.ljust(2, "0")))
+        elif match:
+            height = parse_number(match.group(1))
+            if height is not None and match.group(2) in ("m", "met"):
+                height *= 100
+        else:
+            return None
+    if height is not None and 0 < height < 3:
+        height *= 100
+    return height if height and height > 0 else None
+
+
+def parse_weight_kg(value: Any) -> Optional[float]:
+    """Weight in kg: '65', '65kg', '65 ký', '65,5 kg'"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        weight = float(value)
+    else:
+        match = _NUMBER.search(normalize_text(str(value)))
+        weight = parse_number(match.group(0)) if match else None
+    return weight if weight and weight > 0 else None
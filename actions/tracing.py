@@ -0,0 +1,341 @@
+"""
+Per-action tracing and metrics for the Rasa action server.
+
+Subclass TracedAction instead of Action. Every run() then records:
+
+- wall time, intent and action name
+- number and total latency of backend calls (actions.http_client reports them here)
+- size of the messages the action sent
+
+as Prometheus histograms, served at http://<action-server>:ACTION_METRICS_PORT/metrics
+(JSON snapshot with client/cache stats at /metrics.json).
+
+Each run gets a trace id (metadata.trace_id from the incoming message if present)
+that is sent to the backend as X-Trace-Id, and every utter_message() automatically
+gets metadata {"intent": ..., "trace_id": ...}.
+
+Each run also gets a deadline: metadata.timeout_ms (how long ChatService waits
+for the Rasa webhook) minus DEADLINE_MARGIN_SECONDS, or ACTION_DEADLINE_SECONDS.
+actions.http_client caps every backend timeout at remaining_budget().
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import inspect
+import logging
+import functools
+import threading
+import concurrent.futures
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple
+
+from rasa_sdk import Action, Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+logger = logging.getLogger(__name__)
+
+ACTION_METRICS_PORT = int(os.getenv("ACTION_METRICS_PORT", "9464"))
+
+TRACE_HEADER = "X-Trace-Id"
+
+ACTION_DEADLINE_SECONDS = float(os.getenv("ACTION_DEADLINE_SECONDS", "9"))
+# Time Rasa needs after the action (NLU already ran, response still has to go back)
+DEADLINE_MARGIN_SECONDS = 0.5
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+# How long /metrics.json waits for the event loop to take the snapshot
+SNAPSHOT_TIMEOUT_SECONDS = 2.0
+
+
+# ====================================
+# Histograms (Prometheus text format, no client library needed)
+# ====================================
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts = self._series.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, counts in sorted(self._series.items()):
+                base = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+                sep = "," if base else ""
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {counts[-1]}')
+                lines.append(f"{self.name}_sum{{{base}}} {self._sums[key]}")
+                lines.append(f"{self.name}_count{{{base}}} {counts[-1]}")
+        return lines
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                "/".join(key): {"count": counts[-1], "sum": round(self._sums[key], 6)}
+                for key, counts in self._series.items()
+            }
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+ACTION_DURATION = Histogram(
+    "rasa_action_duration_seconds", "Wall time of one action run",
+    LATENCY_BUCKETS, ("action", "intent", "status"),
+)
+ACTION_BACKEND_CALLS = Histogram(
+    "rasa_action_backend_calls", "Backend calls made during one action run",
+    COUNT_BUCKETS, ("action",),
+)
+ACTION_BACKEND_SECONDS = Histogram(
+    "rasa_action_backend_seconds", "Total backend latency during one action run",
+    LATENCY_BUCKETS, ("action",),
+)
+ACTION_PAYLOAD_BYTES = Histogram(
+    "rasa_action_payload_bytes", "JSON size of the messages sent by one action run",
+    BYTES_BUCKETS, ("action",),
+)
+BACKEND_REQUEST_SECONDS = Histogram(
+    "rasa_backend_request_seconds", "Latency of one backend HTTP call",
+    LATENCY_BUCKETS, ("endpoint", "ok"),
+)
+
+HISTOGRAMS = [ACTION_DURATION, ACTION_BACKEND_CALLS, ACTION_BACKEND_SECONDS, ACTION_PAYLOAD_BYTES, BACKEND_REQUEST_SECONDS]
+
+
+# ====================================
+# Per-run context
+# ====================================
+class RunTrace:
+    __slots__ = ("trace_id", "action", "intent", "deadline", "backend_calls", "backend_ms")
+
+    def __init__(self, trace_id: str, action: str, intent: str, deadline: float):
+        self.trace_id = trace_id
+        self.action = action
+        self.intent = intent
+        self.deadline = deadline
+        self.backend_calls = 0
+        self.backend_ms = 0.0
+
+
+_current_run: ContextVar[Optional[RunTrace]] = ContextVar("current_action_run", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    run = _current_run.get()
+    return run.trace_id if run else None
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left before the running action's deadline, None outside an action run"""
+    run = _current_run.get()
+    return run.deadline - time.monotonic() if run else None
+
+
+def _deadline_of(metadata: Dict[str, Any]) -> float:
+    try:
+        budget = float(metadata['timeout_ms']) / 1000 - DEADLINE_MARGIN_SECONDS
+    except (KeyError, TypeError, ValueError):
+        budget = ACTION_DEADLINE_SECONDS
+    return time.monotonic() + max(0.0, budget)
+
+
+def record_backend_call(endpoint: str, elapsed_ms: float, ok: bool):
+    """Called by actions.http_client after every backend request"""
+    BACKEND_REQUEST_SECONDS.observe(elapsed_ms / 1000, endpoint=endpoint, ok=str(ok).lower())
+    run = _current_run.get()
+    if run is not None:
+        run.backend_calls += 1
+        run.backend_ms += elapsed_ms
+
+
+def _intent_of(tracker: Tracker) -> str:
+    try:
+        return tracker.latest_message.get('intent', {}).get('name') or 'unknown'
+    except Exception:
+        return 'unknown'
+
+
+def _warm_customer_context(tracker: Tracker):
+    """Authenticated turn: start loading the customer's orders and cart for this and later turns"""
+    # Imported here: http_client imports this module
+    from actions.customer_context import customer_context
+
+    try:
+        customer_context.warm(tracker)
+    except Exception as e:
+        logger.debug("Customer context warm-up skipped: %s", e)
+
+
+def _traced(run):
+    @functools.wraps(run)
+    async def wrapper(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
+        start_metrics_server()
+        intent = _intent_of(tracker)
+        incoming = tracker.latest_message.get('metadata') or {}
+        trace = RunTrace(incoming.get('trace_id') or uuid.uuid4().hex, self.name(), intent, _deadline_of(incoming))
+        token = _current_run.set(trace)
+        _warm_customer_context(tracker)
+        first_message = len(dispatcher.messages)
+        status = "ok"
+        started = time.perf_counter()
+        try:
+            result = run(self, dispatcher, tracker, domain)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_run.reset(token)
+
+            sent = dispatcher.messages[first_message:]
+            for message in sent:
+                message["metadata"] = {"intent": intent, "trace_id": trace.trace_id, **(message.get("metadata") or {})}
+            payload_bytes = len(json.dumps(sent, ensure_ascii=False, default=str).encode("utf-8"))
+
+            ACTION_DURATION.observe(elapsed, action=trace.action, intent=intent, status=status)
+            ACTION_BACKEND_CALLS.observe(trace.backend_calls, action=trace.action)
+            ACTION_BACKEND_SECONDS.observe(trace.backend_ms / 1000, action=trace.action)
+            ACTION_PAYLOAD_BYTES.observe(payload_bytes, action=trace.action)
+            logger.info(
+                "action=%s intent=%s trace=%s status=%s wall=%.1fms backend_calls=%d backend=%.1fms payload=%dB",
+                trace.action, intent, trace.trace_id, status, elapsed * 1000,
+                trace.backend_calls, trace.backend_ms, payload_bytes,
+            )
+
+    return wrapper
+
+
+class TracedAction(Action):
+    """Action base class that instruments run() of every subclass"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "run" in cls.__dict__:
+            cls.run = _traced(cls.__dict__["run"])
+
+
+# ====================================
+# Metrics endpoint
+# ====================================
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    """Client / cache stats. Those objects are mutated by the event loop without locks:
+    call this on the loop (the metrics thread goes through _snapshot_on_loop)."""
+    # Imported here: http_client imports this module
+    from actions.http_client import backend
+    from actions.search_cache import search_cache
+    from actions.catalog_index import catalog_index
+    from actions.gemini_cache import gemini_cache
+    from actions.customer_context import customer_context
+    from actions.catalog_changes import catalog_changes
+
+    return {
+        "actions": {h.name: h.snapshot() for h in HISTOGRAMS},
+        "backend": backend.metrics(),
+        "resilience": backend.resilience_metrics(),
+        "search_cache": search_cache.stats(),
+        "catalog_index": catalog_index.stats(),
+        "gemini_cache": gemini_cache.stats(),
+        "customer_context": customer_context.stats(),
+        "catalog_changes": catalog_changes.stats(),
+    }
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _snapshot_on_loop() -> Dict[str, Any]:
+    """metrics_snapshot() run on the action server's loop, called from the metrics thread"""
+    result: concurrent.futures.Future = concurrent.futures.Future()
+
+    def take():
+        try:
+            result.set_result(metrics_snapshot())
+        except BaseException as e:
+            result.set_exception(e)
+
+    _loop.call_soon_threadsafe(take)
+    return result.result(timeout=SNAPSHOT_TIMEOUT_SECONDS)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            # Histograms have their own lock
+            body = render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            try:
+                snapshot = _snapshot_on_loop()
+            except (RuntimeError, concurrent.futures.TimeoutError) as e:
+                # Loop closed or too busy to answer
+                self.send_error(503, f"snapshot unavailable: {type(e).__name__}")
+                return
+            body = json.dumps(snapshot, ensure_ascii=False, default=str).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server_lock = threading.Lock()
+_server_started = False
+
+
+def start_metrics_server(port: int = ACTION_METRICS_PORT):
+    """Start the metrics endpoint once per process (port 0 disables it). Call it on the event loop."""
+    global _server_started, _loop
+    if _server_started or not port:
+        return
+    with _server_lock:
+        if _server_started:
+            return
+        _server_started = True
+        _loop = asyncio.get_running_loop()
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError as e:
+            logger.warning("Metrics endpoint not started on port %d: %s", port, e)
+            return
+        threading.Thread(target=server.serve_forever, name="action-metrics", daemon=True).start()
+        logger.info("Action metrics at http://0.0.0.0:%d/metrics", port)
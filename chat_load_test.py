@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Load test hội thoại Chatbot qua đường Rasa webhook
+- Replay các kịch bản hội thoại nhiều lượt (search, tra đơn, styling, fallback) song song
+- Mỗi hội thoại dùng visitor_id riêng -> ChatService gửi sender riêng cho Rasa
+- Đo latency end-to-end (client -> backend -> Rasa -> actions -> backend) và từng hop:
+  hop rasa lấy từ timing.rasa_ms mà ChatService đo cho chính request đó,
+  backend_overhead = end_to_end - rasa của cùng request
+- Thống kê latency theo intent lấy từ metadata.intent mà actions gắn vào message
+
+Ví dụ:
+    python chat_load_test.py --conversations 200 --concurrency 20
+    python chat_load_test.py --json bench_chat.json
+"""
+
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import requests
+
+from seed_config import BASE_URL
+
+# ==================== CONFIG ====================
+REQUEST_TIMEOUT = 30
+
+# Kịch bản hội thoại (mỗi kịch bản là 1 chuỗi lượt gửi tuần tự trong cùng session)
+CONVERSATION_SCRIPTS = {
+    "search": [
+        "xin chào",
+        "tìm áo thun",
+        "có áo thun màu đen không",
+        "áo sơ mi dưới 300k",
+    ],
+    "order_tracking": [
+        "xin chào",
+        "kiểm tra đơn hàng của tôi",
+        "đơn hàng ORD202501010001 đang ở đâu",
+    ],
+    "styling": [
+        "áo thun trắng phối với quần gì",
+        "đi biển nên mặc gì",
+        "tư vấn size cho mình cao 170cm nặng 65kg",
+    ],
+    "fallback": [
+        "asdkjh qwe zzz",
+        "bầu trời màu gì vậy",
+        "cảm ơn",
+    ],
+}
+
+# ==================== HELPERS ====================
+def log(message):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+
+def percentile(values, pct):
+    """Percentile theo nearest-rank, values tính bằng ms"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 1),
+        "p95": round(percentile(values, 95), 1),
+        "p99": round(percentile(values, 99), 1),
+        "max": round(max(values), 1) if values else 0.0,
+        "mean": round(sum(values) / len(values), 1) if values else 0.0,
+    }
+
+def extract_intent(bot_messages):
+    """Lấy intent từ bot responses (backend lưu metadata.intent vào cột intent)"""
+    for msg in bot_messages:
+        intent = msg.get("intent") or (msg.get("metadata") or {}).get("intent")
+        if intent:
+            return intent
+    return "unknown"
+
+class LatencyRecorder:
+    """Gom latency theo hop / intent / kịch bản, thread-safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hops = defaultdict(list)
+        self.intents = defaultdict(list)
+        self.scripts = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.turns = 0
+
+    def record_hop(self, hop, elapsed_ms):
+        with self._lock:
+            self.hops[hop].append(elapsed_ms)
+
+    def record_turn(self, script, intent, elapsed_ms):
+        with self._lock:
+            self.turns += 1
+            self.intents[intent].append(elapsed_ms)
+            self.scripts[script].append(elapsed_ms)
+
+    def record_error(self, hop, reason):
+        with self._lock:
+            self.errors[f"{hop}: {reason}"] += 1
+
+    def report(self, wall_seconds):
+        return {
+            "wall_seconds": round(wall_seconds, 2),
+            "turns": self.turns,
+            "turns_per_second": round(self.turns / wall_seconds, 2) if wall_seconds else 0.0,
+            "hops": {hop: summarize(v) for hop, v in self.hops.items()},
+            "intents": {intent: summarize(v) for intent, v in sorted(self.intents.items())},
+            "scripts": {script: summarize(v) for script, v in self.scripts.items()},
+            "errors": dict(self.errors),
+        }
+
+# ==================== CONVERSATION ====================
+def timed_post(session, url, payload, recorder, hop):
+    start = time.perf_counter()
+    try:
+        response = session.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        recorder.record_error(hop, type(e).__name__)
+        return None, None
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if response.status_code not in [200, 201]:
+        recorder.record_error(hop, f"HTTP {response.status_code}")
+        return None, elapsed_ms
+    recorder.record_hop(hop, elapsed_ms)
+    return response.json(), elapsed_ms
+
+def run_conversation(script_name, turns, recorder, think_time=0.0):
+    """Chạy 1 hội thoại: tạo session với visitor_id riêng rồi gửi lần lượt các lượt"""
+    http = requests.Session()
+    visitor_id = f"loadtest-{uuid.uuid4()}"
+
+    data, _ = timed_post(
+        http, f"{BASE_URL}/api/v1/chat/session",
+        {"visitor_id": visitor_id, "force_new": True}, recorder, "session",
+    )
+    if not data:
+        return
+    session_id = data["session"]["id"]
+
+    for message in turns:
+        data, e2e_ms = timed_post(
+            http, f"{BASE_URL}/api/v1/chat/send",
+            {"session_id": session_id, "message": message}, recorder, "end_to_end",
+        )
+        if data is None:
+            continue
+        intent = extract_intent(data.get("bot_responses", []))
+        recorder.record_turn(script_name, intent, e2e_ms)
+
+        # Không có khi session ở human mode (backend không gọi Rasa)
+        rasa_ms = (data.get("timing") or {}).get("rasa_ms")
+        if rasa_ms is not None:
+            recorder.record_hop("rasa", rasa_ms)
+            recorder.record_hop("backend_overhead", max(0.0, e2e_ms - rasa_ms))
+
+        if think_time:
+            time.sleep(random.uniform(0, think_time))
+
+    http.close()
+
+# ==================== MAIN ====================
+def print_table(title, rows):
+    log(title)
+    print(f"    {'name':<28}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, s in rows.items():
+        print(f"    {name:<28}{s['count']:>7}{s['p50']:>9}{s['p95']:>9}{s['p99']:>9}{s['max']:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test hội thoại chatbot qua /api/v1/chat/send")
+    parser.add_argument("--conversations", type=int, default=50, help="Tổng số hội thoại")
+    parser.add_argument("--concurrency", type=int, default=10, help="Số hội thoại chạy song song")
+    parser.add_argument("--scripts", nargs="+", choices=list(CONVERSATION_SCRIPTS), default=list(CONVERSATION_SCRIPTS))
+    parser.add_argument("--think-time", type=float, default=0.0, help="Nghỉ ngẫu nhiên tối đa (giây) giữa các lượt")
+    parser.add_argument("--json", help="Ghi report ra file JSON")
+    args = parser.parse_args()
+
+    log(f"🚀 Load test {args.conversations} hội thoại, concurrency={args.concurrency}")
+    log(f"Backend: {BASE_URL}")
+
+    recorder = LatencyRecorder()
+    plan = [args.scripts[i % len(args.scripts)] for i in range(args.conversations)]
+    random.shuffle(plan)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_conversation, name, CONVERSATION_SCRIPTS[name], recorder, args.think_time)
+            for name in plan
+        ]
+        for future in as_completed(futures):
+            future.result()
+    wall = time.perf_counter() - start
+
+    report = recorder.report(wall)
+    log(f"✅ {report['turns']} lượt trong {report['wall_seconds']}s ({report['turns_per_second']} turns/s)")
+    print_table("Latency theo hop (ms):", report["hops"])
+    print_table("Latency theo intent (ms):", report["intents"])
+    print_table("Latency theo kịch bản (ms):", report["scripts"])
+    if report["errors"]:
+        log(f"⚠️ Lỗi: {json.dumps(report['errors'], ensure_ascii=False)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        log(f"Đã ghi report ra {args.json}")
+
+    if report["turns"] == 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
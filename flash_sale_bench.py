@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Benchmark checkout đồng thời cho flash sale (tranh chấp tồn kho)
+
+    python flash_sale_bench.py --buyers 300 --variants 2 --stock 50
+    python flash_sale_bench.py --buyers 500 --concurrency 100 --json bench_flash.json --fail-on-oversell
+
+1. Setup (SQL): chọn vài variant "hot", đặt tồn kho còn bán = --stock, tạo
+   promotion flash_sale cho product của chúng, chuẩn bị buyers (tạo thêm bằng
+   seed_customers nếu thiếu), mỗi buyer 1 địa chỉ và giỏ hàng rỗng
+2. Qua API (không đo): login từng buyer, POST /cart/items 1 variant hot
+3. Burst: mọi buyer chờ cùng 1 hiệu lệnh rồi POST /api/v1/checkout song song.
+   Trong lúc đó 1 thread đọc pg_stat_activity mỗi --poll-ms để đếm session
+   đang chờ lock (wait_event_type = 'Lock') và thời gian chờ lâu nhất
+4. Kết quả: throughput, latency p50/p95/p99 theo kết quả (thành công / hết
+   hàng / lỗi), lock waits, deadlocks (pg_stat_database.deadlocks trước/sau),
+   và đối chiếu tồn kho:
+   - oversell: số lượng bán trong orders vượt quá --stock
+   - undersell: còn hàng nhưng buyer vẫn bị từ chối
+   - reserved drift: reserved_stock tăng khác tổng số lượng đã bán (lost update)
+   - đơn có price_at_purchase khác giá flash sale
+5. Dọn dẹp (cả khi burst / đối chiếu bị lỗi): xoá orders của buyers tạo từ
+   lúc bắt đầu burst và promotion của lần chạy, trả total_stock /
+   reserved_stock về như cũ (--keep để giữ lại xem)
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from seed_config import BASE_URL
+from seed_data import log, get_db_connection
+from chat_load_test import summarize, print_table
+
+# ==================== CONFIG ====================
+DEFAULT_BUYERS = 200
+DEFAULT_VARIANTS = 2
+DEFAULT_STOCK = 50
+DEFAULT_CONCURRENCY = 50
+FLASH_DISCOUNT = 50  # %
+LOCK_POLL_MS = 20
+REQUEST_TIMEOUT = 30
+SETUP_CONCURRENCY = 20
+# pg_stat_database được flush theo chu kỳ (~1s), chờ trước khi đọc deadlocks sau burst
+STATS_FLUSH_SECONDS = 1.5
+
+# ==================== SETUP ====================
+def pick_hot_variants(cur, count, variant_ids=None):
+    """[{id, product_id, name, total_stock, reserved_stock, price}] của các variant hot"""
+    if variant_ids:
+        cur.execute("""
+            SELECT pv.id, pv.product_id, p.name, pv.total_stock, pv.reserved_stock, p.selling_price
+            FROM product_variants pv JOIN products p ON p.id = pv.product_id
+            WHERE pv.id = ANY(%s)
+        """, (variant_ids,))
+    else:
+        cur.execute("""
+            SELECT pv.id, pv.product_id, p.name, pv.total_stock, pv.reserved_stock, p.selling_price
+            FROM product_variants pv JOIN products p ON p.id = pv.product_id
+            WHERE pv.status = 'active' AND p.status = 'active' AND p.deleted_at IS NULL
+            ORDER BY RANDOM() LIMIT %s
+        """, (count,))
+    keys = ("id", "product_id", "name", "total_stock", "reserved_stock", "price")
+    return [dict(zip(keys, row)) for row in cur.fetchall()]
+
+def setup_flash_sale(conn, variants, stock, discount=FLASH_DISCOUNT):
+    """Đặt tồn kho còn bán = stock cho mỗi variant hot và tạo promotion flash_sale, trả về promotion id"""
+    cur = conn.cursor()
+    for v in variants:
+        cur.execute("UPDATE product_variants SET total_stock = reserved_stock + %s WHERE id = %s", (stock, v["id"]))
+    cur.execute("""
+        INSERT INTO promotions (name, type, discount_type, discount_value, start_date, end_date, status)
+        VALUES ('Flash Sale Benchmark', 'flash_sale', 'percentage', %s, NOW() - INTERVAL '1 minute', NOW() + INTERVAL '1 hour', 'active')
+        RETURNING id
+    """, (discount,))
+    promotion_id = cur.fetchone()[0]
+    for product_id, price in {v["product_id"]: v["price"] for v in variants}.items():
+        cur.execute("""
+            INSERT INTO promotion_products (promotion_id, product_id, flash_sale_price)
+            VALUES (%s, %s, %s)
+        """, (promotion_id, product_id, round(float(price) * (1 - discount / 100))))
+    conn.commit()
+    cur.close()
+    return promotion_id
+
+def prepare_buyers(conn, count):
+    """[(customer_id, email, address_id)]: tạo thêm customers nếu thiếu, đảm bảo có địa chỉ, xoá giỏ hàng"""
+    from seed_customers import seed_customers, DEFAULT_PASSWORD
+
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM customers WHERE status = 'active'")
+    missing = count - cur.fetchone()[0]
+    if missing > 0:
+        log(f"Thiếu {missing} customers, tạo thêm bằng seed_customers")
+        seed_customers(missing, passwords=[DEFAULT_PASSWORD], manifest=None)
+
+    cur.execute("SELECT id, email FROM customers WHERE status = 'active' ORDER BY id LIMIT %s", (count,))
+    customers = cur.fetchall()
+    customer_ids = [c[0] for c in customers]
+
+    # Buyer chưa có địa chỉ: thêm 1 địa chỉ mặc định (giống seed_customer_addresses)
+    cur.execute("""
+        INSERT INTO customer_addresses (customer_id, is_default, address_type, street_address, phone_number, province, district, ward)
+        SELECT c.id, TRUE, 'Home', '1 Đường Lê Lợi', '0900000000', 'Thành phố Hồ Chí Minh', 'Quận 1', 'Phường Bến Nghé'
+        FROM unnest(%s::bigint[]) AS c(id)
+        WHERE NOT EXISTS (SELECT 1 FROM customer_addresses a WHERE a.customer_id = c.id)
+    """, (customer_ids,))
+    cur.execute("""
+        SELECT DISTINCT ON (customer_id) customer_id, id FROM customer_addresses
+        WHERE customer_id = ANY(%s) ORDER BY customer_id, is_default DESC, id
+    """, (customer_ids,))
+    address_of = dict(cur.fetchall())
+
+    cur.execute("""
+        DELETE FROM cart_items WHERE cart_id IN (SELECT id FROM carts WHERE customer_id = ANY(%s))
+    """, (customer_ids,))
+    conn.commit()
+    cur.close()
+    return [(customer_id, email, address_of[customer_id]) for customer_id, email in customers]
+
+def login_buyer(email, password):
+    session = requests.Session()
+    response = session.post(f"{BASE_URL}/api/v1/auth/login", json={"email": email, "password": password},
+                            timeout=REQUEST_TIMEOUT)
+    if response.status_code not in [200, 201]:
+        return None
+    session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return session
+
+def add_to_cart(session, variant_id, quantity):
+    response = session.post(f"{BASE_URL}/cart/items", json={"variant_id": variant_id, "quantity": quantity},
+                            timeout=REQUEST_TIMEOUT)
+    return response.status_code in [200, 201]
+
+def prepare_sessions(buyers, variants, quantity, concurrency=SETUP_CONCURRENCY):
+    """Login + thêm 1 variant hot vào giỏ cho mỗi buyer. Trả về [(buyer, session, variant_id)]"""
+    from seed_customers import DEFAULT_PASSWORD
+
+    def prepare(i, buyer):
+        variant_id = variants[i % len(variants)]["id"]
+        try:
+            session = login_buyer(buyer[1], DEFAULT_PASSWORD)
+            if session is None:
+                return None, "login"
+            if not add_to_cart(session, variant_id, quantity):
+                return None, "cart"
+        except requests.RequestException:
+            return None, "network"
+        return (buyer, session, variant_id), None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda args: prepare(*args), enumerate(buyers)))
+    failures = Counter(reason for _, reason in results if reason)
+    if failures:
+        log(f"⚠️ Bỏ qua buyers lỗi khi chuẩn bị: {dict(failures)}")
+    return [ready for ready, _ in results if ready]
+
+# ==================== LOCK MONITOR ====================
+class LockMonitor(threading.Thread):
+    """Đọc pg_stat_activity định kỳ trên connection riêng: số session chờ lock, loại lock, thời gian chờ"""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = 0
+        self.waiting = []
+        self.active = []
+        self.wait_events = Counter()
+        self.max_wait_ms = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        conn = get_db_connection()
+        conn.autocommit = True
+        cur = conn.cursor()
+        while not self._stop_event.is_set():
+            cur.execute("""
+                SELECT state, wait_event_type, wait_event,
+                       EXTRACT(EPOCH FROM clock_timestamp() - query_start) * 1000
+                FROM pg_stat_activity
+                WHERE datname = current_database() AND pid <> pg_backend_pid() AND backend_type = 'client backend'
+            """)
+            rows = cur.fetchall()
+            locked = [r for r in rows if r[1] == "Lock"]
+            self.samples += 1
+            self.waiting.append(len(locked))
+            self.active.append(sum(1 for r in rows if r[0] == "active"))
+            for _, _, event, wait_ms in locked:
+                self.wait_events[event] += 1
+                self.max_wait_ms = max(self.max_wait_ms, float(wait_ms or 0))
+            self._stop_event.wait(self.interval)
+        cur.close()
+        conn.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def report(self):
+        return {
+            "samples": self.samples,
+            "max_waiting": max(self.waiting, default=0),
+            "mean_waiting": round(sum(self.waiting) / len(self.waiting), 2) if self.waiting else 0.0,
+            "samples_with_waits": sum(1 for w in self.waiting if w),
+            "max_active": max(self.active, default=0),
+            "max_lock_wait_ms": round(self.max_wait_ms, 1),
+            "wait_events": dict(self.wait_events),
+        }
+
+def read_deadlocks(cur):
+    cur.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+    return cur.fetchone()[0]
+
+# ==================== BURST ====================
+def classify(status, message):
+    if status in [200, 201]:
+        return "ok"
+    if status == 400 and "không đủ hàng" in message.lower():
+        return "sold_out"
+    if "deadlock" in message.lower():
+        return "deadlock"
+    return f"HTTP {status}"
+
+def checkout(session, address_id, gate):
+    gate.wait()
+    started = time.perf_counter()
+    try:
+        response = session.post(f"{BASE_URL}/api/v1/checkout",
+                                json={"customer_address_id": address_id, "payment_method": "cod"},
+                                timeout=REQUEST_TIMEOUT)
+        status, message = response.status_code, response.text
+    except requests.RequestException as e:
+        status, message = 0, type(e).__name__
+    return classify(status, message), (time.perf_counter() - started) * 1000, time.perf_counter()
+
+def run_burst(ready, concurrency):
+    """Mọi buyer cùng chờ 1 hiệu lệnh rồi checkout; trả về (results, wall giây)"""
+    gate = threading.Event()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(checkout, session, buyer[2], gate) for buyer, session, _ in ready]
+        time.sleep(0.2)  # để các worker kịp tới gate
+        start = time.perf_counter()
+        gate.set()
+        results = [future.result() for future in futures]
+    wall = max((r[2] for r in results), default=start) - start
+    return results, wall
+
+# ==================== VERIFY ====================
+def run_order_ids(cur, buyer_ids, run_started_at):
+    """Orders của buyers tạo từ lúc bắt đầu burst (kể cả khi burst dừng giữa chừng)"""
+    if not buyer_ids or run_started_at is None:
+        return []
+    cur.execute("""
+        SELECT id FROM orders WHERE customer_id = ANY(%s) AND created_at >= %s
+    """, (buyer_ids, run_started_at))
+    return [row[0] for row in cur.fetchall()]
+
+def verify_stock(cur, variants, promotion_id, ready, results, stock, quantity, run_started_at):
+    """Đối chiếu tồn kho cuối với orders thực sự được tạo trong burst"""
+    order_ids = run_order_ids(cur, [buyer[0] for buyer, _, _ in ready], run_started_at)
+
+    cur.execute("""
+        SELECT pv.id, pv.total_stock, pv.reserved_stock,
+               COALESCE(SUM(oi.quantity), 0),
+               COUNT(oi.id) FILTER (WHERE oi.price_at_purchase <> pp.flash_sale_price)
+        FROM product_variants pv
+        LEFT JOIN order_items oi ON oi.variant_id = pv.id AND oi.order_id = ANY(%s)
+        LEFT JOIN promotion_products pp ON pp.product_id = pv.product_id AND pp.promotion_id = %s
+        WHERE pv.id = ANY(%s)
+        GROUP BY pv.id, pv.total_stock, pv.reserved_stock
+    """, (order_ids, promotion_id, [v["id"] for v in variants]))
+    final = {row[0]: row[1:] for row in cur.fetchall()}
+
+    demand = Counter(variant_id for _, _, variant_id in ready)
+    outcome_by_variant = defaultdict(Counter)
+    for (_, _, variant_id), (outcome, _, _) in zip(ready, results):
+        outcome_by_variant[variant_id][outcome] += 1
+
+    per_variant = {}
+    for v in variants:
+        total, reserved, sold, wrong_price = final[v["id"]]
+        reserved_delta = reserved - v["reserved_stock"]
+        undersell = stock - sold if sold < stock and demand[v["id"]] * quantity >= stock else 0
+        per_variant[v["id"]] = {
+            "name": v["name"],
+            "stock": stock,
+            "buyers": demand[v["id"]],
+            "sold": int(sold),
+            "ok_responses": outcome_by_variant[v["id"]]["ok"],
+            "oversell": int(max(0, sold - stock)),
+            "undersell": int(undersell),
+            "reserved_delta": int(reserved_delta),
+            "reserved_drift": int(reserved_delta - sold),
+            "available_after": int(total - reserved),
+            "non_flash_price_items": int(wrong_price),
+        }
+    return order_ids, per_variant
+
+# ==================== CLEANUP ====================
+def cleanup(conn, variants, promotion_id, buyer_ids, run_started_at):
+    """Xoá orders / promotion của lần chạy và trả tồn kho về như trước, trả về số orders đã xoá"""
+    # Lỗi SQL giữa chừng để lại transaction bị abort
+    conn.rollback()
+    cur = conn.cursor()
+    order_ids = run_order_ids(cur, buyer_ids, run_started_at)
+    if order_ids:
+        for table in ["promotion_usage", "payments", "order_status_history", "product_reviews", "order_items"]:
+            cur.execute("SELECT to_regclass(%s)", (table,))
+            if cur.fetchone()[0]:
+                cur.execute(f"DELETE FROM {table} WHERE order_id = ANY(%s)", (order_ids,))
+        cur.execute("DELETE FROM orders WHERE id = ANY(%s)", (order_ids,))
+    for v in variants:
+        cur.execute("UPDATE product_variants SET total_stock = %s, reserved_stock = %s WHERE id = %s",
+                    (v["total_stock"], v["reserved_stock"], v["id"]))
+    cur.execute("DELETE FROM promotion_products WHERE promotion_id = %s", (promotion_id,))
+    cur.execute("DELETE FROM promotions WHERE id = %s", (promotion_id,))
+    cur.execute("DELETE FROM cart_items WHERE cart_id IN (SELECT id FROM carts WHERE customer_id = ANY(%s))", (buyer_ids,))
+    conn.commit()
+    cur.close()
+    return len(order_ids)
+
+# ==================== MAIN ====================
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark checkout đồng thời cho flash sale")
+    parser.add_argument("--buyers", type=int, default=DEFAULT_BUYERS)
+    parser.add_argument("--variants", type=int, default=DEFAULT_VARIANTS, help="số variant hot")
+    parser.add_argument("--variant-ids", type=lambda s: [int(x) for x in s.split(",")], help="chỉ định variant hot")
+    parser.add_argument("--stock", type=int, default=DEFAULT_STOCK, help="tồn kho còn bán của mỗi variant hot")
+    parser.add_argument("--quantity", type=int, default=1, help="số lượng mỗi buyer mua")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--poll-ms", type=float, default=LOCK_POLL_MS)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--keep", action="store_true", help="giữ orders / promotion / tồn kho sau khi chạy")
+    parser.add_argument("--fail-on-oversell", action="store_true", help="exit 1 nếu oversell hoặc reserved drift")
+    parser.add_argument("--json", help="Ghi report ra file JSON")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    variants = pick_hot_variants(cur, args.variants, args.variant_ids)
+    if not variants:
+        log("❌ Không có variant nào để chạy")
+        sys.exit(1)
+    log(f"🔥 Flash sale {len(variants)} variants x {args.stock} sp, {args.buyers} buyers, concurrency={args.concurrency}")
+    for v in variants:
+        log(f"   variant {v['id']}: {v['name']}")
+
+    promotion_id = setup_flash_sale(conn, variants, args.stock)
+    ready, run_started_at = [], None
+    try:
+        buyers = prepare_buyers(conn, args.buyers)
+        random.shuffle(buyers)
+        ready = prepare_sessions(buyers, variants, args.quantity)
+        if not ready:
+            log("❌ Không có buyer nào login / thêm giỏ hàng được")
+            sys.exit(1)
+        log(f"Đã chuẩn bị {len(ready)} buyers (login + giỏ hàng)")
+
+        cur.execute("SELECT NOW()")
+        run_started_at = cur.fetchone()[0]
+        deadlocks_before = read_deadlocks(cur)
+        conn.commit()
+
+        monitor = LockMonitor(args.poll_ms / 1000)
+        monitor.start()
+        try:
+            results, wall = run_burst(ready, args.concurrency)
+        finally:
+            monitor.stop()
+
+        time.sleep(STATS_FLUSH_SECONDS)
+        cur.execute("SELECT pg_stat_clear_snapshot()")
+        deadlocks = read_deadlocks(cur) - deadlocks_before
+        order_ids, per_variant = verify_stock(cur, variants, promotion_id, ready, results, args.stock, args.quantity, run_started_at)
+        conn.commit()
+
+        outcomes = Counter(outcome for outcome, _, _ in results)
+        latencies = defaultdict(list)
+        for outcome, elapsed_ms, _ in results:
+            latencies["all"].append(elapsed_ms)
+            latencies[outcome].append(elapsed_ms)
+        report = {
+            "wall_seconds": round(wall, 3),
+            "checkouts": len(results),
+            "checkouts_per_second": round(len(results) / wall, 1) if wall else 0.0,
+            "orders_per_second": round(outcomes["ok"] / wall, 1) if wall else 0.0,
+            "outcomes": dict(outcomes),
+            "latency_ms": {name: summarize(v) for name, v in latencies.items()},
+            "locks": monitor.report(),
+            "deadlocks": deadlocks,
+            "orders_in_db": len(order_ids),
+            "variants": per_variant,
+        }
+
+        log(f"✅ {report['checkouts']} checkouts trong {report['wall_seconds']}s "
+            f"({report['checkouts_per_second']} req/s, {report['orders_per_second']} orders/s)")
+        log(f"Kết quả: {json.dumps(report['outcomes'], ensure_ascii=False)}")
+        print_table("Latency checkout (ms):", report["latency_ms"])
+        locks = report["locks"]
+        log(f"Lock waits: tối đa {locks['max_waiting']} session cùng chờ, trung bình {locks['mean_waiting']}, "
+            f"chờ lâu nhất {locks['max_lock_wait_ms']}ms, {json.dumps(locks['wait_events'])}")
+        log(f"Deadlocks: {deadlocks} | orders trong DB: {len(order_ids)} / {outcomes['ok']} response thành công")
+        for variant_id, s in per_variant.items():
+            flag = "❌" if s["oversell"] or s["reserved_drift"] else ("⚠️" if s["undersell"] else "✅")
+            log(f"{flag} variant {variant_id}: bán {s['sold']}/{s['stock']} ({s['buyers']} buyers), "
+                f"oversell {s['oversell']}, undersell {s['undersell']}, reserved drift {s['reserved_drift']}, "
+                f"còn {s['available_after']}, {s['non_flash_price_items']} item không theo giá flash sale")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+            log(f"Đã ghi report ra {args.json}")
+    finally:
+        if args.keep:
+            log(f"Giữ lại promotion {promotion_id} và orders của lần chạy (--keep)")
+        else:
+            removed = cleanup(conn, variants, promotion_id, [buyer[0] for buyer, _, _ in ready], run_started_at)
+            log(f"Đã dọn {removed} orders / promotion và trả tồn kho về như cũ")
+        cur.close()
+        conn.close()
+
+    broken = any(s["oversell"] or s["reserved_drift"] for s in per_variant.values())
+    if args.fail_on_oversell and broken:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
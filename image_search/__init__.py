@@ -0,0 +1 @@
+"""CPU image-similarity service behind FASTAPI_SERVICE_URL (see image_search.server)."""
@@ -0,0 +1,199 @@
+"""
+Latency benchmark for the image index and embedder.
+
+    python -m image_search.benchmark                          # synthetic 200k-row index in a temp dir
+    python -m image_search.benchmark --rows 1000000 --nprobe 4,8,16
+    python -m image_search.benchmark --dir data/image_index   # existing index, queries = perturbed rows
+    python -m image_search.benchmark --json bench_image.json
+
+Reports, for exact search and IVF at each nprobe:
+
+- per-query latency (p50 / p95 / p99 / mean, ms) for single-image requests
+- throughput of batched queries (--batch sizes, queries/s)
+- IVF recall@K against exact search (share of exact top-K products found)
+
+plus embedder latency per image and per batch on synthetic JPEGs. Synthetic
+vectors are clustered (CLUSTER_SIZE rows per centre, IMAGES_PER_PRODUCT rows
+per product) so IVF sees a realistic, non-uniform distribution.
+"""
+
+import io
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+
+from image_search import index as index_module
+from image_search.index import DEFAULT_TOP_K, ImageIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROWS = 200000
+DEFAULT_QUERIES = 200
+IMAGES_PER_PRODUCT = 6
+CLUSTER_SIZE = 300
+# Norm of the per-row offset from its cluster centre / of the query perturbation
+CLUSTER_SPREAD = 0.6
+QUERY_NOISE = 0.15
+APPEND_CHUNK = 100000
+
+
+def _latency_stats(seconds: List[float]) -> Dict[str, float]:
+    ms = np.asarray(seconds) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "mean": round(float(ms.mean()), 2),
+    }
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+def build_synthetic(directory: str, rows: int, dim: int, seed: int = 0) -> ImageIndex:
+    rng = np.random.default_rng(seed)
+    index = ImageIndex(directory)
+    index.reset()
+    centers = _normalize(rng.standard_normal((max(1, rows // CLUSTER_SIZE), dim)).astype(np.float32))
+    for start in range(0, rows, APPEND_CHUNK):
+        n = min(APPEND_CHUNK, rows - start)
+        row_ids = np.arange(start, start + n)
+        noise = rng.standard_normal((n, dim)).astype(np.float32) * CLUSTER_SPREAD / np.sqrt(dim)
+        vectors = _normalize(centers[rng.integers(0, len(centers), n)] + noise)
+        index.append("synthetic", row_ids + 1, row_ids // IMAGES_PER_PRODUCT + 1,
+                     [f"https://example.com/{i}.jpg" for i in row_ids], vectors)
+    return index
+
+
+def make_queries(index: ImageIndex, n: int, seed: int = 1) -> np.ndarray:
+    snap = index.snapshot()
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(snap.count, size=min(n, snap.count), replace=False))
+    base = np.asarray(snap.vectors[rows], dtype=np.float32)
+    noise = rng.standard_normal(base.shape).astype(np.float32) * QUERY_NOISE / np.sqrt(snap.dim)
+    return _normalize(base + noise)
+
+
+def bench_search(index: ImageIndex, queries: np.ndarray, k: int, nprobes: List[int], batches: List[int]) -> dict:
+    snap = index.snapshot()
+    modes = [("exact", True, None)]
+    if snap.centroids is not None:
+        modes += [(f"ivf nprobe={p}", False, p) for p in nprobes]
+
+    exact_products = [{hit["product_id"] for hit in hits} for hits in index.search(queries, k, exact=True)]
+    report = {}
+    for label, exact, nprobe in modes:
+        kwargs = {"exact": exact, "nprobe": nprobe or index_module.IVF_NPROBE}
+        index.search(queries[:5], k, **kwargs)  # warm up
+        latencies, found = [], []
+        for q in queries:
+            started = time.perf_counter()
+            hits = index.search(q[None, :], k, **kwargs)[0]
+            latencies.append(time.perf_counter() - started)
+            found.append({hit["product_id"] for hit in hits})
+        recall = np.mean([len(f & e) / max(len(e), 1) for f, e in zip(found, exact_products)])
+
+        throughput = {}
+        for batch in batches:
+            started = time.perf_counter()
+            for start in range(0, len(queries), batch):
+                index.search(queries[start:start + batch], k, **kwargs)
+            throughput[batch] = round(len(queries) / (time.perf_counter() - started), 1)
+
+        report[label] = {"latency_ms": _latency_stats(latencies), "qps_by_batch": throughput,
+                         f"recall@{k}": round(float(recall), 4)}
+        logger.info("%-16s p50 %7.2fms  p95 %7.2fms  p99 %7.2fms  recall@%d %.3f  qps %s",
+                    label, report[label]["latency_ms"]["p50"], report[label]["latency_ms"]["p95"],
+                    report[label]["latency_ms"]["p99"], k, recall, throughput)
+    return report
+
+
+def bench_embedder(batches: List[int], images: int = 64) -> dict:
+    from PIL import Image
+    from image_search.features import get_embedder
+
+    embedder = get_embedder()
+    rng = np.random.default_rng(2)
+    jpegs = []
+    for _ in range(images):
+        pixels = np.full((800, 600, 3), 255, dtype=np.uint8)
+        pixels[150:650, 120:480] = rng.integers(0, 256, 3)
+        pixels[150:650, 120:480] += rng.integers(0, 40, (500, 360, 1), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, "JPEG", quality=85)
+        jpegs.append(buffer.getvalue())
+
+    prepare = []
+    arrays = []
+    for data in jpegs:
+        started = time.perf_counter()
+        arrays.append(embedder.prepare(data))
+        prepare.append(time.perf_counter() - started)
+    report = {"embedder": embedder.name, "prepare_ms": _latency_stats(prepare), "embed_ms_per_image": {}}
+    for batch in batches:
+        stacked = np.stack(arrays[:batch])
+        started = time.perf_counter()
+        embedder.embed(stacked)
+        report["embed_ms_per_image"][batch] = round((time.perf_counter() - started) * 1000 / len(stacked), 3)
+    logger.info("embedder %s: prepare p50 %.2fms, embed ms/image by batch %s",
+                embedder.name, report["prepare_ms"]["p50"], report["embed_ms_per_image"])
+    return report
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%H:%M:%S")
+    parser = argparse.ArgumentParser(description="Benchmark image index search latency")
+    parser.add_argument("--dir", help="existing index directory (default: synthetic index in a temp dir)")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--dim", type=int, default=None, help="synthetic vector size (default: embedder dim)")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--nprobe", default="4,8,16")
+    parser.add_argument("--batch", default="1,8,32")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--no-embedder", action="store_true", help="skip the embedder benchmark (no Pillow needed)")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+    nprobes = [int(p) for p in args.nprobe.split(",") if p]
+    batches = [int(b) for b in args.batch.split(",") if b]
+
+    report = {}
+    if not args.no_embedder:
+        report["embedder"] = bench_embedder(batches)
+
+    temp_dir = None
+    try:
+        if args.dir:
+            index = ImageIndex(args.dir)
+        else:
+            from image_search.features import DescriptorEmbedder
+            temp_dir = tempfile.mkdtemp(prefix="image_index_")
+            started = time.perf_counter()
+            index = build_synthetic(temp_dir, args.rows, args.dim or DescriptorEmbedder.dim)
+            logger.info("Built synthetic index: %d rows in %.1fs", args.rows, time.perf_counter() - started)
+            index.train_ivf(nlist=args.nlist)
+        snap = index.snapshot()
+        if snap is None or not snap.count:
+            logger.error("Index is empty")
+            return
+        report["index"] = index.describe()
+        report["search"] = bench_search(index, make_queries(index, args.queries), args.top_k, nprobes, batches)
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        logger.info("Report written to %s", args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Image embedders for the similarity index (CPU only).
+
+An embedder works in two steps so the expensive part is vectorized:
+
+    arrays = [embedder.prepare(image) for image in images]   # per image: decode + resize
+    vectors = embedder.embed(np.stack(arrays))               # whole batch at once
+
+prepare() runs in the download/decode worker threads; embed() returns
+L2-normalized float32 rows, so the dot product of two rows is their cosine
+similarity.
+
+- DescriptorEmbedder (default, numpy + Pillow): foreground-masked HSV colour
+  histogram, gradient-orientation histogram on a 4x4 grid and an 8x8
+  silhouette. Each block is L2-normalized and weighted, so a dot product is
+  the weighted sum of per-block cosines. All features are non-negative, so
+  scores fall in [0, 1].
+- OnnxEmbedder: any image model exported to ONNX (e.g. a CLIP visual tower),
+  enabled with IMAGE_SEARCH_ONNX_MODEL=/path/model.onnx.
+
+The index records the embedder name and refuses to mix vectors from
+different embedders.
+"""
+
+import os
+from typing import Tuple
+
+import numpy as np
+
+DESCRIPTOR_SIZE = 64
+HUE_BINS, SAT_BINS, VAL_BINS = 12, 3, 3
+GRID, ORIENTATIONS = 4, 8
+SILHOUETTE = 8
+# Share of the similarity carried by colour / texture / shape
+BLOCK_WEIGHTS = (0.6, 0.3, 0.1)
+# Pixels this far (RGB distance) from the border colour count as foreground
+BACKGROUND_DISTANCE = 30.0
+MIN_FOREGROUND = 0.05
+
+ONNX_MODEL = os.getenv("IMAGE_SEARCH_ONNX_MODEL", "")
+ONNX_SIZE = int(os.getenv("IMAGE_SEARCH_ONNX_SIZE", "224"))
+# CLIP preprocessing constants
+ONNX_MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+ONNX_STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+
+def load_image(data, size: int) -> np.ndarray:
+    """Bytes or file object -> uint8[size, size, 3], letterboxed on white"""
+    import io
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data)
+    # JPEG: let libjpeg decode at 1/2..1/8 scale instead of full resolution
+    image.draft("RGB", (size * 2, size * 2))
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    image = ImageOps.pad(image.convert("RGB"), (size, size), Image.BILINEAR, color=(255, 255, 255))
+    return np.asarray(image, dtype=np.uint8)
+
+
+def _l2(x: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norm, 1e-12)
+
+
+def _rgb_to_hsv(rgb: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """float[..., 3] in [0, 1] -> h in [0, 1), s, v"""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    v = rgb.max(axis=-1)
+    delta = v - rgb.min(axis=-1)
+    s = np.where(v > 0, delta / np.maximum(v, 1e-12), 0.0)
+    safe = np.maximum(delta, 1e-12)
+    h = np.where(v == r, (g - b) / safe, np.where(v == g, 2.0 + (b - r) / safe, 4.0 + (r - g) / safe))
+    h = np.where(delta > 0, (h / 6.0) % 1.0, 0.0)
+    return h, s, v
+
+
+def _grouped_histogram(bins: np.ndarray, weights: np.ndarray, n_bins: int) -> np.ndarray:
+    """bins/weights: [n, pixels] -> float[n, n_bins] with a single bincount"""
+    n = bins.shape[0]
+    offset = (np.arange(n) * n_bins)[:, None]
+    return np.bincount((bins + offset).ravel(), weights.ravel(), minlength=n * n_bins).reshape(n, n_bins)
+
+
+class DescriptorEmbedder:
+    name = "descriptor-v1"
+    size = DESCRIPTOR_SIZE
+    dim = HUE_BINS * SAT_BINS * VAL_BINS + GRID * GRID * ORIENTATIONS + SILHOUETTE * SILHOUETTE
+
+    def prepare(self, data) -> np.ndarray:
+        return load_image(data, self.size)
+
+    def _foreground(self, rgb: np.ndarray) -> np.ndarray:
+        """Product photos sit on a plain background: mask pixels far from the border colour"""
+        border = np.concatenate([
+            rgb[:, :2].reshape(len(rgb), -1, 3), rgb[:, -2:].reshape(len(rgb), -1, 3),
+            rgb[:, :, :2].reshape(len(rgb), -1, 3), rgb[:, :, -2:].reshape(len(rgb), -1, 3),
+        ], axis=1)
+        background = np.median(border, axis=1)[:, None, None, :]
+        mask = np.linalg.norm(rgb - background, axis=-1) > BACKGROUND_DISTANCE
+        # Nothing stands out (full-bleed photo): use every pixel
+        empty = mask.mean(axis=(1, 2)) < MIN_FOREGROUND
+        mask[empty] = True
+        return mask
+
+    def embed(self, batch: np.ndarray) -> np.ndarray:
+        n = len(batch)
+        rgb = batch.astype(np.float32)
+        mask = self._foreground(rgb).astype(np.float32)
+
+        # Colour: joint HSV histogram of foreground pixels (hue ignored when unsaturated)
+        h, s, v = _rgb_to_hsv(rgb / 255.0)
+        h_bin = np.minimum((h * HUE_BINS).astype(np.int64), HUE_BINS - 1)
+        s_bin = np.minimum((s * SAT_BINS).astype(np.int64), SAT_BINS - 1)
+        v_bin = np.minimum((v * VAL_BINS).astype(np.int64), VAL_BINS - 1)
+        h_bin[s_bin == 0] = 0
+        color_bins = (h_bin * SAT_BINS + s_bin) * VAL_BINS + v_bin
+        color = _grouped_histogram(color_bins.reshape(n, -1), mask.reshape(n, -1), HUE_BINS * SAT_BINS * VAL_BINS)
+        color = np.sqrt(color / np.maximum(color.sum(axis=1, keepdims=True), 1e-12))
+
+        # Texture: magnitude-weighted unsigned gradient orientations per grid cell
+        gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        gx = np.zeros_like(gray)
+        gy = np.zeros_like(gray)
+        gx[:, :, 1:-1] = gray[:, :, 2:] - gray[:, :, :-2]
+        gy[:, 1:-1, :] = gray[:, 2:, :] - gray[:, :-2, :]
+        magnitude = np.hypot(gx, gy)
+        orientation = np.minimum((np.mod(np.arctan2(gy, gx), np.pi) / np.pi * ORIENTATIONS).astype(np.int64), ORIENTATIONS - 1)
+        cell = self.size // GRID
+        rows = (np.arange(self.size) // cell)[:, None]
+        cols = (np.arange(self.size) // cell)[None, :]
+        texture_bins = (rows * GRID + cols) * ORIENTATIONS + orientation
+        texture = _grouped_histogram(texture_bins.reshape(n, -1), magnitude.reshape(n, -1), GRID * GRID * ORIENTATIONS)
+        texture = np.sqrt(texture)
+
+        # Shape: foreground coverage on a coarse grid
+        block = self.size // SILHOUETTE
+        silhouette = mask.reshape(n, SILHOUETTE, block, SILHOUETTE, block).mean(axis=(2, 4)).reshape(n, -1)
+
+        blocks = [_l2(color), _l2(texture), _l2(silhouette)]
+        weighted = [b * np.sqrt(w) for b, w in zip(blocks, BLOCK_WEIGHTS)]
+        return _l2(np.hstack(weighted)).astype(np.float32)
+
+
+class OnnxEmbedder:
+    def __init__(self, model_path: str, size: int = ONNX_SIZE):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = int(os.getenv("IMAGE_SEARCH_THREADS", str(os.cpu_count() or 1)))
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.size = size
+        self.name = f"onnx:{os.path.basename(model_path)}"
+        self.dim = int(self.embed(np.full((1, size, size, 3), 255, dtype=np.uint8)).shape[1])
+
+    def prepare(self, data) -> np.ndarray:
+        return load_image(data, self.size)
+
+    def embed(self, batch: np.ndarray) -> np.ndarray:
+        x = (batch.astype(np.float32) / 255.0 - ONNX_MEAN) / ONNX_STD
+        x = np.ascontiguousarray(x.transpose(0, 3, 1, 2))
+        output = self.session.run(None, {self.input_name: x})[0]
+        return _l2(output.reshape(len(batch), -1).astype(np.float32))
+
+
+_embedder = None
+
+
+def get_embedder():
+    """Process-wide embedder chosen from the environment"""
+    global _embedder
+    if _embedder is None:
+        _embedder = OnnxEmbedder(ONNX_MODEL) if ONNX_MODEL else DescriptorEmbedder()
+    return _embedder
@@ -0,0 +1,357 @@
+"""
+Memory-mapped image vector index with exact and IVF top-K search.
+
+Layout of IMAGE_INDEX_DIR (append-only files, meta.json replaced last):
+
+    vectors.f16        float16[count, dim]   L2-normalized embeddings
+    image_ids.i64      int64[count]          product_images.id
+    product_ids.i64    int64[count]
+    urls.txt           image_url of each row, one per line
+    ivf_centroids.npy  float32[nlist, dim]   optional partitioning
+    ivf_assign.i32     int32[count]          inverted list of each row
+    meta.json          embedder, dim, count, byte sizes, ivf info
+
+Readers only trust the first meta["count"] rows, so a pipeline appending in
+another process never exposes a half-written row; the next append truncates
+whatever a crashed writer left behind. The server reloads when meta.json
+changes (same pattern as actions.recommendations).
+
+Search scores every query against the matrix in chunks (float16 on disk,
+float32 BLAS in memory; catalogs under IMAGE_SEARCH_CACHE_MB keep a float32
+copy) and keeps a running top-K with argpartition. With an IVF partition
+(train_ivf) and at least IVF_MIN_ROWS rows, only the rows of the nprobe
+nearest centroids are scored. Results are one hit per product: the best
+matching image.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMAGE_INDEX_DIR = os.getenv("IMAGE_INDEX_DIR", "data/image_index")
+DEFAULT_TOP_K = 10
+# Image rows fetched per requested product before de-duplicating by product
+CANDIDATE_OVERSAMPLE = 8
+SEARCH_CHUNK_ROWS = 65536
+CACHE_MB = float(os.getenv("IMAGE_SEARCH_CACHE_MB", "512"))
+
+IVF_MIN_ROWS = int(os.getenv("IMAGE_SEARCH_IVF_MIN_ROWS", "50000"))
+IVF_NPROBE = int(os.getenv("IMAGE_SEARCH_NPROBE", "8"))
+IVF_ITERATIONS = 12
+IVF_TRAIN_SAMPLE = 200000
+# Retrain when the index has grown this much since the centroids were fit
+IVF_RETRAIN_GROWTH = 2.0
+
+VECTORS_FILE = "vectors.f16"
+IMAGE_IDS_FILE = "image_ids.i64"
+PRODUCT_IDS_FILE = "product_ids.i64"
+URLS_FILE = "urls.txt"
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGN_FILE = "ivf_assign.i32"
+META_FILE = "meta.json"
+
+
+def default_nlist(count: int) -> int:
+    return int(np.clip(4 * np.sqrt(count), 1, 65536))
+
+
+class IndexSnapshot:
+    """Arrays for the first `count` rows; swapped as a whole on reload"""
+
+    def __init__(self, directory: str, meta: dict):
+        self.meta = meta
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        self.vectors = np.memmap(os.path.join(directory, VECTORS_FILE), dtype=np.float16, mode="r",
+                                 shape=(self.count, self.dim)) if self.count else np.empty((0, meta["dim"]), np.float16)
+        self.product_ids = np.fromfile(os.path.join(directory, PRODUCT_IDS_FILE), dtype=np.int64, count=self.count)
+        with open(os.path.join(directory, URLS_FILE), "rb") as f:
+            self.urls = f.read(meta["urls_bytes"]).decode("utf-8").split("\n")[:self.count]
+        self.products = int(len(np.unique(self.product_ids)))
+
+        self.dense = None
+        if self.count * self.dim * 4 <= CACHE_MB * 1024 * 1024:
+            self.dense = np.asarray(self.vectors, dtype=np.float32)
+
+        self.centroids = None
+        ivf = meta.get("ivf")
+        if ivf and self.count:
+            self.centroids = np.load(os.path.join(directory, CENTROIDS_FILE))
+            assign = np.fromfile(os.path.join(directory, ASSIGN_FILE), dtype=np.int32, count=self.count)
+            self.list_rows = np.argsort(assign, kind="stable")
+            self.list_offsets = np.searchsorted(assign[self.list_rows], np.arange(len(self.centroids) + 1))
+
+    def rows_f32(self, start: int, stop: int) -> np.ndarray:
+        if self.dense is not None:
+            return self.dense[start:stop]
+        return np.asarray(self.vectors[start:stop], dtype=np.float32)
+
+    # ---------- candidate search ----------
+    def exact(self, queries: np.ndarray, n_candidates: int):
+        """Top n_candidates rows for every query: (rows[m, c], scores[m, c]) best first"""
+        m = len(queries)
+        c = min(n_candidates, self.count)
+        best_scores = np.full((m, c), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((m, c), dtype=np.int64)
+        for start in range(0, self.count, SEARCH_CHUNK_ROWS):
+            block = self.rows_f32(start, start + SEARCH_CHUNK_ROWS)
+            scores = queries @ block.T
+            if scores.shape[1] > c:
+                part = np.argpartition(-scores, c - 1, axis=1)[:, :c]
+                scores = np.take_along_axis(scores, part, axis=1)
+                rows = part + start
+            else:
+                rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            merged_scores = np.hstack([best_scores, scores])
+            merged_rows = np.hstack([best_rows, rows])
+            keep = np.argpartition(-merged_scores, c - 1, axis=1)[:, :c]
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def ivf(self, query: np.ndarray, n_candidates: int, nprobe: int):
+        """Score only the rows of the nprobe lists closest to the query"""
+        nprobe = min(nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        rows = np.concatenate([self.list_rows[self.list_offsets[l]:self.list_offsets[l + 1]] for l in probe])
+        if not len(rows):
+            return rows.astype(np.int64), np.empty(0, dtype=np.float32)
+        if self.dense is not None:
+            vectors = self.dense[rows]
+        else:
+            # Sorted gather reads the memmap front to back
+            rows = np.sort(rows)
+            vectors = self.vectors[rows].astype(np.float32)
+        scores = vectors @ query
+        c = min(n_candidates, len(rows))
+        top = np.argpartition(-scores, c - 1)[:c]
+        top = top[np.argsort(-scores[top])]
+        return rows[top].astype(np.int64), scores[top]
+
+
+class ImageIndex:
+    def __init__(self, directory: str = IMAGE_INDEX_DIR):
+        self.directory = directory
+        self._mtime = None
+        self._snapshot: Optional[IndexSnapshot] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def read_meta(self) -> Optional[dict]:
+        try:
+            with open(self._path(META_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: dict):
+        meta["updated_at"] = datetime.now(timezone.utc).isoformat()
+        tmp = self._path(META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, self._path(META_FILE))
+
+    # ====================================
+    # Reading (server)
+    # ====================================
+    def snapshot(self) -> Optional[IndexSnapshot]:
+        """Current snapshot, reloaded when the pipeline published new rows"""
+        try:
+            mtime = os.stat(self._path(META_FILE)).st_mtime
+        except FileNotFoundError:
+            return self._snapshot
+        if mtime != self._mtime:
+            started = time.perf_counter()
+            self._snapshot = IndexSnapshot(self.directory, self.read_meta())
+            self._mtime = mtime
+            logger.info("Loaded image index: %d rows in %.2fs", self._snapshot.count, time.perf_counter() - started)
+        return self._snapshot
+
+    def search(self, queries: np.ndarray, k: int = DEFAULT_TOP_K, exact: Optional[bool] = None,
+               nprobe: int = IVF_NPROBE) -> List[List[Dict]]:
+        """Best matching products for each query row: [[{product_id, image_url, similarity_score}]]"""
+        snap = self.snapshot()
+        if snap is None or snap.count == 0:
+            return [[] for _ in range(len(queries))]
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if exact is None:
+            use_ivf = snap.centroids is not None and snap.count >= IVF_MIN_ROWS
+        else:
+            use_ivf = not exact and snap.centroids is not None
+
+        results: List[Optional[List[Dict]]] = [None] * len(queries)
+        pending = np.arange(len(queries))
+        n_candidates = k * CANDIDATE_OVERSAMPLE
+        while len(pending):
+            if use_ivf:
+                candidates = [snap.ivf(queries[i], n_candidates, nprobe) for i in pending]
+            else:
+                rows, scores = snap.exact(queries[pending], n_candidates)
+                candidates = list(zip(rows, scores))
+            retry = []
+            for i, (rows, scores) in zip(pending, candidates):
+                hits = self._per_product(snap, rows, scores, k)
+                # Few products own all the candidates: widen once more unless everything was scored
+                if len(hits) < k and len(rows) == n_candidates and n_candidates < snap.count:
+                    retry.append(i)
+                else:
+                    results[i] = hits
+            pending = np.array(retry, dtype=np.int64)
+            n_candidates *= 4
+        return results
+
+    @staticmethod
+    def _per_product(snap: IndexSnapshot, rows: np.ndarray, scores: np.ndarray, k: int) -> List[Dict]:
+        """Keep the best image of each product, rows already sorted by score"""
+        _, first = np.unique(snap.product_ids[rows], return_index=True)
+        keep = np.sort(first)[:k]
+        return [
+            {
+                "product_id": int(snap.product_ids[rows[j]]),
+                "image_url": snap.urls[rows[j]],
+                "similarity_score": round(float(np.clip(scores[j], 0.0, 1.0)), 4),
+            }
+            for j in keep
+        ]
+
+    def describe(self) -> dict:
+        snap = self.snapshot()
+        meta = snap.meta if snap else {}
+        return {
+            "images": snap.count if snap else 0,
+            "products": snap.products if snap else 0,
+            "embedder": meta.get("embedder"),
+            "dim": meta.get("dim"),
+            "ivf_lists": (meta.get("ivf") or {}).get("nlist"),
+            "updated_at": meta.get("updated_at"),
+        }
+
+    # ====================================
+    # Writing (pipeline)
+    # ====================================
+    def indexed_image_ids(self) -> np.ndarray:
+        meta = self.read_meta()
+        if not meta:
+            return np.empty(0, dtype=np.int64)
+        return np.fromfile(self._path(IMAGE_IDS_FILE), dtype=np.int64, count=meta["count"])
+
+    def reset(self):
+        """Drop every row (full rebuild)"""
+        os.makedirs(self.directory, exist_ok=True)
+        for name in (META_FILE, VECTORS_FILE, IMAGE_IDS_FILE, PRODUCT_IDS_FILE, URLS_FILE, CENTROIDS_FILE, ASSIGN_FILE):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+
+    def _truncate(self, meta: dict):
+        """Cut off rows a crashed append wrote after the last published meta"""
+        count, dim = meta["count"], meta["dim"]
+        sizes = {
+            VECTORS_FILE: count * dim * 2,
+            IMAGE_IDS_FILE: count * 8,
+            PRODUCT_IDS_FILE: count * 8,
+            URLS_FILE: meta["urls_bytes"],
+        }
+        if meta.get("ivf"):
+            sizes[ASSIGN_FILE] = count * 4
+        for name, size in sizes.items():
+            path = self._path(name)
+            if not os.path.exists(path):
+                open(path, "wb").close()
+            if os.path.getsize(path) != size:
+                os.truncate(path, size)
+
+    def append(self, embedder_name: str, image_ids: Sequence[int], product_ids: Sequence[int],
+               urls: Sequence[str], vectors: np.ndarray) -> int:
+        """Append rows and publish them; returns the new row count"""
+        os.makedirs(self.directory, exist_ok=True)
+        meta = self.read_meta() or {
+            "embedder": embedder_name, "dim": int(vectors.shape[1]), "count": 0, "urls_bytes": 0, "ivf": None,
+        }
+        if meta["embedder"] != embedder_name or meta["dim"] != vectors.shape[1]:
+            raise ValueError(
+                f"index was built with {meta['embedder']} ({meta['dim']}d), got {embedder_name} "
+                f"({vectors.shape[1]}d); rebuild the index"
+            )
+        self._truncate(meta)
+        if not len(vectors):
+            return meta["count"]
+
+        with open(self._path(VECTORS_FILE), "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float16).tobytes())
+        with open(self._path(IMAGE_IDS_FILE), "ab") as f:
+            f.write(np.asarray(image_ids, dtype=np.int64).tobytes())
+        with open(self._path(PRODUCT_IDS_FILE), "ab") as f:
+            f.write(np.asarray(product_ids, dtype=np.int64).tobytes())
+        url_bytes = "".join(url + "\n" for url in urls).encode("utf-8")
+        with open(self._path(URLS_FILE), "ab") as f:
+            f.write(url_bytes)
+        if meta.get("ivf"):
+            centroids = np.load(self._path(CENTROIDS_FILE))
+            with open(self._path(ASSIGN_FILE), "ab") as f:
+                f.write(_assign(np.asarray(vectors, dtype=np.float32), centroids).tobytes())
+
+        meta["count"] += len(vectors)
+        meta["urls_bytes"] += len(url_bytes)
+        self._write_meta(meta)
+        return meta["count"]
+
+    def needs_ivf_training(self) -> bool:
+        meta = self.read_meta()
+        if not meta or meta["count"] < IVF_MIN_ROWS:
+            return False
+        ivf = meta.get("ivf")
+        return not ivf or meta["count"] >= ivf["trained_rows"] * IVF_RETRAIN_GROWTH
+
+    def train_ivf(self, nlist: Optional[int] = None, iterations: int = IVF_ITERATIONS,
+                  sample: int = IVF_TRAIN_SAMPLE, seed: int = 0) -> dict:
+        """Spherical k-means over a sample, then assign every row to its nearest centroid"""
+        meta = self.read_meta()
+        if not meta or not meta["count"]:
+            raise ValueError("index is empty")
+        started = time.perf_counter()
+        count, dim = meta["count"], meta["dim"]
+        vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.float16, mode="r", shape=(count, dim))
+        nlist = min(nlist or default_nlist(count), count)
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(count, size=min(sample, count), replace=False))
+        x = vectors[sample_rows].astype(np.float32)
+        centroids = x[rng.choice(len(x), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = _assign(x, centroids)
+            order = np.argsort(assign, kind="stable")
+            lists, starts = np.unique(assign[order], return_index=True)
+            sums = np.add.reduceat(x[order], starts, axis=0)
+            centroids[lists] = sums
+            # Empty lists restart from random sample points
+            empty = np.setdiff1d(np.arange(nlist), lists)
+            if len(empty):
+                centroids[empty] = x[rng.choice(len(x), size=len(empty), replace=False)]
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        assign = np.concatenate([
+            _assign(np.asarray(vectors[start:start + SEARCH_CHUNK_ROWS], dtype=np.float32), centroids)
+            for start in range(0, count, SEARCH_CHUNK_ROWS)
+        ])
+        np.save(self._path(CENTROIDS_FILE), centroids.astype(np.float32))
+        assign.astype(np.int32).tofile(self._path(ASSIGN_FILE))
+        meta["ivf"] = {"nlist": int(nlist), "trained_rows": int(count)}
+        self._write_meta(meta)
+        sizes = np.bincount(assign, minlength=nlist)
+        logger.info("Trained IVF: %d lists over %d rows (largest %d) in %.1fs",
+                    nlist, count, int(sizes.max()), time.perf_counter() - started)
+        return meta["ivf"]
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmax(x @ centroids.T, axis=1).astype(np.int32)
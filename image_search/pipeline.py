@@ -0,0 +1,154 @@
+"""
+Embed product images into the image index (offline job, run from cron or after seeding).
+
+    python -m image_search.pipeline build        # rebuild from every product_images row
+    python -m image_search.pipeline update       # embed only images not in the index yet
+    python -m image_search.pipeline train-ivf    # (re)partition the index for large catalogs
+
+Reads product_images joined to active products (DATABASE_URL), keeps one row
+per (product, image_url) since every size variant of a colour repeats the
+same photos, downloads each distinct URL once on a thread pool that also
+decodes/resizes (embedder.prepare), then embeds whole batches at once and
+appends them to the index. The server picks new rows up without restarting.
+
+Images that fail to download are skipped and retried by the next `update`
+(rows are matched by product_images.id). Deleted products stay in the index
+until the next `build`; the backend already filters them out of results.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from image_search.features import get_embedder
+from image_search.index import IMAGE_INDEX_DIR, ImageIndex
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_WORKERS = int(os.getenv("IMAGE_SEARCH_DOWNLOAD_WORKERS", "16"))
+EMBED_BATCH_SIZE = 256
+DOWNLOAD_TIMEOUT = 20
+
+_local = threading.local()
+
+
+def fetch_images(conn) -> List[Tuple[int, int, str]]:
+    """[(image_id, product_id, image_url)] for active products, one per (product, url)"""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT MIN(pi.id), pv.product_id, pi.image_url
+        FROM product_images pi
+        JOIN product_variants pv ON pv.id = pi.variant_id
+        JOIN products p ON p.id = pv.product_id
+        WHERE p.deleted_at IS NULL AND pi.image_url <> ''
+        GROUP BY pv.product_id, pi.image_url
+        ORDER BY 1
+    """)
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def _session():
+    import requests
+
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _load(embedder, url: str) -> Optional[np.ndarray]:
+    try:
+        response = _session().get(url, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return embedder.prepare(response.content)
+    except Exception as e:
+        logger.warning("Skipping %s: %s", url, e)
+        return None
+
+
+def embed_rows(embedder, rows: List[Tuple[int, int, str]], workers: int = DOWNLOAD_WORKERS,
+               batch_size: int = EMBED_BATCH_SIZE) -> Iterator[Tuple[List[Tuple[int, int, str]], np.ndarray]]:
+    """Yield (rows, vectors[len(rows), dim]) per batch of distinct URLs"""
+    by_url: Dict[str, List[Tuple[int, int, str]]] = {}
+    for row in rows:
+        by_url.setdefault(row[2], []).append(row)
+    urls = list(by_url)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(urls), batch_size):
+            batch_urls = urls[start:start + batch_size]
+            arrays = list(pool.map(lambda url: _load(embedder, url), batch_urls))
+            ok = [i for i, array in enumerate(arrays) if array is not None]
+            if not ok:
+                continue
+            vectors = embedder.embed(np.stack([arrays[i] for i in ok]))
+            batch_rows, row_vectors = [], []
+            for i, vector in zip(ok, vectors):
+                for row in by_url[batch_urls[i]]:
+                    batch_rows.append(row)
+                    row_vectors.append(vector)
+            yield batch_rows, np.vstack(row_vectors)
+
+
+def run_pipeline(mode: str, directory: str = IMAGE_INDEX_DIR, database_url: Optional[str] = None,
+                 workers: int = DOWNLOAD_WORKERS, batch_size: int = EMBED_BATCH_SIZE) -> dict:
+    import psycopg2
+
+    index = ImageIndex(directory)
+    if mode == "train-ivf":
+        return index.train_ivf()
+
+    started = time.perf_counter()
+    embedder = get_embedder()
+    if mode == "build":
+        index.reset()
+
+    conn = psycopg2.connect(database_url or os.environ["DATABASE_URL"])
+    try:
+        rows = fetch_images(conn)
+    finally:
+        conn.close()
+    indexed = index.indexed_image_ids()
+    rows = [row for row, done in zip(rows, np.isin([r[0] for r in rows], indexed)) if not done]
+    logger.info("%s: %d images to embed (%d already indexed)", mode, len(rows), len(indexed))
+
+    added = 0
+    for batch_rows, vectors in embed_rows(embedder, rows, workers, batch_size):
+        image_ids, product_ids, urls = zip(*batch_rows)
+        total = index.append(embedder.name, image_ids, product_ids, urls, vectors)
+        added += len(batch_rows)
+        logger.info("Indexed %d/%d (%d rows, %.0f img/s)", added, len(rows), total,
+                    added / max(time.perf_counter() - started, 1e-9))
+
+    if index.needs_ivf_training():
+        index.train_ivf()
+    summary = index.describe()
+    logger.info("%s: +%d images in %.1fs -> %s", mode, added, time.perf_counter() - started, summary)
+    return summary
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%H:%M:%S")
+    parser = argparse.ArgumentParser(description="Embed product images for image search")
+    parser.add_argument("mode", choices=["build", "update", "train-ivf"])
+    parser.add_argument("--dir", default=IMAGE_INDEX_DIR)
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.mode != "train-ivf" and "DATABASE_URL" not in os.environ:
+        logger.error("DATABASE_URL is not set")
+        sys.exit(1)
+    run_pipeline(args.mode, args.dir, workers=args.workers, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
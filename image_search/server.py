@@ -0,0 +1,121 @@
+"""
+Image search HTTP service: the contract src/modules/chat/image-search.service.ts calls.
+
+    uvicorn image_search.server:app --host 0.0.0.0 --port 8000
+
+POST /search        multipart "file" (+ ?top_k=, ?exact=) with X-API-Key
+                    -> {"results": [{"product_id", "image_url", "similarity_score"}], "query_time_ms"}
+POST /search/batch  multipart "files" (several images) -> {"results": [[...], ...]}
+GET  /health        index stats, no key needed (ImageSearchService.healthCheck)
+
+One result per product (its best matching image), best first. Errors are
+{"message": ...} with a 4xx/5xx status, which the backend forwards as the
+HttpException message. The key is only checked when IMAGE_SEARCH_API_KEY is
+set, same variable the backend sends.
+
+Endpoints are sync functions, so FastAPI runs them on its thread pool; image
+decoding in Pillow and the numpy matrix products release the GIL.
+"""
+
+import os
+import hmac
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import numpy as np
+from fastapi import FastAPI, File, Header, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse
+
+from image_search.features import get_embedder
+from image_search.index import DEFAULT_TOP_K, IMAGE_INDEX_DIR, IVF_NPROBE, ImageIndex
+
+logger = logging.getLogger(__name__)
+
+API_KEY = os.getenv("IMAGE_SEARCH_API_KEY", "")
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_TOP_K = 100
+MAX_BATCH = 32
+
+index = ImageIndex(os.getenv("IMAGE_INDEX_DIR", IMAGE_INDEX_DIR))
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Load the index and embedder before the first request pays for it
+    get_embedder()
+    stats = index.describe()
+    if not stats["images"]:
+        logger.warning("Image index at %s is empty; run python -m image_search.pipeline build", index.directory)
+    yield
+
+
+app = FastAPI(title="Image Search Service", lifespan=lifespan)
+
+
+@app.exception_handler(HTTPException)
+async def http_error(_request, exc: HTTPException):
+    return JSONResponse({"message": exc.detail}, status_code=exc.status_code)
+
+
+def _check_key(api_key: Optional[str]):
+    if API_KEY and not hmac.compare_digest(api_key or "", API_KEY):
+        raise HTTPException(401, "Invalid API key")
+
+
+def _read_images(files: List[UploadFile]) -> np.ndarray:
+    embedder = get_embedder()
+    arrays = []
+    for upload in files:
+        data = upload.file.read(MAX_IMAGE_BYTES + 1)
+        if len(data) > MAX_IMAGE_BYTES:
+            raise HTTPException(413, f"{upload.filename}: image larger than {MAX_IMAGE_BYTES // (1024 * 1024)}MB")
+        try:
+            arrays.append(embedder.prepare(data))
+        except Exception:
+            raise HTTPException(400, f"{upload.filename}: not a readable image")
+    return embedder.embed(np.stack(arrays))
+
+
+def _search(files: List[UploadFile], top_k: int, exact: Optional[bool], nprobe: int):
+    snap = index.snapshot()
+    if snap is None or not snap.count:
+        raise HTTPException(503, "Image index is not built yet")
+    queries = _read_images(files)
+    return index.search(queries, top_k, exact=exact, nprobe=nprobe)
+
+
+@app.post("/search")
+def search(
+    file: UploadFile = File(...),
+    top_k: int = Query(DEFAULT_TOP_K, ge=1, le=MAX_TOP_K),
+    exact: Optional[bool] = Query(None, description="force exact (true) or IVF (false) search"),
+    nprobe: int = Query(IVF_NPROBE, ge=1),
+    x_api_key: Optional[str] = Header(None),
+):
+    _check_key(x_api_key)
+    started = time.perf_counter()
+    results = _search([file], top_k, exact, nprobe)[0]
+    return {"results": results, "query_time_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+@app.post("/search/batch")
+def search_batch(
+    files: List[UploadFile] = File(...),
+    top_k: int = Query(DEFAULT_TOP_K, ge=1, le=MAX_TOP_K),
+    exact: Optional[bool] = Query(None),
+    nprobe: int = Query(IVF_NPROBE, ge=1),
+    x_api_key: Optional[str] = Header(None),
+):
+    _check_key(x_api_key)
+    if len(files) > MAX_BATCH:
+        raise HTTPException(400, f"At most {MAX_BATCH} images per request")
+    started = time.perf_counter()
+    results = _search(files, top_k, exact, nprobe)
+    return {"results": results, "query_time_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", **index.describe()}
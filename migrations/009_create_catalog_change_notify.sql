@@ -0,0 +1,102 @@
+-- ========== MIGRATION: CATALOG CHANGE NOTIFICATIONS ==========
+-- Run date: 2026-10-19
+-- Purpose: pg_notify('catalog_changes', ...) on every change to products,
+--          product_variants, promotions and promotion_products so the Rasa
+--          action server (actions/catalog_changes.py) can invalidate its
+--          catalog index and search cache right away instead of polling.
+--
+-- Payload (JSON, < 200 bytes): {"t": table, "op": "INSERT|UPDATE|DELETE", "id": row id, "p": product id or null}
+-- A change to a promotions row also sends one notification per product linked
+-- through promotion_products (same "t"/"id", "p" = that product), because the
+-- price of every one of them may have changed.
+-- Postgres drops duplicate payloads within one transaction, so a bulk stock
+-- update of one variant inside a transaction sends a single notification.
+
+-- 1. Notify function shared by all catalog tables
+CREATE OR REPLACE FUNCTION notify_catalog_change()
+RETURNS TRIGGER AS $$
+DECLARE
+  row_data RECORD;
+  product_id BIGINT;
+BEGIN
+  -- Skip UPDATEs that did not change anything
+  IF TG_OP = 'UPDATE' AND OLD IS NOT DISTINCT FROM NEW THEN
+    RETURN NULL;
+  END IF;
+
+  IF TG_OP = 'DELETE' THEN
+    row_data := OLD;
+  ELSE
+    row_data := NEW;
+  END IF;
+
+  IF TG_TABLE_NAME = 'products' THEN
+    product_id := row_data.id;
+  ELSIF TG_TABLE_NAME IN ('product_variants', 'promotion_products') THEN
+    product_id := row_data.product_id;
+  ELSE
+    product_id := NULL;
+  END IF;
+
+  IF TG_TABLE_NAME = 'promotions' THEN
+    PERFORM pg_notify(
+      'catalog_changes',
+      json_build_object('t', TG_TABLE_NAME, 'op', TG_OP, 'id', row_data.id, 'p', pp.product_id)::text
+    )
+    FROM promotion_products pp
+    WHERE pp.promotion_id = row_data.id;
+  END IF;
+
+  PERFORM pg_notify(
+    'catalog_changes',
+    json_build_object('t', TG_TABLE_NAME, 'op', TG_OP, 'id', row_data.id, 'p', product_id)::text
+  );
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 2. Triggers
+DROP TRIGGER IF EXISTS trigger_notify_catalog_products ON products;
+CREATE TRIGGER trigger_notify_catalog_products
+AFTER INSERT OR UPDATE OR DELETE ON products
+FOR EACH ROW
+EXECUTE FUNCTION notify_catalog_change();
+
+DROP TRIGGER IF EXISTS trigger_notify_catalog_variants ON product_variants;
+CREATE TRIGGER trigger_notify_catalog_variants
+AFTER INSERT OR UPDATE OR DELETE ON product_variants
+FOR EACH ROW
+EXECUTE FUNCTION notify_catalog_change();
+
+DROP TRIGGER IF EXISTS trigger_notify_catalog_promotions ON promotions;
+CREATE TRIGGER trigger_notify_catalog_promotions
+AFTER INSERT OR UPDATE OR DELETE ON promotions
+FOR EACH ROW
+EXECUTE FUNCTION notify_catalog_change();
+
+DROP TRIGGER IF EXISTS trigger_notify_catalog_promotion_products ON promotion_products;
+CREATE TRIGGER trigger_notify_catalog_promotion_products
+AFTER INSERT OR UPDATE OR DELETE ON promotion_products
+FOR EACH ROW
+EXECUTE FUNCTION notify_catalog_change();
+
+-- 3. Verify triggers
+SELECT
+  trigger_name,
+  event_manipulation,
+  event_object_table
+FROM information_schema.triggers
+WHERE trigger_name LIKE 'trigger_notify_catalog_%';
+
+-- Test (in psql):
+--   LISTEN catalog_changes;
+--   UPDATE product_variants SET total_stock = total_stock WHERE id = 1;  -- no-op, no notification
+--   UPDATE product_variants SET total_stock = total_stock + 1 WHERE id = 1;
+--   UPDATE promotions SET discount_value = discount_value + 1 WHERE id = 1;  -- one per product + p = null
+
+-- ========== ROLLBACK SCRIPT ==========
+-- DROP TRIGGER IF EXISTS trigger_notify_catalog_products ON products;
+-- DROP TRIGGER IF EXISTS trigger_notify_catalog_variants ON product_variants;
+-- DROP TRIGGER IF EXISTS trigger_notify_catalog_promotions ON promotions;
+-- DROP TRIGGER IF EXISTS trigger_notify_catalog_promotion_products ON promotion_products;
+-- DROP FUNCTION IF EXISTS notify_catalog_change();
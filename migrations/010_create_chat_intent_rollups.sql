@@ -0,0 +1,42 @@
+-- ========== MIGRATION: CHAT INTENT ROLLUPS ==========
+-- Run date: 2026-10-19
+-- Purpose: Daily per-intent aggregates of chat_messages, written by
+--          `python -m actions.intent_analytics` so dashboards do not scan the
+--          message log.
+
+-- 1. Rollup: one row per (day, intent), days in Vietnam time (UTC+7)
+CREATE TABLE IF NOT EXISTS chat_intent_daily (
+  day DATE NOT NULL,
+  intent VARCHAR(255) NOT NULL,
+  turns INT NOT NULL DEFAULT 0,              -- bot replies to a customer message
+  bot_messages INT NOT NULL DEFAULT 0,
+  fallbacks INT NOT NULL DEFAULT 0,          -- turns answered by a fallback intent
+  handoffs INT NOT NULL DEFAULT 0,           -- sessions taken over by an admin after this intent
+  response_ms_sum BIGINT NOT NULL DEFAULT 0,
+  response_ms_max INT NOT NULL DEFAULT 0,
+  -- Turn counts with response time <= 250, 500, 1000, 2000, 5000, 10000, +Inf ms
+  response_ms_hist INT[] NOT NULL DEFAULT '{0,0,0,0,0,0,0}',
+  PRIMARY KEY (day, intent)
+);
+
+-- 2. Job watermark + per-session carry state (sessions still open at the end of a run)
+CREATE TABLE IF NOT EXISTS analytics_watermarks (
+  job VARCHAR(100) PRIMARY KEY,
+  last_id BIGINT NOT NULL DEFAULT 0,
+  state JSONB NOT NULL DEFAULT '{}',
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+-- 3. Example dashboard queries
+-- Fallback / handoff rate per intent, last 7 days:
+--   SELECT intent, SUM(turns) AS turns,
+--          ROUND(SUM(fallbacks)::numeric / NULLIF(SUM(turns), 0), 4) AS fallback_rate,
+--          ROUND(SUM(handoffs)::numeric / NULLIF(SUM(turns), 0), 4) AS handoff_rate,
+--          ROUND(SUM(response_ms_sum)::numeric / NULLIF(SUM(turns), 0)) AS avg_response_ms
+--   FROM chat_intent_daily
+--   WHERE day >= CURRENT_DATE - 7
+--   GROUP BY intent ORDER BY turns DESC;
+
+-- ========== ROLLBACK SCRIPT ==========
+-- DROP TABLE IF EXISTS chat_intent_daily;
+-- DROP TABLE IF EXISTS analytics_watermarks;
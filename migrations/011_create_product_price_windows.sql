@@ -0,0 +1,65 @@
+-- ========== MIGRATION: PRECOMPUTED PRODUCT PRICES ==========
+-- Run date: 2026-10-19
+-- Purpose: Effective best price of every product per time window across all
+--          overlapping active / scheduled promotions, written by
+--          `python -m actions.promotion_pricing`, so top-discount and listing
+--          queries read one indexed row per product instead of re-deriving
+--          prices from promotions + promotion_products on every request.
+--
+-- Windows of one product never overlap and cover the whole timeline from the
+-- last refresh on: for any time t there is exactly one row with
+-- valid_from <= t < valid_to. Windows without a winning promotion carry the
+-- selling price (promotion_id NULL). Variants have no price of their own, so
+-- variant prices come from the product row (current_variant_prices).
+
+-- 1. Price windows
+CREATE TABLE IF NOT EXISTS product_price_windows (
+  product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+  valid_from TIMESTAMP WITH TIME ZONE NOT NULL,   -- '-infinity' before the first promotion
+  valid_to TIMESTAMP WITH TIME ZONE NOT NULL,     -- 'infinity' after the last one
+  promotion_id BIGINT,                            -- NULL = selling price wins
+  promotion_type VARCHAR(50),
+  list_price NUMERIC NOT NULL,                    -- GREATEST(cost_price, selling_price), the struck-through price
+  selling_price NUMERIC NOT NULL,
+  effective_price NUMERIC NOT NULL,
+  discount_percent NUMERIC(5, 2) NOT NULL,        -- (list_price - effective_price) / list_price * 100
+  fingerprint BIGINT NOT NULL,                    -- hash of the product's pricing inputs (incremental refresh)
+  PRIMARY KEY (product_id, valid_from)
+);
+
+-- Top discounts: walk discount_percent descending, window check on the same index
+CREATE INDEX IF NOT EXISTS idx_product_price_windows_discount
+  ON product_price_windows (discount_percent DESC, valid_from, valid_to);
+
+-- Listings "on sale now": rows with a promotion, by window end
+CREATE INDEX IF NOT EXISTS idx_product_price_windows_promotion
+  ON product_price_windows (valid_to, valid_from) WHERE promotion_id IS NOT NULL;
+
+-- 2. Current prices
+CREATE OR REPLACE VIEW current_product_prices AS
+SELECT product_id, promotion_id, promotion_type, list_price, selling_price, effective_price,
+       discount_percent, valid_from, valid_to
+FROM product_price_windows
+WHERE valid_from <= now() AND valid_to > now();
+
+CREATE OR REPLACE VIEW current_variant_prices AS
+SELECT pv.id AS variant_id, cp.*
+FROM product_variants pv
+JOIN current_product_prices cp ON cp.product_id = pv.product_id;
+
+-- 3. Example reads
+-- Top discounts (/internal/promotions/top-discounts):
+--   SELECT cp.*, p.name, p.slug, p.thumbnail_url
+--   FROM current_product_prices cp JOIN products p ON p.id = cp.product_id
+--   WHERE cp.discount_percent > 0 AND p.status = 'active' AND p.deleted_at IS NULL
+--   ORDER BY cp.discount_percent DESC LIMIT 20;
+-- Prices for a listing page:
+--   SELECT * FROM current_product_prices WHERE product_id = ANY($1);
+-- Price at a future time (scheduled promotions):
+--   SELECT * FROM product_price_windows
+--   WHERE product_id = $1 AND valid_from <= $2 AND valid_to > $2;
+
+-- ========== ROLLBACK SCRIPT ==========
+-- DROP VIEW IF EXISTS current_variant_prices;
+-- DROP VIEW IF EXISTS current_product_prices;
+-- DROP TABLE IF EXISTS product_price_windows;
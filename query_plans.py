@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression harness cho các query nóng của backend
+
+    python query_plans.py --scales 1,5,20                 # seed dần lên từng scale, EXPLAIN catalog
+    python query_plans.py --no-seed --baseline plans.json # chỉ đo trên data hiện có, so với lần trước
+    python query_plans.py --scales 1,10 --candidates all  # thử thêm các index ứng viên (pg_trgm, ...)
+
+Với mỗi scale factor:
+1. Bơm data tới SCALE_ROWS x scale: customers (seed_customers), products / orders /
+   order_items / chat_sessions / chat_messages (INSERT ... SELECT generate_series,
+   nhân bản từ data seed thật), product_reviews (review_generator), rồi ANALYZE
+2. Chạy QUERIES (SQL tương đương TypeORM trong products / admin / orders / chat
+   service) bằng EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON), lấy median thời gian
+3. Ghi plan shape (cây node + bảng + index), đánh dấu:
+   - seq_scan   Seq Scan đọc >= SEQ_SCAN_MIN_ROWS dòng
+   - plan_flip  shape khác scale trước / khác baseline cùng scale
+   - slower     chậm hơn baseline quá REGRESSION_RATIO lần
+4. --candidates: tạo từng index ứng viên trong 1 transaction, chạy lại các query
+   liên quan rồi ROLLBACK -> biết index có được dùng và nhanh hơn bao nhiêu
+   trước khi viết migration
+
+Data seed dùng chung get_db_connection() với seed_data.py: chạy trên DB test.
+Kết quả ghi ra --out (JSON) để làm baseline cho lần sau.
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+
+from seed_data import log, get_db_connection
+
+# ==================== CONFIG ====================
+# Số dòng mỗi bảng ở scale 1
+SCALE_ROWS = {
+    "customers": 2000,
+    "products": 1000,
+    "orders": 20000,
+    "chat_sessions": 5000,
+    "chat_messages": 100000,
+    "product_reviews": 20000,
+}
+SEQ_SCAN_MIN_ROWS = 10000
+REGRESSION_RATIO = 2.0
+DEFAULT_REPEAT = 5
+DEFAULT_OUT = "query_plans.json"
+
+# Bơm thêm %(n)s dòng, nhân bản vòng tròn từ các dòng sẵn có
+GROW_SQL = {
+    "products": """
+        WITH src AS (
+            SELECT row_number() OVER (ORDER BY id) - 1 AS k, * FROM products WHERE deleted_at IS NULL
+        ), base AS (SELECT COUNT(*) AS total, COALESCE(MAX(id), 0) AS max_id FROM products)
+        INSERT INTO products (
+            category_id, name, slug, description, cost_price, selling_price,
+            status, thumbnail_url, average_rating, total_reviews, attributes, created_at
+        )
+        SELECT src.category_id,
+               src.name || ' ' || (ARRAY['Basic', 'Premium', 'Oversize', 'Slimfit', 'Cotton', 'Form rộng', 'Mới'])[1 + g %% 7],
+               src.slug || '-p' || (base.max_id + g),
+               src.description, src.cost_price, src.selling_price * (0.8 + random() * 0.4),
+               CASE WHEN random() < 0.9 THEN 'active' ELSE 'inactive' END,
+               src.thumbnail_url, round((3 + random() * 2)::numeric, 1), 0, src.attributes,
+               now() - random() * interval '365 days'
+        FROM generate_series(1, %(n)s) g
+        CROSS JOIN base
+        JOIN src ON src.k = g %% (SELECT COUNT(*) FROM src)
+    """,
+    "orders": """
+        WITH customers_k AS (
+            SELECT row_number() OVER (ORDER BY id) - 1 AS k, id, email FROM customers
+        ), variants_k AS (
+            SELECT row_number() OVER (ORDER BY id) - 1 AS k, id FROM product_variants
+        ), base AS (SELECT COALESCE(MAX(id), 0) AS max_id FROM orders),
+        new_orders AS (
+            INSERT INTO orders (
+                customer_id, customer_email, shipping_address, shipping_phone, shipping_city,
+                shipping_district, shipping_ward, fulfillment_status, payment_status,
+                payment_method, shipping_fee, total_amount, created_at, order_number
+            )
+            SELECT c.id, c.email, (1 + g %% 500) || ' Lê Lợi', '0900000000', 'Thành phố Hồ Chí Minh',
+                   'Quận 1', 'Phường Bến Nghé',
+                   (ARRAY['pending', 'pending', 'confirmed', 'processing', 'shipping',
+                          'delivered', 'delivered', 'delivered', 'delivered', 'cancelled'])[1 + floor(random() * 10)::int],
+                   'unpaid', 'cod', 30000, 100000 + floor(random() * 2000000),
+                   now() - random() * interval '365 days', 'PLAN' || (base.max_id + g)
+            FROM generate_series(1, %(n)s) g
+            CROSS JOIN base
+            JOIN customers_k c ON c.k = (g * 7919) %% (SELECT COUNT(*) FROM customers_k)
+            RETURNING id
+        )
+        INSERT INTO order_items (order_id, variant_id, quantity, price_at_purchase)
+        SELECT o.id, v.id, 1 + o.id %% 2, 199000
+        FROM new_orders o
+        JOIN variants_k v ON v.k = o.id %% (SELECT COUNT(*) FROM variants_k)
+    """,
+    "chat_sessions": """
+        WITH customers_k AS (SELECT row_number() OVER (ORDER BY id) - 1 AS k, id FROM customers)
+        INSERT INTO chat_sessions (customer_id, visitor_id, status, created_at, updated_at)
+        SELECT CASE WHEN g %% 5 < 3 THEN c.id END,
+               CASE WHEN g %% 5 >= 3 THEN 'visitor_' || md5(g::text || random()::text) END,
+               (ARRAY['bot', 'bot', 'bot', 'closed', 'human_pending', 'human_active'])[1 + g %% 6],
+               t.created_at, t.created_at + random() * interval '2 hours'
+        FROM generate_series(1, %(n)s) g
+        JOIN customers_k c ON c.k = (g * 104729) %% (SELECT COUNT(*) FROM customers_k)
+        -- tham chiếu g để random() được tính lại cho từng dòng
+        CROSS JOIN LATERAL (SELECT now() - random() * interval '180 days' + g * interval '0 second' AS created_at) t
+    """,
+    "chat_messages": """
+        WITH sessions_k AS (
+            SELECT row_number() OVER (ORDER BY id) - 1 AS k, id, created_at FROM chat_sessions
+        )
+        INSERT INTO chat_messages (session_id, sender, message, intent, is_read, created_at)
+        SELECT s.id,
+               CASE WHEN g %% 2 = 0 THEN 'customer' ELSE 'bot' END,
+               'Tin nhắn thử số ' || g,
+               CASE WHEN g %% 2 = 1 THEN (ARRAY['search_product', 'ask_size', 'check_order', 'greet',
+                                                 'nlu_fallback', 'ask_promotion'])[1 + (g / 2) %% 6] END,
+               true, s.created_at + (g / (SELECT COUNT(*) FROM sessions_k)) * interval '20 seconds'
+        FROM generate_series(1, %(n)s) g
+        JOIN sessions_k s ON s.k = g %% (SELECT COUNT(*) FROM sessions_k)
+    """,
+}
+
+# ==================== QUERY CATALOG ====================
+# sql: tham số %(name)s; params: query (không tham số, '%' viết thường) lấy tham số ổn định (không random) từ data hiện tại
+QUERIES = [
+    {
+        "name": "product_search",
+        "source": "products.service.ts findAll(search)",
+        "sql": """
+            SELECT product.*, category.name AS category_name
+            FROM products product
+            LEFT JOIN categories category ON category.id = product.category_id
+            WHERE product.status = 'active' AND product.deleted_at IS NULL
+              AND (unaccent(product.name) ILIKE unaccent(%(search)s)
+                   OR unaccent(product.description) ILIKE unaccent(%(search)s)
+                   OR product.slug ILIKE %(search)s)
+            ORDER BY product.created_at DESC
+            LIMIT 20
+        """,
+        "params": "SELECT '%ao thun%' AS search",
+    },
+    {
+        "name": "product_search_count",
+        "source": "products.service.ts findAll(search) getManyAndCount",
+        "sql": """
+            SELECT COUNT(DISTINCT product.id)
+            FROM products product
+            LEFT JOIN categories category ON category.id = product.category_id
+            WHERE product.status = 'active' AND product.deleted_at IS NULL
+              AND (unaccent(product.name) ILIKE unaccent(%(search)s)
+                   OR unaccent(product.description) ILIKE unaccent(%(search)s)
+                   OR product.slug ILIKE %(search)s)
+        """,
+        "params": "SELECT '%ao thun%' AS search",
+    },
+    {
+        "name": "product_name_search",
+        "source": "products.service.ts searchByName (chatbot)",
+        "sql": """
+            SELECT product.id, product.name, product.slug, product.selling_price
+            FROM products product
+            WHERE product.status = 'active' AND product.deleted_at IS NULL
+              AND unaccent(product.name) ILIKE unaccent(%(name)s)
+            LIMIT 10
+        """,
+        "params": "SELECT '%quần jean%' AS name",
+    },
+    {
+        "name": "product_list_category",
+        "source": "products.service.ts findAll(category_slug, sort_by=newest)",
+        "sql": """
+            SELECT product.*
+            FROM products product
+            LEFT JOIN categories category ON category.id = product.category_id
+            WHERE product.status = 'active' AND product.deleted_at IS NULL AND category.slug = %(slug)s
+            ORDER BY product.created_at DESC
+            LIMIT 20
+        """,
+        "params": """
+            SELECT c.slug FROM categories c JOIN products p ON p.category_id = c.id
+            GROUP BY c.slug ORDER BY COUNT(*) DESC, c.slug LIMIT 1
+        """,
+    },
+    {
+        "name": "product_reviews",
+        "source": "products.service.ts getProductReviews",
+        "sql": """
+            SELECT r.*
+            FROM product_reviews r
+            JOIN product_variants v ON v.id = r.variant_id
+            WHERE v.product_id = %(product_id)s AND r.status = 'approved'
+            ORDER BY r.created_at DESC
+            LIMIT 10
+        """,
+        "params": """
+            SELECT v.product_id FROM product_reviews r JOIN product_variants v ON v.id = r.variant_id
+            GROUP BY v.product_id ORDER BY COUNT(*) DESC, v.product_id LIMIT 1
+        """,
+    },
+    {
+        "name": "admin_orders_by_status",
+        "source": "admin.service.ts getOrders(status)",
+        "sql": """
+            SELECT o.*
+            FROM orders o
+            WHERE o.fulfillment_status = %(status)s
+            ORDER BY o.created_at DESC
+            LIMIT 20 OFFSET 0
+        """,
+        "params": "SELECT 'pending' AS status",
+    },
+    {
+        "name": "admin_orders_by_status_count",
+        "source": "admin.service.ts getOrders(status) getManyAndCount",
+        "sql": "SELECT COUNT(*) FROM orders o WHERE o.fulfillment_status = %(status)s",
+        "params": "SELECT 'pending' AS status",
+    },
+    {
+        "name": "customer_orders",
+        "source": "orders.service.ts getOrders",
+        "sql": """
+            SELECT o.*
+            FROM orders o
+            WHERE o.customer_id = %(customer_id)s
+            ORDER BY o.created_at DESC
+            LIMIT 10
+        """,
+        "params": "SELECT customer_id FROM orders GROUP BY customer_id ORDER BY COUNT(*) DESC, customer_id LIMIT 1",
+    },
+    {
+        "name": "chat_session_by_customer",
+        "source": "chat.service.ts createOrGetSession(customer)",
+        "sql": """
+            SELECT s.*
+            FROM chat_sessions s
+            WHERE s.customer_id = %(customer_id)s
+            ORDER BY s.updated_at DESC
+            LIMIT 1
+        """,
+        "params": """
+            SELECT customer_id FROM chat_sessions WHERE customer_id IS NOT NULL
+            GROUP BY customer_id ORDER BY COUNT(*) DESC, customer_id LIMIT 1
+        """,
+    },
+    {
+        "name": "chat_session_by_visitor",
+        "source": "chat.service.ts createOrGetSession(visitor_id)",
+        "sql": "SELECT s.* FROM chat_sessions s WHERE s.visitor_id = %(visitor_id)s LIMIT 1",
+        "params": "SELECT visitor_id FROM chat_sessions WHERE visitor_id IS NOT NULL ORDER BY id LIMIT 1",
+    },
+    {
+        "name": "chat_messages_by_session",
+        "source": "chat.service.ts getHistory",
+        "sql": """
+            SELECT m.*
+            FROM chat_messages m
+            WHERE m.session_id = %(session_id)s
+            ORDER BY m.created_at DESC
+            LIMIT 50
+        """,
+        "params": "SELECT session_id FROM chat_messages GROUP BY session_id ORDER BY COUNT(*) DESC, session_id LIMIT 1",
+    },
+]
+
+# Index ứng viên: ddl chạy trong transaction rồi ROLLBACK; rewrites = query cần sửa để dùng được index
+TRGM_SEARCH = """
+    SELECT product.*, category.name AS category_name
+    FROM products product
+    LEFT JOIN categories category ON category.id = product.category_id
+    WHERE product.status = 'active' AND product.deleted_at IS NULL
+      AND (f_unaccent(product.name) ILIKE f_unaccent(%(search)s)
+           OR f_unaccent(product.description) ILIKE f_unaccent(%(search)s)
+           OR product.slug ILIKE %(search)s)
+    ORDER BY product.created_at DESC
+    LIMIT 20
+"""
+CANDIDATES = {
+    "trgm_product_search": {
+        "ddl": [
+            "CREATE EXTENSION IF NOT EXISTS unaccent",
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            # unaccent() chỉ STABLE, index biểu thức cần bản IMMUTABLE
+            """CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+               $$ SELECT public.unaccent('public.unaccent', $1) $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT""",
+            "CREATE INDEX idx_products_name_trgm ON products USING gin (f_unaccent(name) gin_trgm_ops)",
+            "CREATE INDEX idx_products_description_trgm ON products USING gin (f_unaccent(description) gin_trgm_ops)",
+            "CREATE INDEX idx_products_slug_trgm ON products USING gin (slug gin_trgm_ops)",
+        ],
+        "tables": ["products"],
+        "rewrites": {
+            "product_search": TRGM_SEARCH,
+            "product_search_count": TRGM_SEARCH.replace(
+                "product.*, category.name AS category_name", "COUNT(DISTINCT product.id)"
+            ).replace("ORDER BY product.created_at DESC\n    LIMIT 20", ""),
+            "product_name_search": """
+                SELECT product.id, product.name, product.slug, product.selling_price
+                FROM products product
+                WHERE product.status = 'active' AND product.deleted_at IS NULL
+                  AND f_unaccent(product.name) ILIKE f_unaccent(%(name)s)
+                LIMIT 10
+            """,
+        },
+    },
+    "orders_status_created": {
+        "ddl": ["CREATE INDEX idx_orders_fulfillment_created ON orders (fulfillment_status, created_at DESC)"],
+        "tables": ["orders"],
+        "queries": ["admin_orders_by_status", "admin_orders_by_status_count"],
+    },
+    "orders_customer_created": {
+        "ddl": ["CREATE INDEX idx_orders_customer_created ON orders (customer_id, created_at DESC)"],
+        "tables": ["orders"],
+        "queries": ["customer_orders"],
+    },
+    "chat_sessions_lookup": {
+        "ddl": [
+            "CREATE INDEX idx_chat_sessions_customer_updated ON chat_sessions (customer_id, updated_at DESC)",
+            "CREATE INDEX idx_chat_sessions_visitor ON chat_sessions (visitor_id) WHERE visitor_id IS NOT NULL",
+        ],
+        "tables": ["chat_sessions"],
+        "queries": ["chat_session_by_customer", "chat_session_by_visitor"],
+    },
+    "chat_messages_session_created": {
+        "ddl": ["CREATE INDEX idx_chat_messages_session_created ON chat_messages (session_id, created_at DESC)"],
+        "tables": ["chat_messages"],
+        "queries": ["chat_messages_by_session"],
+    },
+    "reviews_variant_created": {
+        "ddl": ["CREATE INDEX idx_product_reviews_variant_created ON product_reviews (variant_id, created_at DESC)"],
+        "tables": ["product_reviews"],
+        "queries": ["product_reviews"],
+    },
+}
+
+# ==================== SEED ====================
+def table_counts(cur):
+    counts = {}
+    for table in SCALE_ROWS:
+        cur.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cur.fetchone()[0]
+    return counts
+
+def grow_to_scale(scale):
+    """Bơm mỗi bảng lên SCALE_ROWS x scale dòng (không xoá gì), rồi ANALYZE"""
+    from seed_customers import seed_customers
+    from review_generator import seed_bulk_reviews
+
+    log(f"=== Scale {scale}: bơm data ===")
+    conn = get_db_connection()
+    cur = conn.cursor()
+    if table_counts(cur)["products"] == 0:
+        log("❌ Chưa có products, chạy seed_data.py trước")
+        sys.exit(1)
+
+    # Thứ tự theo khoá ngoại: customers -> products -> orders -> sessions -> messages -> reviews
+    for table in ["customers", "products", "orders", "chat_sessions", "chat_messages", "product_reviews"]:
+        cur.execute(f"SELECT COUNT(*) FROM {table}")
+        missing = int(SCALE_ROWS[table] * scale) - cur.fetchone()[0]
+        if missing <= 0:
+            continue
+        started = time.perf_counter()
+        if table == "customers":
+            seed_customers(missing, manifest=None)
+        elif table == "product_reviews":
+            conn.commit()
+            seed_bulk_reviews(missing)
+        else:
+            cur.execute(GROW_SQL[table], {"n": missing})
+            conn.commit()
+        log(f"+{missing} {table} trong {time.perf_counter() - started:.1f}s")
+
+    conn.autocommit = True
+    cur.execute("ANALYZE")
+    counts = table_counts(cur)
+    cur.close()
+    conn.close()
+    return counts
+
+# ==================== EXPLAIN ====================
+def plan_shape(node):
+    """Cây plan rút gọn: Node Type[bảng/index](con, ...)"""
+    label = node["Node Type"]
+    target = node.get("Index Name") or node.get("Relation Name")
+    if target:
+        label += f"[{target}]"
+    children = node.get("Plans") or []
+    if children:
+        label += "(" + ", ".join(plan_shape(child) for child in children) + ")"
+    return label
+
+def seq_scans(node, found=None):
+    """Seq Scan đọc nhiều dòng: (bảng, số dòng đã đọc)"""
+    found = [] if found is None else found
+    if node["Node Type"] == "Seq Scan":
+        loops = node.get("Actual Loops", 1)
+        scanned = (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * loops
+        if scanned >= SEQ_SCAN_MIN_ROWS:
+            found.append((node.get("Relation Name"), int(scanned)))
+    for child in node.get("Plans") or []:
+        seq_scans(child, found)
+    return found
+
+def query_params(cur, query):
+    cur.execute(query["params"])
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in cur.description], row))
+
+def explain(cur, sql, params, repeat=DEFAULT_REPEAT):
+    """EXPLAIN ANALYZE repeat + 1 lần (lần đầu làm nóng cache), trả về median và plan lần cuối"""
+    timings = []
+    for _ in range(repeat + 1):
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        result = cur.fetchone()[0]
+        result = json.loads(result) if isinstance(result, str) else result
+        timings.append(result[0]["Execution Time"])
+    plan = result[0]["Plan"]
+    return {
+        "ms": round(statistics.median(timings[1:]), 3),
+        "planning_ms": round(result[0]["Planning Time"], 3),
+        "shape": plan_shape(plan),
+        "rows": plan.get("Actual Rows"),
+        "shared_hit": plan.get("Shared Hit Blocks", 0),
+        "shared_read": plan.get("Shared Read Blocks", 0),
+        "seq_scans": seq_scans(plan),
+    }
+
+def run_catalog(cur, repeat, only=None, rewrites=None):
+    results = {}
+    for query in QUERIES:
+        if only is not None and query["name"] not in only:
+            continue
+        params = query_params(cur, query)
+        if params is None:
+            results[query["name"]] = {"skipped": "không có data cho tham số"}
+            continue
+        sql = (rewrites or {}).get(query["name"], query["sql"])
+        results[query["name"]] = explain(cur, sql, params, repeat)
+    return results
+
+def evaluate_candidates(conn, names, baseline, repeat):
+    """Mỗi ứng viên: CREATE INDEX + ANALYZE + chạy lại query liên quan trong 1 transaction, ROLLBACK"""
+    results = {}
+    for name in names:
+        candidate = CANDIDATES[name]
+        only = set(candidate.get("queries", [])) | set(candidate.get("rewrites", {}))
+        cur = conn.cursor()
+        try:
+            started = time.perf_counter()
+            for ddl in candidate["ddl"]:
+                cur.execute(ddl)
+            build_seconds = time.perf_counter() - started
+            for table in candidate["tables"]:
+                cur.execute(f"ANALYZE {table}")
+            measured = run_catalog(cur, repeat, only, candidate.get("rewrites"))
+        except Exception as e:
+            log(f"⚠️ Ứng viên {name} lỗi: {e}")
+            results[name] = {"error": str(e)}
+            continue
+        finally:
+            conn.rollback()
+            cur.close()
+        for query_name, result in measured.items():
+            before = baseline.get(query_name, {}).get("ms")
+            if before and "ms" in result:
+                result["speedup"] = round(before / max(result["ms"], 0.001), 2)
+        results[name] = {"build_seconds": round(build_seconds, 2), "queries": measured}
+    return results
+
+# ==================== REPORT ====================
+def flag_results(results, previous=None, baseline=None):
+    """Gắn flags cho từng query so với scale trước và baseline cùng scale"""
+    for name, result in results.items():
+        if "ms" not in result:
+            continue
+        flags = []
+        if result["seq_scans"]:
+            flags.append("seq_scan")
+        before = (previous or {}).get(name)
+        if before and "shape" in before and before["shape"] != result["shape"]:
+            flags.append("plan_flip")
+        base = (baseline or {}).get(name)
+        if base and "shape" in base:
+            if base["shape"] != result["shape"] and "plan_flip" not in flags:
+                flags.append("plan_flip")
+            if result["ms"] > base["ms"] * REGRESSION_RATIO:
+                flags.append("slower")
+        result["flags"] = flags
+
+def print_results(scale, results, candidates):
+    log(f"--- Scale {scale} ---")
+    for name, result in results.items():
+        if "ms" not in result:
+            log(f"  {name:32s} {result.get('skipped', '')}")
+            continue
+        flags = " ".join(f"⚠️{f}" for f in result["flags"])
+        log(f"  {name:32s} {result['ms']:>9.2f}ms  hit={result['shared_hit']:<7} read={result['shared_read']:<7} {flags}")
+        log(f"      {result['shape']}")
+    for name, candidate in candidates.items():
+        if "error" in candidate:
+            continue
+        log(f"  [{name}] build {candidate['build_seconds']}s")
+        for query_name, result in candidate["queries"].items():
+            if "ms" in result:
+                log(f"      {query_name:28s} {result['ms']:>9.2f}ms  x{result.get('speedup', '?')}  {result['shape']}")
+
+def load_baseline(path):
+    """{scale: {query: result}} từ report lần trước"""
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {str(run["scale"]): run["queries"] for run in report["runs"]}
+
+# ==================== MAIN ====================
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE các query nóng ở nhiều scale factor")
+    parser.add_argument("--scales", default="1", help="danh sách scale factor tăng dần, ví dụ 1,5,20")
+    parser.add_argument("--no-seed", action="store_true", help="không bơm data, đo trên data hiện có")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--candidates", default="", help="tên index ứng viên, phân tách bằng dấu phẩy, hoặc 'all'")
+    parser.add_argument("--baseline", help="report JSON lần trước để phát hiện plan flip / chậm hơn")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--fail-on-flags", action="store_true", help="exit 1 nếu có plan_flip / slower")
+    args = parser.parse_args()
+
+    scales = [float(s) for s in args.scales.split(",")] if not args.no_seed else [None]
+    candidates = list(CANDIDATES) if args.candidates == "all" else [c for c in args.candidates.split(",") if c]
+    unknown = [c for c in candidates if c not in CANDIDATES]
+    if unknown:
+        log(f"❌ Không có ứng viên: {', '.join(unknown)} (có: {', '.join(CANDIDATES)})")
+        sys.exit(1)
+    baseline = load_baseline(args.baseline)
+
+    report = {"generated_at": datetime.now().isoformat(timespec="seconds"), "runs": []}
+    previous = None
+    regressions = 0
+    for scale in scales:
+        counts = grow_to_scale(scale) if scale is not None else None
+        conn = get_db_connection()
+        cur = conn.cursor()
+        if counts is None:
+            counts = table_counts(cur)
+        label = scale if scale is not None else "current"
+        results = run_catalog(cur, args.repeat)
+        conn.rollback()
+        cur.close()
+        flag_results(results, previous, baseline.get(str(label)))
+        candidate_results = evaluate_candidates(conn, candidates, results, args.repeat)
+        conn.close()
+
+        print_results(label, results, candidate_results)
+        regressions += sum(1 for r in results.values() if {"plan_flip", "slower"} & set(r.get("flags", [])))
+        report["runs"].append({"scale": label, "rows": counts, "queries": results, "candidates": candidate_results})
+        previous = results
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    log(f"✅ Ghi report {args.out} ({regressions} query bị plan flip / chậm hơn)")
+    if args.fail_on_flags and regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
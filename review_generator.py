@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Sinh review tiếng Việt tổ hợp + bulk seed product_reviews (benchmark full-text / trigram)
+
+    python review_generator.py --demo 1000000            # đo tốc độ + số comment khác nhau
+    python review_generator.py --count 2000000 --skew 1.1
+
+REVIEW_COMMENTS chỉ có 20 câu, nên mọi index trên product_reviews.comment đều
+được benchmark trên 20 chuỗi. Ở đây mỗi comment ghép từ các mảnh câu:
+
+- mở đầu / kết theo rating (tích cực, trung lập, tiêu cực)
+- 3 khía cạnh: form dáng (fit), chất vải (fabric), giao hàng (delivery); mỗi
+  khía cạnh có mặt ngẫu nhiên, khen/chê theo xác suất của rating, thứ tự ngẫu nhiên
+- chủ ngữ theo loại sản phẩm (áo / quần / váy đầm / khác), mức độ (rất, khá, hơi...)
+- thỉnh thoảng thêm số đo "cao 1m68, nặng 60kg, mặc size L"
+
+-> hàng trăm triệu tổ hợp. --skew là số mũ Zipf khi chọn mảnh câu (0 = đều,
+càng lớn thì vài cụm từ càng phổ biến) để điều chỉnh phân bố từ vựng.
+Tất cả sinh bằng numpy theo batch, COPY thẳng vào product_reviews.
+"""
+
+import io
+import sys
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from seed_profiling import stage, profiler, add_profile_arguments, configure_from_args
+
+# ==================== CONFIG ====================
+DEFAULT_COUNT = 100000
+BATCH_SIZE = 50000
+DEFAULT_SKEW = 0.8
+RATING_WEIGHTS = [0.03, 0.05, 0.12, 0.30, 0.50]  # rating 1..5
+# Xác suất một khía cạnh được khen, theo rating 1..5
+POSITIVE_ASPECT_PROB = np.array([0.05, 0.2, 0.5, 0.8, 0.97])
+ASPECT_PROB = 0.7
+MEASUREMENT_PROB = 0.3
+
+POS, MIXED, NEG = 0, 1, 2
+TONE_BY_RATING = np.array([NEG, NEG, NEG, MIXED, POS, POS])  # index = rating
+
+PRODUCT_TYPES = ["ao", "quan", "vay", "khac"]
+# Tiền tố tên sản phẩm (không dấu) -> loại
+PRODUCT_TYPE_PREFIXES = [("ao", "ao"), ("quan", "quan"), ("vay", "vay"), ("dam", "vay"), ("chan vay", "vay")]
+SUBJECTS = {
+    "ao": ["Áo", "Áo này", "Cái áo", "Mẫu áo này"],
+    "quan": ["Quần", "Quần này", "Cái quần", "Mẫu quần này"],
+    "vay": ["Váy", "Đầm", "Chiếc váy", "Mẫu đầm này"],
+    "khac": ["Sản phẩm", "Hàng", "Món này", "Sản phẩm này"],
+}
+
+OPENERS = {
+    POS: ["", "Rất ưng ý!", "Đáng tiền!", "Quá ổn luôn.", "Lần đầu mua ở shop mà rất hài lòng.",
+          "Mua lần thứ hai rồi.", "Hàng đẹp lắm mọi người ơi.", "Nhận hàng xong mê luôn.",
+          "Mua tặng người yêu, ai cũng khen.", "Săn sale được giá tốt.", "Đúng như mô tả."],
+    MIXED: ["", "Tạm ổn.", "Cũng được.", "Không như kỳ vọng lắm.", "Với giá này thì chấp nhận được.",
+            "Hàng ổn nhưng chưa xuất sắc.", "Nhận hàng hơi phân vân."],
+    NEG: ["", "Khá thất vọng.", "Không hài lòng.", "Hơi tiếc tiền.", "Hàng không giống hình.",
+          "Lần này mua hơi hớ.", "Không đáng tiền."],
+}
+# (các chủ ngữ đồng nghĩa, vị ngữ, có nhận mức độ "rất/khá/hơi" hay không); fit ghép sau tên sản phẩm
+ASPECTS = {
+    "fit": {
+        True: [(["mặc lên form", "lên form", "form"], "đẹp, tôn dáng", True),
+               (["size", "size mặc"], "vừa vặn, đúng bảng size", False),
+               (["mặc", "mặc lên"], "thoải mái khi vận động", True),
+               (["lên dáng", "mặc lên nhìn"], "gọn gàng, lịch sự", True),
+               (["form", "phom"], "chuẩn, không bị bai", False),
+               (["mặc đi làm", "mặc đi chơi", "mặc đi học"], "hợp, nhìn trẻ trung", True),
+               (["phom", "form"], "đứng, mặc lên sang", True),
+               (["mặc", "mặc cả ngày"], "mát, không bị bí", True)],
+        False: [(["size", "size mặc"], "rộng hơn bảng size", True),
+                (["form", "thân"], "ngắn so với mong đợi", True),
+                (["mặc", "mặc lên"], "chật ở phần vai", True),
+                (["size"], "lệch so với bảng size", True),
+                (["dáng", "form"], "không hợp người thấp", False),
+                (["mặc lên", "mặc vào"], "nhăn, không đứng form", True),
+                (["ống", "tay"], "dài, phải đi sửa", True)],
+    },
+    "fabric": {
+        True: [(["Chất vải", "Vải", "Chất liệu"], "mềm và mát", True),
+               (["Vải", "Chất vải"], "dày dặn, không bị mỏng", True),
+               (["Đường may", "Đường chỉ"], "chắc chắn, không có chỉ thừa", True),
+               (["Màu", "Màu sắc", "Màu ngoài đời"], "đẹp hơn trong hình", False),
+               (["Vải", "Chất vải"], "giặt máy vẫn giữ form", False),
+               (["Chất liệu", "Vải"], "thấm hút mồ hôi tốt", False),
+               (["Chất cotton", "Vải cotton"], "mịn, không bị ngứa", True),
+               (["Màu", "Màu sắc"], "đúng hình, không phai", False)],
+        False: [(["Chất vải", "Vải"], "mỏng so với giá", True),
+                (["Vải", "Chất vải"], "dễ xù lông sau vài lần giặt", False),
+                (["Màu", "Màu sắc"], "phai sau lần giặt đầu", False),
+                (["Đường may", "Đường chỉ"], "còn nhiều chỉ thừa", False),
+                (["Vải", "Chất liệu"], "nóng, mặc bí", True),
+                (["Chất liệu", "Vải"], "thô, mặc ngứa", True),
+                (["Màu", "Màu thực tế"], "đậm hơn trong hình", True)],
+    },
+    "delivery": {
+        True: [(["Giao hàng", "Ship"], "nhanh hơn dự kiến", True),
+               (["Shop đóng gói", "Đóng gói"], "cẩn thận", True),
+               (["Shop tư vấn", "Nhân viên tư vấn"], "nhiệt tình", True),
+               (["Shipper", "Anh shipper"], "thân thiện", True),
+               (["Shop phản hồi", "Shop trả lời tin nhắn"], "nhanh", True),
+               (["Đóng gói", "Hộp"], "đẹp, có cả thiệp cảm ơn", False)],
+        False: [(["Giao hàng", "Ship"], "chậm hơn dự kiến", True),
+                (["Đóng gói", "Shop đóng gói"], "sơ sài", True),
+                (["Shop phản hồi", "Shop trả lời tin nhắn"], "chậm", True),
+                (["Hộp", "Thùng hàng"], "bị móp khi nhận", False),
+                (["Đổi size", "Đổi trả"], "mất thời gian", True)],
+    },
+}
+INTENSIFIERS = {
+    True: ["", "rất ", "khá ", "cực kỳ ", "siêu ", "thật sự ", "vô cùng "],
+    False: ["", "hơi ", "khá ", "rất ", "quá "],
+}
+CLOSERS = {
+    POS: ["", "Sẽ ủng hộ shop thêm.", "Sẽ mua thêm màu khác.", "Mọi người nên mua nha.", "Cho shop 5 sao.",
+          "10 điểm không có nhưng.", "Sẽ quay lại mua tiếp.", "Giá vậy là quá ổn."],
+    MIXED: ["", "Có thể sẽ mua lại nếu giảm giá.", "Phù hợp mặc hằng ngày.", "Mong shop cải thiện thêm.",
+            "Nên cân nhắc khi chọn size."],
+    NEG: ["", "Chắc không mua lại.", "Mọi người cân nhắc trước khi mua.", "Mong shop xem lại chất lượng.",
+          "Đã nhắn shop nhưng chưa được giải quyết."],
+}
+SIZES = np.array(["S", "M", "L", "XL", "XXL"])
+
+# ==================== GENERATOR ====================
+class FragmentTable:
+    """Các nhóm mảnh câu gộp vào 1 mảng; chọn theo nhóm bằng 1 lần searchsorted.
+
+    Trọng số trong nhóm ~ 1 / (thứ hạng + 1) ** skew, cdf của nhóm g nằm trong [g, g + 1).
+    """
+
+    def __init__(self, groups, skew=DEFAULT_SKEW):
+        values, cdf = [], []
+        for g, fragments in enumerate(groups):
+            weights = 1.0 / np.arange(1, len(fragments) + 1) ** skew
+            cdf.extend(g + np.cumsum(weights) / weights.sum())
+            values.extend(fragments)
+        self.values = np.array(values)
+        self.cdf = np.array(cdf)
+        self.cdf[-1] = len(groups)  # tránh lỗi làm tròn ở nhóm cuối
+
+    def index(self, rng, group):
+        idx = np.searchsorted(self.cdf, group + rng.random(len(group)), side="right")
+        return np.minimum(idx, len(self.cdf) - 1)
+
+    def sample(self, rng, group):
+        return self.values[self.index(rng, group)]
+
+def _join(*parts):
+    """Nối các mảng câu bằng dấu cách, bỏ qua phần rỗng"""
+    out = parts[0]
+    for part in parts[1:]:
+        sep = np.where((out == "") | (part == ""), "", " ")
+        out = np.char.add(np.char.add(out, sep), part)
+    return out
+
+class ReviewTextGenerator:
+    def __init__(self, skew=DEFAULT_SKEW, seed=None):
+        self.rng = np.random.default_rng(seed)
+        tones = [POS, MIXED, NEG]
+        self.openers = FragmentTable([OPENERS[t] for t in tones], skew)
+        self.closers = FragmentTable([CLOSERS[t] for t in tones], skew)
+        self.subjects = FragmentTable([SUBJECTS[t] for t in PRODUCT_TYPES], skew)
+        self.intensifiers = FragmentTable([INTENSIFIERS[True], INTENSIFIERS[False]], skew)
+        # Nhóm 2k = khen, 2k + 1 = chê của khía cạnh k; mỗi chủ ngữ đồng nghĩa là 1 mảnh riêng
+        self.aspect_names = list(ASPECTS)
+        groups = [
+            [(head, tail, intensifiable) for heads, tail, intensifiable in ASPECTS[a][positive] for head in heads]
+            for a in self.aspect_names for positive in (True, False)
+        ]
+        self.aspects = FragmentTable([list(range(len(g))) for g in groups], skew)
+        flat = [fragment for g in groups for fragment in g]
+        self.heads = np.array([f[0] for f in flat])
+        self.tails = np.array([f[1] for f in flat])
+        self.intensifiable = np.array([f[2] for f in flat])
+
+    def ratings(self, n):
+        return self.rng.choice(5, size=n, p=RATING_WEIGHTS) + 1
+
+    def _aspect(self, k, rating, subject):
+        n = len(rating)
+        positive = self.rng.random(n) < POSITIVE_ASPECT_PROB[rating - 1]
+        group = 2 * k + (~positive).astype(np.int64)
+        idx = self.aspects.index(self.rng, group)
+        intensity = self.intensifiers.sample(self.rng, (~positive).astype(np.int64))
+        intensity = np.where(self.intensifiable[idx], intensity, "")
+        sentence = np.char.add(np.char.add(np.char.add(np.char.add(self.heads[idx], " "), intensity), self.tails[idx]), ".")
+        if self.aspect_names[k] == "fit":
+            sentence = np.char.add(np.char.add(subject, " "), sentence)
+        return sentence
+
+    def _measurement(self, n):
+        height = self.rng.integers(150, 186, n)
+        weight = np.clip((height - 100) * self.rng.normal(0.9, 0.12, n), 40, 95).astype(np.int64)
+        size = SIZES[np.clip(np.digitize(weight, [50, 58, 66, 75]), 0, len(SIZES) - 1)]
+        text = np.char.add(np.char.add("Mình cao 1m", (height - 100).astype(str)), ", nặng ")
+        text = np.char.add(np.char.add(np.char.add(text, weight.astype(str)), "kg, mặc size "), size)
+        text = np.char.add(text, " vừa.")
+        return np.where(self.rng.random(n) < MEASUREMENT_PROB, text, "")
+
+    def generate(self, n, product_type=None, rating=None):
+        """Sinh n comment. product_type: mảng index vào PRODUCT_TYPES; rating: mảng 1..5"""
+        rating = self.ratings(n) if rating is None else np.asarray(rating)
+        product_type = np.full(n, len(PRODUCT_TYPES) - 1) if product_type is None else np.asarray(product_type)
+        tone = TONE_BY_RATING[rating]
+        subject = self.subjects.sample(self.rng, product_type)
+
+        aspects = np.stack([self._aspect(k, rating, subject) for k in range(len(self.aspect_names))])
+        present = self.rng.random(aspects.shape) < ASPECT_PROB
+        # Comment nào không có khía cạnh nào thì giữ fit
+        present[0, ~present.any(axis=0)] = True
+        aspects = np.where(present, aspects, "")
+        order = np.argsort(self.rng.random(aspects.shape), axis=0)
+        aspects = np.take_along_axis(aspects, order, axis=0)
+
+        comment = _join(
+            self.openers.sample(self.rng, tone),
+            *aspects,
+            self._measurement(n),
+            self.closers.sample(self.rng, tone),
+        )
+        return rating, comment
+
+def product_type_of(names):
+    """Tên sản phẩm -> index PRODUCT_TYPES (theo tiền tố không dấu)"""
+    from seed_customers import ascii_fold
+
+    folded = np.array([ascii_fold(str(n)) for n in names])
+    result = np.full(len(folded), PRODUCT_TYPES.index("khac"))
+    for prefix, product_type in reversed(PRODUCT_TYPE_PREFIXES):
+        result[np.char.startswith(folded, prefix)] = PRODUCT_TYPES.index(product_type)
+    return result
+
+# ==================== BULK WRITER ====================
+def _copy_buffer(*columns):
+    """COPY text format (tab); comment không chứa tab / xuống dòng / backslash"""
+    lines = columns[0].astype(str)
+    for column in columns[1:]:
+        lines = np.char.add(np.char.add(lines, "\t"), column.astype(str))
+    return io.StringIO("\n".join(lines.tolist()) + "\n")
+
+def seed_bulk_reviews(count=DEFAULT_COUNT, skew=DEFAULT_SKEW, seed=None, batch_size=BATCH_SIZE):
+    """COPY count reviews (approved) từ các order item đã giao, theo batch"""
+    from seed_data import log, get_db_connection
+
+    log("=== Seed Product Reviews (bulk) ===")
+    started = time.perf_counter()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT o.id, o.customer_id, oi.variant_id, p.name
+        FROM orders o
+        JOIN order_items oi ON o.id = oi.order_id
+        JOIN product_variants pv ON pv.id = oi.variant_id
+        JOIN products p ON p.id = pv.product_id
+        WHERE o.fulfillment_status = 'delivered'
+    """)
+    items = cur.fetchall()
+    if not items:
+        log("❌ Không có delivered orders để tạo reviews")
+        return 0
+
+    order_ids = np.array([r[0] for r in items], dtype=np.int64)
+    customer_ids = np.array([r[1] for r in items], dtype=np.int64)
+    variant_ids = np.array([r[2] for r in items], dtype=np.int64)
+    product_types = product_type_of([r[3] for r in items])
+
+    generator = ReviewTextGenerator(skew=skew, seed=seed)
+    now = np.datetime64(datetime.now().replace(microsecond=0), "s")
+    written = 0
+    while written < count:
+        n = min(batch_size, count - written)
+        with stage("generate_reviews"):
+            pick = generator.rng.integers(0, len(items), n)
+            rating, comment = generator.generate(n, product_types[pick])
+            created_at = now - generator.rng.integers(0, 180 * 86400, n).astype("timedelta64[s]")
+            buffer = _copy_buffer(variant_ids[pick], customer_ids[pick], order_ids[pick], rating, comment,
+                                  np.full(n, "approved"), created_at)
+        with stage("copy_reviews"):
+            cur.copy_expert(
+                "COPY product_reviews (variant_id, customer_id, order_id, rating, comment, status, created_at) FROM STDIN",
+                buffer,
+            )
+        written += n
+        log(f"... {written}/{count} reviews")
+
+    # Cập nhật average_rating / total_reviews 1 lần cho tất cả products
+    with stage("update_ratings"):
+        cur.execute("""
+            UPDATE products p SET average_rating = s.average_rating, total_reviews = s.total_reviews
+            FROM (
+                SELECT pv.product_id, AVG(pr.rating) AS average_rating, COUNT(*) AS total_reviews
+                FROM product_reviews pr
+                JOIN product_variants pv ON pr.variant_id = pv.id
+                WHERE pr.status = 'approved'
+                GROUP BY pv.product_id
+            ) s
+            WHERE p.id = s.product_id
+        """)
+        conn.commit()
+    cur.close()
+    conn.close()
+    log(f"✅ Seeded {written} reviews trong {time.perf_counter() - started:.1f}s")
+    return written
+
+def demo(count, skew, seed, batch_size=BATCH_SIZE):
+    generator = ReviewTextGenerator(skew=skew, seed=seed)
+    started = time.perf_counter()
+    distinct, words, lengths = set(), set(), 0
+    for offset in range(0, count, batch_size):
+        n = min(batch_size, count - offset)
+        rating, comment = generator.generate(n, generator.rng.integers(0, len(PRODUCT_TYPES), n))
+        distinct.update(hash(c) for c in comment.tolist())
+        lengths += int(np.char.str_len(comment).sum())
+        if offset == 0:
+            words.update(" ".join(comment.tolist()).split())
+            samples = list(zip(rating[:8], comment[:8]))
+    elapsed = time.perf_counter() - started
+    print(f"{count} comments trong {elapsed:.2f}s ({count / elapsed:,.0f}/s)")
+    print(f"Khác nhau: {len(distinct):,} / {count:,}")
+    print(f"Từ vựng (batch đầu): {len(words)} từ, độ dài TB {lengths / count:.0f} ký tự")
+    for r, c in samples:
+        print(f"  [{r}★] {c}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sinh review tiếng Việt tổ hợp và bulk seed product_reviews")
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT)
+    parser.add_argument("--skew", type=float, default=DEFAULT_SKEW, help="số mũ Zipf khi chọn mảnh câu (0 = đều)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--demo", type=int, metavar="N", help="chỉ sinh N comment và in thống kê, không ghi DB")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    try:
+        if args.demo:
+            with stage("demo"):
+                demo(args.demo, args.skew, args.seed, args.batch_size)
+            return
+        seed_bulk_reviews(args.count, args.skew, args.seed, args.batch_size)
+    except Exception as e:
+        print(f"❌ Lỗi: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        profiler.summary()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+CLI seed chung: chọn stage, chạy song song, config từ env / .env
+
+    python seed.py                                # = all: validate Excel + mọi stage theo thứ tự
+    python seed.py products variants              # chỉ vài stage (theo thứ tự phụ thuộc)
+    python seed.py remaining                      # addresses, orders, reviews (seed_remaining.py)
+    python seed.py customers --batch-size 20000
+    python seed.py all --jobs 3                   # stage độc lập chạy song song
+    python seed.py --list                         # danh sách stage / nhóm
+    python seed.py orders --dry-run               # chỉ import stage + in kế hoạch, không ghi DB
+    python seed.py --startup-bench --json seed_startup.json
+
+- Mỗi stage là "module:function"; module chỉ được import khi stage được chọn
+  (pandas cho Excel, numpy cho customers, requests cho API), nên stage chỉ
+  dùng DB khởi động trong vài chục ms thay vì ~1s import pandas.
+- --jobs N: validate / login_admin chạy trước, các stage còn lại chạy trên N
+  thread theo STAGES[...]["after"] (chỉ tính các stage được chọn, kể cả bắc
+  cầu). Mỗi stage tự mở connection riêng.
+- --batch-size: truyền cho stage có tham số batch_size (customers, bulk_reviews).
+- --startup-bench: đo thời gian khởi động (process mới, import + resolve
+  stage) cho từng stage, so với import eager pandas / requests / psycopg2
+  của các script cũ; --json ghi kết quả để so sánh giữa các lần chạy.
+- --profile như các script seed khác (seed_profiling.py), khi đó --jobs = 1.
+
+Config (DATABASE_URL, BASE_URL, ADMIN_*, SEED_JOBS, SEED_BATCH_SIZE): seed_config.py.
+"""
+
+import sys
+import json
+import time
+import argparse
+import importlib
+
+_IMPORT_STARTED = time.perf_counter()
+
+from seed_config import REPO_DIR, BASE_URL, SEED_JOBS, SEED_BATCH_SIZE, admin_credentials, describe_db
+from seed_data import log
+from seed_profiling import stage, profiler, add_profile_arguments, configure_from_args
+
+# ==================== STAGES ====================
+# Thứ tự khai báo = thứ tự chạy khi --jobs 1 (giống seed_data.main() cũ)
+STAGES = {
+    "validate": {"target": "seed_validation:check_excel", "after": [], "doc": "kiểm tra Excel, dừng nếu có lỗi"},
+    "login_admin": {"target": "seed_data:login_admin", "after": [], "doc": "kiểm tra backend (login admin)"},
+    "categories": {"target": "seed_data:seed_categories", "after": [], "doc": "categories từ Excel"},
+    "colors": {"target": "seed_data:seed_colors", "after": [], "doc": "colors từ Excel"},
+    "products": {"target": "seed_data:seed_products", "after": ["categories"], "doc": "products từ Excel"},
+    "variants": {"target": "seed_data:seed_variants_and_images", "after": ["products", "colors"],
+                 "doc": "variants + images từ Excel"},
+    "customers": {"target": "seed_customers:seed_customers", "after": [], "batch": True,
+                  "doc": "customers (COPY, bcrypt 1 lần)"},
+    "addresses": {"target": "seed_data:seed_customer_addresses", "after": ["customers"],
+                  "doc": "1-2 địa chỉ / customer"},
+    "orders": {"target": "seed_data:seed_orders", "after": ["addresses", "variants"], "doc": "orders + items + payments"},
+    "reviews": {"target": "seed_data:seed_reviews", "after": ["orders"], "doc": "5-20 reviews / product"},
+    "promotions": {"target": "seed_data:seed_promotions", "after": ["products"], "doc": "promotions mẫu"},
+    "bulk_reviews": {"target": "review_generator:seed_bulk_reviews", "after": ["orders"], "batch": True,
+                     "doc": "review tổ hợp hàng loạt (không nằm trong all)"},
+}
+# Chạy tuần tự trước mọi stage khác (chặn ghi DB khi Excel lỗi / backend không chạy)
+GATES = ("validate", "login_admin")
+
+GROUPS = {
+    "all": ["validate", "login_admin", "categories", "colors", "products", "variants", "customers",
+            "addresses", "orders", "reviews", "promotions"],
+    "catalog": ["validate", "categories", "colors", "products", "variants"],
+    "remaining": ["addresses", "orders", "reviews"],
+}
+
+# Module được coi là "nặng" khi đo startup
+HEAVY_MODULES = ("pandas", "numpy", "requests", "psycopg2", "bcrypt", "openpyxl")
+STARTUP_REPEAT = 5
+LEGACY_IMPORTS = "import pandas, requests, psycopg2"
+
+# ==================== HELPERS ====================
+def expand_stages(tokens):
+    """Tên stage / nhóm -> danh sách stage theo thứ tự khai báo"""
+    selected = set()
+    for token in tokens:
+        if token in GROUPS:
+            selected.update(GROUPS[token])
+        elif token in STAGES:
+            selected.add(token)
+        else:
+            raise ValueError(f"Stage không tồn tại: {token} (xem --list)")
+    return [name for name in STAGES if name in selected]
+
+def resolve(name):
+    """Import module của stage (lazy) và trả về hàm"""
+    module, function = STAGES[name]["target"].split(":")
+    return getattr(importlib.import_module(module), function)
+
+def upstream(name, selected):
+    """Các stage được chọn mà name phải chờ (bắc cầu qua stage không được chọn)"""
+    result, todo = set(), list(STAGES[name]["after"])
+    while todo:
+        dep = todo.pop()
+        if dep in result:
+            continue
+        result.add(dep)
+        todo.extend(STAGES[dep]["after"])
+    return result & selected
+
+def print_stages():
+    for name, spec in STAGES.items():
+        after = ", ".join(spec["after"]) or "-"
+        batch = " [--batch-size]" if spec.get("batch") else ""
+        print(f"  {name:<13} {spec['doc']}{batch}  (sau: {after})")
+    for group, names in GROUPS.items():
+        print(f"  {group:<13} = {' '.join(names)}")
+
+# ==================== RUN ====================
+def run_stage(name, batch_size=None):
+    func = resolve(name)
+    kwargs = {"batch_size": batch_size} if batch_size and STAGES[name].get("batch") else {}
+    started = time.perf_counter()
+    with stage(func.__name__):
+        func(**kwargs)
+    elapsed = time.perf_counter() - started
+    log(f"✓ {name}: {elapsed:.2f}s")
+    return elapsed
+
+def run_stages(names, jobs=1, batch_size=None):
+    """Chạy stage: gates tuần tự, phần còn lại theo phụ thuộc trên jobs thread"""
+    timings = {}
+    for name in names:
+        if name in GATES:
+            timings[name] = run_stage(name, batch_size)
+    rest = [name for name in names if name not in GATES]
+    if jobs <= 1:
+        for name in rest:
+            timings[name] = run_stage(name, batch_size)
+        return timings
+
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    selected = set(rest)
+    pending = {name: upstream(name, selected) for name in rest}
+    done, running = set(), {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in [n for n, deps in pending.items() if deps <= done][:jobs - len(running)]:
+                running[pool.submit(run_stage, name, batch_size)] = name
+                del pending[name]
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                # Lỗi: không submit thêm, with-block chờ các stage đang chạy rồi raise
+                timings[name] = future.result()
+                done.add(name)
+    return timings
+
+# ==================== STARTUP BENCH ====================
+# Process con: import seed + resolve stage, in JSON thời gian import và module nặng đã nạp
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import seed
+for name in seed.expand_stages(sys.argv[1:]):
+    seed.resolve(name)
+print(json.dumps({"import_ms": (time.perf_counter() - started) * 1000,
+                  "heavy": [m for m in seed.HEAVY_MODULES if m in sys.modules]}))
+"""
+
+def _time_command(command, repeat):
+    import statistics
+    import subprocess
+
+    walls, last = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True, cwd=REPO_DIR)
+        walls.append((time.perf_counter() - started) * 1000)
+        if result.returncode != 0:
+            return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+        last = result.stdout.strip().splitlines()[-1] if result.stdout.strip() else None
+    report = {"wall_ms": {"median": round(statistics.median(walls), 1), "min": round(min(walls), 1)}}
+    if last and last.startswith("{"):
+        child = json.loads(last)
+        report["import_ms"] = round(child["import_ms"], 1)
+        report["heavy_modules"] = child["heavy"]
+    return report
+
+def startup_bench(repeat=STARTUP_REPEAT, json_path=None):
+    """Đo thời gian khởi động từng stage trong process mới"""
+    import platform
+
+    cases = {"python": [sys.executable, "-c", "pass"],
+             "legacy eager imports": [sys.executable, "-c", LEGACY_IMPORTS]}
+    for name in STAGES:
+        cases[name] = [sys.executable, "-c", _CHILD, name]
+    cases["all"] = [sys.executable, "-c", _CHILD, "all"]
+
+    results = {}
+    log(f"Startup ({repeat} lần / case, process mới):")
+    log(f"{'case':<22}{'wall p50':>10}{'min':>9}{'import':>9}  module nặng")
+    for label, command in cases.items():
+        report = _time_command(command, repeat)
+        results[label] = report
+        if "error" in report:
+            log(f"{label:<22}  lỗi: {report['error']}")
+            continue
+        import_ms = f"{report['import_ms']:.1f}" if "import_ms" in report else "-"
+        log(f"{label:<22}{report['wall_ms']['median']:>8.1f}ms{report['wall_ms']['min']:>7.1f}ms"
+            f"{import_ms:>7}ms  {', '.join(report.get('heavy_modules', [])) or '-'}")
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "repeat": repeat, "results": results}, f, indent=2)
+        log(f"Ghi kết quả vào {json_path}")
+    return results
+
+# ==================== MAIN ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed data: chọn stage, --jobs, --batch-size")
+    parser.add_argument("stages", nargs="*", default=["all"], help="tên stage hoặc nhóm (mặc định: all)")
+    parser.add_argument("--jobs", "-j", type=int, default=SEED_JOBS, help="số stage chạy song song")
+    parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE,
+                        help="batch cho stage COPY (mặc định của từng stage)")
+    parser.add_argument("--list", action="store_true", help="liệt kê stage / nhóm")
+    parser.add_argument("--dry-run", action="store_true", help="chỉ import stage và in kế hoạch")
+    parser.add_argument("--startup-bench", action="store_true", help="đo thời gian khởi động từng stage")
+    parser.add_argument("--repeat", type=int, default=STARTUP_REPEAT, help="số lần đo cho --startup-bench")
+    parser.add_argument("--json", help="ghi kết quả --startup-bench ra file")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print_stages()
+        return
+    if args.startup_bench:
+        startup_bench(args.repeat, args.json)
+        return
+
+    try:
+        names = expand_stages(args.stages)
+    except ValueError as e:
+        parser.error(str(e))
+    configure_from_args(args)
+    jobs = max(1, args.jobs)
+    if args.profile == "cprofile" and jobs > 1:
+        # cProfile chỉ profile 1 thread mỗi lúc; --profile (sample) thì profile được mọi thread
+        log("⚠️ --profile cprofile chạy với --jobs 1")
+        jobs = 1
+
+    if args.dry_run:
+        for name in names:
+            resolve(name)
+        selected = set(names) - set(GATES)
+        for name in names:
+            deps = ", ".join(sorted(upstream(name, selected))) if name in selected else "gate"
+            log(f"{name:<13} {STAGES[name]['target']:<40} sau: {deps or '-'}")
+        heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+        log(f"Khởi động {(time.perf_counter() - _IMPORT_STARTED) * 1000:.0f}ms, module nặng: {', '.join(heavy) or '-'}")
+        return
+
+    if "login_admin" in names:
+        # Báo thiếu ADMIN_* ngay, trước khi validate Excel
+        admin_credentials()
+    log(f"🌱 Bắt đầu seed: {' '.join(names)}")
+    log(f"DB {describe_db()} | API {BASE_URL} | jobs {jobs}")
+    log("=" * 50)
+
+    started = time.perf_counter()
+    try:
+        timings = run_stages(names, jobs, args.batch_size)
+        log("=" * 50)
+        log(f"✅ Hoàn thành seed data! {time.perf_counter() - started:.1f}s "
+            f"(tổng thời gian stage {sum(timings.values()):.1f}s)")
+    except Exception as e:
+        log(f"❌ Lỗi: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        profiler.summary()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Script Seed Customers - tạo hàng loạt tài khoản customer cho test tải
+
+    python seed_customers.py --count 200000
+    python seed_customers.py --count 5000 --passwords password123,Customer123 --manifest Data/credentials.csv
+
+- bcrypt chỉ hash 1 lần cho mỗi password khác nhau (cost 10 như auth.service.ts),
+  mọi account dùng chung hash đó -> không mất ~100ms/account như scripts/seed-data.ts
+- Họ tên / email / số điện thoại tiếng Việt sinh bằng numpy (không lặp từng dòng)
+- Bulk load: COPY vào bảng tạm rồi INSERT ... ON CONFLICT (email) DO NOTHING
+- Ghi manifest CSV (id, email, password, name, phone) cho chat_load_test / test tải
+
+Bảng customers không có cột phone, số điện thoại chỉ nằm trong manifest.
+"""
+
+import io
+import sys
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from seed_data import log, get_db_connection
+from seed_profiling import stage, profiler, add_profile_arguments, configure_from_args
+
+# ==================== CONFIG ====================
+DEFAULT_COUNT = 200
+DEFAULT_PASSWORD = "password123"  # login_customer() dùng password này
+DEFAULT_MANIFEST = "customer_credentials.csv"
+BCRYPT_ROUNDS = 10
+BATCH_SIZE = 50000
+EMAIL_DOMAINS = ["gmail.com"] * 8 + ["yahoo.com", "outlook.com"]
+
+# Họ phổ biến và tỉ lệ xấp xỉ
+FAMILY_NAMES = {
+    "Nguyễn": 38, "Trần": 11, "Lê": 9.5, "Phạm": 7, "Hoàng": 5.1, "Huỳnh": 4, "Phan": 4.5,
+    "Vũ": 3.9, "Võ": 3, "Đặng": 2.1, "Bùi": 2, "Đỗ": 1.4, "Hồ": 1.3, "Ngô": 1.3,
+    "Dương": 1, "Lý": 0.5, "Đinh": 1, "Trương": 1, "Mai": 0.8, "Lâm": 0.6,
+}
+MIDDLE_NAMES = {
+    "male": ["Văn", "Minh", "Đức", "Quang", "Hữu", "Công", "Gia", "Thành", "Anh", "Tuấn"],
+    "female": ["Thị", "Ngọc", "Thu", "Thanh", "Mai", "Phương", "Hoài", "Kim", "Bảo", "Khánh"],
+}
+GIVEN_NAMES = {
+    "male": ["Minh", "Huy", "Khoa", "Nam", "Long", "Phúc", "Tuấn", "Hùng", "Dũng", "Quân",
+             "Đạt", "Hiếu", "Trung", "Sơn", "Thắng", "Bảo", "Vinh", "Tài", "Khang", "Nhân"],
+    "female": ["Linh", "Trang", "Hương", "Lan", "Ngọc", "Anh", "Thảo", "Hà", "Vy", "My",
+               "Nhung", "Hạnh", "Yến", "Quỳnh", "Hằng", "Thư", "Uyên", "Trâm", "Giang", "Châu"],
+}
+# Đầu số di động Viettel / Vinaphone / Mobifone / Vietnamobile
+PHONE_PREFIXES = [
+    "032", "033", "034", "035", "036", "037", "038", "039", "086", "096", "097", "098",
+    "081", "082", "083", "084", "085", "088", "091", "094",
+    "070", "076", "077", "078", "079", "089", "090", "093",
+    "056", "058", "092",
+]
+
+# ==================== HELPERS ====================
+def ascii_fold(text):
+    """Bỏ dấu tiếng Việt, viết thường (đ -> d) để ghép email"""
+    import unicodedata
+    text = text.lower().replace("đ", "d")
+    text = unicodedata.normalize("NFKD", text)
+    return text.encode("ascii", "ignore").decode("ascii")
+
+def _pick(rng, pool, size, weights=None):
+    """Chọn ngẫu nhiên size phần tử từ pool, trả về (giá trị có dấu, giá trị không dấu)"""
+    values = np.array(pool)
+    folded = np.array([ascii_fold(v) for v in pool])
+    p = None if weights is None else np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    idx = rng.choice(len(pool), size=size, p=p)
+    return values[idx], folded[idx]
+
+def hash_passwords(passwords):
+    """bcrypt mỗi password khác nhau đúng 1 lần -> {password: hash}"""
+    import bcrypt
+
+    hashes = {}
+    for password in dict.fromkeys(passwords):
+        hashes[password] = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("ascii")
+    return hashes
+
+def generate_customers(count, start=1, seed=None, passwords=(DEFAULT_PASSWORD,)):
+    """Sinh count customers (vectorized). Trả về dict các mảng numpy cùng độ dài"""
+    rng = np.random.default_rng(seed)
+    is_male = rng.random(count) < 0.5
+
+    family, family_ascii = _pick(rng, list(FAMILY_NAMES), count, list(FAMILY_NAMES.values()))
+    middle_m, _ = _pick(rng, MIDDLE_NAMES["male"], count)
+    middle_f, _ = _pick(rng, MIDDLE_NAMES["female"], count)
+    given_m, given_m_ascii = _pick(rng, GIVEN_NAMES["male"], count)
+    given_f, given_f_ascii = _pick(rng, GIVEN_NAMES["female"], count)
+    middle = np.where(is_male, middle_m, middle_f)
+    given = np.where(is_male, given_m, given_f)
+    given_ascii = np.where(is_male, given_m_ascii, given_f_ascii)
+
+    name = np.char.add(np.char.add(np.char.add(np.char.add(family, " "), middle), " "), given)
+
+    # Email: <tên>.<họ><số thứ tự>@domain, số thứ tự đảm bảo không trùng
+    seq = np.arange(start, start + count).astype(str)
+    domain = np.array(EMAIL_DOMAINS)[rng.integers(0, len(EMAIL_DOMAINS), count)]
+    email = np.char.add(np.char.add(np.char.add(np.char.add(given_ascii, "."), family_ascii), seq), "@")
+    email = np.char.add(email, domain)
+
+    prefix = np.array(PHONE_PREFIXES)[rng.integers(0, len(PHONE_PREFIXES), count)]
+    phone = np.char.add(prefix, np.char.zfill(rng.integers(0, 10 ** 7, count).astype(str), 7))
+
+    password = np.array(passwords)[rng.integers(0, len(passwords), count)]
+
+    # Ngày tạo tài khoản rải đều trong 1 năm gần đây
+    now = np.datetime64(datetime.now().replace(microsecond=0), "s")
+    created_at = now - rng.integers(0, 365 * 86400, count).astype("timedelta64[s]")
+
+    return {"name": name, "email": email, "phone": phone, "password": password, "created_at": created_at}
+
+def _csv_buffer(*columns):
+    """Ghép các cột (không chứa dấu phẩy / nháy) thành CSV trong bộ nhớ cho COPY"""
+    lines = columns[0].astype(str)
+    for column in columns[1:]:
+        lines = np.char.add(np.char.add(lines, ","), column.astype(str))
+    return io.StringIO("\n".join(lines.tolist()) + "\n")
+
+def copy_customers(cur, customers, hashes, batch_size=BATCH_SIZE):
+    """COPY vào bảng tạm rồi INSERT ... ON CONFLICT; trả về [(id, index trong customers)]"""
+    cur.execute("""
+        CREATE TEMP TABLE customers_stage (
+            idx INT, name VARCHAR, email VARCHAR, password VARCHAR, created_at TIMESTAMP WITH TIME ZONE
+        ) ON COMMIT DROP
+    """)
+    count = len(customers["email"])
+    for offset in range(0, count, batch_size):
+        part = slice(offset, offset + batch_size)
+        buffer = _csv_buffer(
+            np.arange(offset, min(offset + batch_size, count)),
+            customers["name"][part],
+            customers["email"][part],
+            customers["password"][part],
+            customers["created_at"][part],
+        )
+        cur.copy_expert("COPY customers_stage (idx, name, email, password, created_at) FROM STDIN WITH CSV", buffer)
+
+    # Hash chỉ join theo vài password khác nhau, không đi qua Python từng dòng
+    cur.execute("CREATE TEMP TABLE password_hashes (password VARCHAR PRIMARY KEY, hash TEXT) ON COMMIT DROP")
+    cur.executemany("INSERT INTO password_hashes VALUES (%s, %s)", list(hashes.items()))
+    cur.execute("""
+        INSERT INTO customers (name, email, password_hash, status, created_at, updated_at)
+        SELECT s.name, s.email, h.hash, 'active', s.created_at, s.created_at
+        FROM customers_stage s
+        JOIN password_hashes h ON h.password = s.password
+        ORDER BY s.idx
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, email
+    """)
+    index = {email: i for i, email in enumerate(customers["email"].tolist())}
+    return [(customer_id, index[email]) for customer_id, email in cur.fetchall()]
+
+def write_manifest(path, rows, customers):
+    """Ghi id, email, password, name, phone của các account vừa tạo"""
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    idx = np.array([r[1] for r in rows], dtype=np.int64)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,email,password,name,phone\n")
+        if len(rows):
+            f.write(_csv_buffer(
+                ids, customers["email"][idx], customers["password"][idx],
+                customers["name"][idx], customers["phone"][idx],
+            ).getvalue())
+
+# ==================== SEED ====================
+def seed_customers(count=DEFAULT_COUNT, passwords=(DEFAULT_PASSWORD,), manifest=DEFAULT_MANIFEST,
+                   seed=None, batch_size=BATCH_SIZE):
+    """Tạo count customers active, trả về số account đã insert"""
+    log("=== Bước 4b: Seed Customers ===")
+    started = time.perf_counter()
+
+    with stage("hash_passwords"):
+        hashes = hash_passwords(passwords)
+    log(f"Hash {len(hashes)} password trong {time.perf_counter() - started:.2f}s")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    # Số thứ tự email tiếp nối lần chạy trước để không đụng email cũ
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM customers")
+    start = cur.fetchone()[0] + 1
+
+    generate_started = time.perf_counter()
+    with stage("generate_customers"):
+        customers = generate_customers(count, start=start, seed=seed, passwords=list(hashes))
+    log(f"Sinh {count} customers trong {time.perf_counter() - generate_started:.2f}s")
+
+    with stage("copy_customers"):
+        rows = copy_customers(cur, customers, hashes, batch_size)
+        conn.commit()
+    cur.close()
+    conn.close()
+
+    if manifest:
+        with stage("write_manifest"):
+            write_manifest(manifest, rows, customers)
+        log(f"Ghi manifest {manifest}")
+    log(f"✅ Seeded {len(rows)} customers trong {time.perf_counter() - started:.2f}s")
+    return len(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Tạo hàng loạt customer accounts")
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT)
+    parser.add_argument("--passwords", default=DEFAULT_PASSWORD, help="danh sách password, phân tách bằng dấu phẩy")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="file CSV credentials ('' để bỏ qua)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed để tái lập dữ liệu")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    passwords = [p for p in args.passwords.split(",") if p]
+    try:
+        seed_customers(args.count, passwords, args.manifest, args.seed, args.batch_size)
+    except Exception as e:
+        log(f"❌ Lỗi: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        profiler.summary()
+
+if __name__ == "__main__":
+    main()
@@ -5,32 +5,22 @@ Script Seed Data cho Fashion E-commerce Backend
 - Mix cả SQL Insert và API calls
 - Addresses: Dùng API lấy địa chỉ VN thật
 - Reviews: Random 5-20 reviews/product với 20 mẫu comments tiếng Việt
+
+Chạy qua CLI chung: python seed.py (python seed_data.py = python seed.py all).
+pandas / requests / psycopg2 chỉ được import trong hàm cần đến, nên các script
+khác import log / get_db_connection từ đây không phải trả chi phí đó.
 """
 
 import os
 import sys
-import psycopg2
-import requests
-import pandas as pd
 import random
 import json
+import uuid
 from datetime import datetime, timedelta
 from urllib.parse import quote
-import time
-
-# ==================== CONFIG ====================
-BASE_URL = "http://localhost:3001"
-ADMIN_EMAIL = "lecas.office@gmail.com"
-ADMIN_PASSWORD = "Minh1204"
 
-# Database connection
-DB_CONFIG = {
-    "host": "db.sdviskalbqirwlrpvmrp.supabase.co",
-    "port": 5432,
-    "database": "postgres",
-    "user": "postgres",
-    "password": "Mimikyu1204"
-}
+# Config đọc từ env / .env (DATABASE_URL, BASE_URL, ...), xem seed_config.py
+from seed_config import BASE_URL, DB_CONFIG, admin_credentials
 
 # Excel files
 EXCEL_FILES = [
@@ -66,17 +56,21 @@ REVIEW_COMMENTS = [
 
 # ==================== HELPERS ====================
 def log(message):
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+    # 1 lần ghi / dòng để log của các stage chạy song song (--jobs) không dính nhau
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n", end="", flush=True)
 
 def get_db_connection():
+    import psycopg2
     return psycopg2.connect(**DB_CONFIG)
 
 def login_admin():
     """Login admin và lấy JWT token"""
+    import requests
+    email, password = admin_credentials()
     log("Đang login admin...")
     response = requests.post(f"{BASE_URL}/api/v1/admin/auth/login", json={
-        "email": ADMIN_EMAIL,
-        "password": ADMIN_PASSWORD
+        "email": email,
+        "password": password
     })
     if response.status_code == 200 or response.status_code == 201:
         token = response.json()["access_token"]
@@ -88,6 +82,7 @@ def login_admin():
 
 def login_customer(customer_id):
     """Login customer và lấy JWT token (dùng password mặc định)"""
+    import requests
     conn = get_db_connection()
     cur = conn.cursor()
     cur.execute("SELECT email FROM customers WHERE id = %s", (customer_id,))
@@ -109,14 +104,30 @@ def login_customer(customer_id):
     return None
 
 def get_provinces():
-    """Lấy danh sách tỉnh/thành phố từ API"""
-    response = requests.get(f"{BASE_URL}/api/v1/address/provinces")
-    if response.status_code == 200:
-        return response.json()
+    """Lấy danh sách tỉnh/thành phố từ API ([] nếu backend không chạy)"""
+    import requests
+    try:
+        response = requests.get(f"{BASE_URL}/api/v1/address/provinces")
+        if response.status_code == 200:
+            return response.json()
+    except requests.RequestException:
+        pass
     return []
 
+def get_province_display_name(province: dict) -> str:
+    """Trả về tên tỉnh/thành phố từ object province (hỗ trợ nhiều schema)"""
+    return (
+        province.get('full_name')
+        or province.get('name')
+        or province.get('fullName')
+        or province.get('province_name')
+        or province.get('provinceName')
+        or ''
+    )
+
 def get_districts(province_code):
     """Lấy danh sách quận/huyện theo tỉnh"""
+    import requests
     response = requests.get(f"{BASE_URL}/api/v1/address/districts?province_code={province_code}")
     if response.status_code == 200:
         return response.json()
@@ -124,6 +135,7 @@ def get_districts(province_code):
 
 def get_wards(province_code):
     """Lấy danh sách phường/xã theo tỉnh"""
+    import requests
     response = requests.get(f"{BASE_URL}/api/v1/address/wards?province_code={province_code}")
     if response.status_code == 200:
         return response.json()
@@ -143,6 +155,7 @@ def generate_slug(name):
 
 def seed_categories():
     """Seed categories từ Excel files"""
+    import pandas as pd
     log("=== Bước 1: Seed Categories ===")
     
     all_categories = []
@@ -175,6 +188,7 @@ def seed_categories():
 
 def seed_colors():
     """Seed colors từ Excel files"""
+    import pandas as pd
     log("=== Bước 2: Seed Colors ===")
     
     # Mapping màu sang hex code
@@ -215,6 +229,7 @@ def seed_colors():
 
 def seed_products():
     """Seed products từ Excel files"""
+    import pandas as pd
     log("=== Bước 3: Seed Products ===")
     
     all_products = []
@@ -256,6 +271,7 @@ def seed_products():
 
 def seed_variants_and_images():
     """Seed variants và images cho mỗi product"""
+    import pandas as pd
     log("=== Bước 4: Seed Product Variants & Images ===")
     
     all_products = []
@@ -389,7 +405,7 @@ def seed_customer_addresses():
                 random.choice(["Home", "Office"]),
                 f"{random.randint(1, 999)} {random.choice(['Đường', 'Phố', 'Ngõ'])} {street}",
                 f"0{random.randint(900000000, 999999999)}",
-                province['full_name'],
+                get_province_display_name(province),
                 district,
                 ward
             ))
@@ -513,67 +529,86 @@ def seed_orders():
     conn.close()
 
 def seed_reviews():
-    """Seed reviews cho sản phẩm (5-20 reviews/product, từ delivered orders)"""
-    log("=== Bước 7: Seed Product Reviews ===")
+    """Seed 5-20 reviews cho mỗi product (SQL, order_id lấy từ delivered orders)"""
+    import psycopg2
+
+    log("=== Bước 7: Seed Product Reviews (5-20/product) ===")
     
     conn = get_db_connection()
     cur = conn.cursor()
     
-    # Lấy các delivered orders
+    # Lấy tất cả products
+    cur.execute("SELECT id FROM products WHERE status = 'active'")
+    product_ids = [row[0] for row in cur.fetchall()]
+    
+    # Lấy tất cả customers
+    cur.execute("SELECT id FROM customers")
+    customer_ids = [row[0] for row in cur.fetchall()]
+    
+    # Lấy delivered orders để có order_id hợp lệ
     cur.execute("""
-        SELECT o.id, o.customer_id, oi.variant_id
-        FROM orders o
-        JOIN order_items oi ON o.id = oi.order_id
-        WHERE o.fulfillment_status = 'delivered'
-        ORDER BY RANDOM()
+        SELECT id, customer_id FROM orders 
+        WHERE fulfillment_status = 'delivered'
     """)
-    delivered_items = cur.fetchall()
+    delivered_orders = cur.fetchall()
     
-    if not delivered_items:
-        log("❌ Không có delivered orders để tạo reviews")
-        return
+    if not delivered_orders:
+        log("⚠️ Không có delivered orders, tạo fake orders để có order_id")
+        # Tạo một số fake delivered orders
+        for _ in range(50):
+            customer_id = random.choice(customer_ids)
+            cur.execute("""
+                INSERT INTO orders (
+                    customer_id, shipping_address, shipping_phone, 
+                    shipping_city, shipping_district, shipping_ward,
+                    fulfillment_status, payment_status, payment_method,
+                    shipping_fee, total_amount, order_number
+                )
+                VALUES (%s, 'Fake Address', '0900000000', 'Hà Nội', 'Hoàn Kiếm', 'Phường 1',
+                        'delivered', 'paid', 'cod', 30000, 100000, %s)
+                RETURNING id
+            """, (customer_id, f"FAKE{uuid.uuid4().hex[:12].upper()}"))
+            order_id = cur.fetchone()[0]
+            delivered_orders.append((order_id, customer_id))
+        conn.commit()
+        log(f"Tạo {len(delivered_orders)} fake delivered orders")
     
     reviews_created = 0
     
-    for order_id, customer_id, variant_id in delivered_items:
-        # Random số lượng reviews (không phải tất cả đều review)
-        if random.random() < 0.4:
-            continue
+    for product_id in product_ids:
+        # Random 5-20 reviews cho mỗi product
+        num_reviews = random.randint(5, 20)
         
-        # Random 1 comment từ pool
-        review_template = random.choice(REVIEW_COMMENTS)
+        # Lấy variants của product này
+        cur.execute("""
+            SELECT id FROM product_variants 
+            WHERE product_id = %s AND status = 'active'
+            LIMIT 10
+        """, (product_id,))
+        variant_ids = [row[0] for row in cur.fetchall()]
         
-        # Login customer
-        token = login_customer(customer_id)
-        if not token:
-            # Fallback: Insert trực tiếp SQL
-            cur.execute("""
-                INSERT INTO product_reviews (variant_id, customer_id, order_id, rating, comment, status)
-                VALUES (%s, %s, %s, %s, %s, 'approved')
-            """, (variant_id, customer_id, order_id, review_template['rating'], review_template['comment']))
-            reviews_created += 1
+        if not variant_ids:
             continue
         
-        # Call API
-        response = requests.post(
-            f"{BASE_URL}/reviews",
-            headers={"Authorization": f"Bearer {token}"},
-            json={
-                "variant_id": variant_id,
-                "order_id": order_id,
-                "rating": review_template['rating'],
-                "comment": review_template['comment']
-            }
-        )
-        
-        if response.status_code in [200, 201]:
-            reviews_created += 1
-        
-        time.sleep(0.1)
-        
-        # Limit số reviews để không quá nhiều
-        if reviews_created >= 100:
-            break
+        for _ in range(num_reviews):
+            variant_id = random.choice(variant_ids)
+            order_id, customer_id = random.choice(delivered_orders)
+            review_template = random.choice(REVIEW_COMMENTS)
+            
+            # Savepoint: 1 dòng lỗi chỉ rollback dòng đó, không làm hỏng cả transaction
+            cur.execute("SAVEPOINT review")
+            try:
+                cur.execute("""
+                    INSERT INTO product_reviews (variant_id, customer_id, order_id, rating, comment, status)
+                    VALUES (%s, %s, %s, %s, %s, 'approved')
+                    ON CONFLICT DO NOTHING
+                """, (variant_id, customer_id, order_id, review_template['rating'], review_template['comment']))
+                reviews_created += cur.rowcount
+            except psycopg2.Error as e:
+                cur.execute("ROLLBACK TO SAVEPOINT review")
+                log(f"⚠️ Bỏ qua review variant {variant_id}: {e}")
+            else:
+                cur.execute("RELEASE SAVEPOINT review")
     
     conn.commit()
     
@@ -595,7 +630,7 @@ def seed_reviews():
     """)
     conn.commit()
     
-    log(f"✅ Seeded {reviews_created} reviews và updated product ratings")
+    log(f"✅ Seeded {reviews_created} reviews (5-20/product) và updated product ratings")
     cur.close()
     conn.close()
 
@@ -665,31 +700,9 @@ def seed_promotions():
 # ==================== MAIN ====================
 
 def main():
-    log("🌱 Bắt đầu seed data...")
-    log("=" * 50)
-    
-    try:
-        # Login admin để lấy token
-        admin_token = login_admin()
-        
-        # Seed data theo thứ tự
-        seed_categories()
-        seed_colors()
-        seed_products()
-        seed_variants_and_images()
-        seed_customer_addresses()
-        seed_orders()
-        seed_reviews()
-        seed_promotions()
-        
-        log("=" * 50)
-        log("✅ Hoàn thành seed data!")
-        
-    except Exception as e:
-        log(f"❌ Lỗi: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
+    """Tương đương `python seed.py all` (validate Excel + mọi stage theo thứ tự)"""
+    from seed import main as seed_main
+    seed_main(["all"] + sys.argv[1:])
 
 if __name__ == "__main__":
     main()
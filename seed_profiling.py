@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Profile từng stage của các script seed (--profile)
+
+    python seed.py --profile                         # sampling, ghi profiles/<stage>.folded
+    python seed.py remaining --jobs 3 --profile      # mỗi thread stage có sampler riêng
+    python seed.py --profile cprofile                # cProfile, ghi profiles/<stage>.prof
+    python seed_customers.py --count 100000 --profile --profile-dir /tmp/prof
+
+Mỗi stage (seed_categories, seed_products, copy_customers, ...) chạy trong
+stage(name):
+
+- sample   (mặc định) 1 thread đọc stack của thread đang chạy stage mỗi
+           SEED_PROFILE_INTERVAL_MS ms (wall clock, nên thời gian chờ psycopg2 /
+           requests cũng hiện ra). Ghi <stage>.folded dạng collapsed stack
+           ("main;seed_products;execute 42"): mở bằng speedscope
+           (https://www.speedscope.app) hoặc flamegraph.pl / inferno.
+- cprofile deterministic, ghi <stage>.prof (pstats; snakeviz, gprof2dot).
+           Mỗi lúc chỉ 1 thread được cProfile (Python 3.12+ bắt buộc),
+           stage chạy song song ở thread khác thì không được profile.
+
+Cuối lần chạy (profiler.summary()) ghi file và in wall time + top hàm
+(self / total) của từng stage; stage chạy nhiều lần (mỗi batch) được cộng
+dồn. Trạng thái theo từng thread: stage lồng nhau thì chỉ stage ngoài cùng
+của thread đó được profile, stage chạy song song (seed.py --jobs) được
+profile riêng. Không bật
+--profile thì stage() chỉ là context manager rỗng.
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# 1 lần ghi / dòng, an toàn khi stage chạy song song
+from seed_data import log
+
+PROFILE_MODES = ("sample", "cprofile")
+DEFAULT_PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL_MS = float(os.getenv("SEED_PROFILE_INTERVAL_MS", "5"))
+TOP_FUNCTIONS = 10
+
+_THIS_FILE = os.path.abspath(__file__)
+
+# ==================== SAMPLER ====================
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler(threading.Thread):
+    """Đếm stack của 1 thread mỗi interval giây (không cần signal, chạy cả trên Windows)"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="seed-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                if os.path.abspath(frame.f_code.co_filename) != _THIS_FILE:
+                    stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+# ==================== PROFILER ====================
+class StageProfile:
+    __slots__ = ("name", "wall", "samples", "profilers", "runs")
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.samples = Counter()
+        self.profilers = []  # 1 cProfile.Profile / lần chạy, gộp lại khi ghi
+        self.runs = 0
+
+class SeedProfiler:
+    def __init__(self):
+        self.mode = None
+        self.out_dir = DEFAULT_PROFILE_DIR
+        self.stages = {}
+        self._local = threading.local()  # .active: thread này đang ở trong 1 stage được profile
+        self._lock = threading.Lock()    # stages / StageProfile dùng chung giữa các thread
+        self._cprofile_thread = None
+
+    def configure(self, mode, out_dir=DEFAULT_PROFILE_DIR):
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"profile mode phải là {PROFILE_MODES}")
+        self.mode = mode
+        self.out_dir = out_dir
+        if mode:
+            os.makedirs(out_dir, exist_ok=True)
+
+    def _claim_cprofile(self):
+        """cProfile chỉ chạy được ở 1 thread mỗi lúc; False nếu thread khác đang giữ"""
+        with self._lock:
+            if self._cprofile_thread is not None:
+                return False
+            self._cprofile_thread = threading.get_ident()
+            return True
+
+    @contextmanager
+    def stage(self, name):
+        if not self.mode or getattr(self._local, "active", False):
+            yield
+            return
+        if self.mode == "cprofile" and not self._claim_cprofile():
+            log(f"⚠️ {name}: không profile (cProfile đang chạy ở stage khác)")
+            self._local.active = True  # stage lồng bên trong cũng bỏ qua, không cảnh báo lại
+            try:
+                yield
+            finally:
+                self._local.active = False
+            return
+        with self._lock:
+            profile = self.stages.setdefault(name, StageProfile(name))
+        self._local.active = True
+        sampler = cprofiler = None
+        if self.mode == "sample":
+            sampler = StackSampler(threading.get_ident(), SAMPLE_INTERVAL_MS / 1000)
+            sampler.start()
+        else:
+            import cProfile
+            cprofiler = cProfile.Profile()
+            cprofiler.enable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if sampler is not None:
+                sampler.stop()
+            else:
+                cprofiler.disable()
+            with self._lock:
+                if sampler is not None:
+                    profile.samples.update(sampler.samples)
+                else:
+                    profile.profilers.append(cprofiler)
+                    self._cprofile_thread = None
+                profile.wall += elapsed
+                profile.runs += 1
+            self._local.active = False
+            log(f"⏱  {name}: {elapsed:.2f}s")
+
+    # ---------- output ----------
+    def _write(self, profile):
+        path = os.path.join(self.out_dir, profile.name)
+        if self.mode == "sample":
+            with open(path + ".folded", "w", encoding="utf-8") as f:
+                for stack, count in profile.samples.most_common():
+                    f.write(";".join(stack) + f" {count}\n")
+        else:
+            self._stats(profile).dump_stats(path + ".prof")
+
+    @staticmethod
+    def _stats(profile):
+        import pstats
+        return pstats.Stats(*profile.profilers)
+
+    def top_functions(self, profile, limit=TOP_FUNCTIONS):
+        """[(label, self_seconds, total_seconds)] sắp theo self time"""
+        if self.mode == "sample":
+            total_samples = sum(profile.samples.values())
+            if not total_samples:
+                return []
+            self_counts, total_counts = Counter(), Counter()
+            for stack, count in profile.samples.items():
+                self_counts[stack[-1]] += count
+                for label in set(stack):
+                    total_counts[label] += count
+            scale = profile.wall / total_samples
+            return [(label, count * scale, total_counts[label] * scale) for label, count in self_counts.most_common(limit)]
+
+        stats = self._stats(profile).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        return [
+            (f"{func} ({os.path.basename(file)}:{line})", tottime, cumtime)
+            for (file, line, func), (_, _, tottime, cumtime, _) in rows
+        ]
+
+    def summary(self):
+        """Ghi file profile và in wall time + top hàm của từng stage"""
+        if not self.mode or not self.stages:
+            return
+        total = sum(p.wall for p in self.stages.values()) or 1
+        ext = ".folded" if self.mode == "sample" else ".prof"
+        log("=" * 50)
+        log(f"Profile theo stage ({self.mode}, {self.out_dir}/<stage>{ext}):")
+        for profile in sorted(self.stages.values(), key=lambda p: p.wall, reverse=True):
+            self._write(profile)
+            runs = f" x{profile.runs}" if profile.runs > 1 else ""
+            log(f"{profile.name}{runs}: {profile.wall:.2f}s ({profile.wall / total * 100:.1f}%)")
+            for label, self_seconds, total_seconds in self.top_functions(profile):
+                share = self_seconds / profile.wall * 100 if profile.wall else 0
+                log(f"   {self_seconds:8.3f}s self {share:5.1f}%  {total_seconds:8.3f}s total  {label}")
+
+# Shared instance cho các script seed
+profiler = SeedProfiler()
+stage = profiler.stage
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", nargs="?", const="sample", choices=PROFILE_MODES,
+                        help="profile từng stage (sample: collapsed stacks, cprofile: .prof)")
+    parser.add_argument("--profile-dir", default=DEFAULT_PROFILE_DIR)
+
+def configure_from_args(args):
+    profiler.configure(args.profile, args.profile_dir)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Kiểm tra dữ liệu Excel trước khi seed (chưa ghi gì vào DB)
+
+    python seed_validation.py                  # kiểm tra EXCEL_FILES, so với DB
+    python seed_validation.py --offline        # không kết nối DB, chỉ so giữa các sheet
+
+Đọc mỗi file 1 lần (mọi sheet), lấy reference sets từ DB 1 lần (categories,
+colors, slugs đã có), rồi kiểm tra từng sheet bằng phép toán DataFrame:
+
+- Categories: thiếu tên, trùng id khác tên, slug trùng, id lệch với DB (cảnh báo)
+- Colors: id không phải số, thiếu tên, trùng id khác tên (giữa các file: cảnh báo)
+- Products: category_id không tồn tại, color_ids có phần tử không phải số /
+  không tồn tại, images rỗng hoặc không phải URL, selling_price không hợp lệ,
+  tên rỗng, slug trùng giữa các dòng
+
+Mọi lỗi được báo 1 lần kèm file / sheet / dòng Excel. seed_data.main() gọi
+validate_excel() và dừng trước bước ghi đầu tiên nếu có lỗi.
+"""
+
+import os
+import sys
+import argparse
+
+import pandas as pd
+
+from seed_data import EXCEL_FILES, log, get_db_connection, generate_slug
+
+REQUIRED_COLUMNS = {
+    "Categories": ["id", "name"],
+    "Colors": ["id", "name"],
+    "Products": ["id", "category_id", "name", "description", "selling_price", "color_ids", "images"],
+}
+HEADER_ROWS = 1  # dòng Excel = index DataFrame + 1 + HEADER_ROWS
+
+class ValidationReport:
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+
+    def add(self, level, file, sheet, rows, column, message):
+        """rows: index DataFrame của các dòng lỗi (1 message cho mỗi dòng)"""
+        target = self.errors if level == "error" else self.warnings
+        for row in rows:
+            target.append((file, sheet, int(row) + 1 + HEADER_ROWS, column, message))
+
+    def add_mask(self, level, file, df, sheet, mask, column, message):
+        if mask.any():
+            self.add(level, file, sheet, df.index[mask], column, message)
+
+    def print(self):
+        for level, items in (("❌", self.errors), ("⚠️", self.warnings)):
+            for file, sheet, row, column, message in sorted(items, key=lambda e: (e[0], e[1], e[2])):
+                log(f"{level} {file} [{sheet}] dòng {row} cột {column}: {message}")
+        log(f"Kiểm tra xong: {len(self.errors)} lỗi, {len(self.warnings)} cảnh báo")
+
+    @property
+    def ok(self):
+        return not self.errors
+
+# ==================== REFERENCE DATA ====================
+def fetch_reference():
+    """Reference sets từ DB, mỗi bảng 1 query"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM categories")
+    categories = pd.Series(dict(cur.fetchall()), dtype=object)
+    cur.execute("SELECT id FROM colors")
+    colors = {row[0] for row in cur.fetchall()}
+    cur.execute("SELECT slug FROM products")
+    slugs = {row[0] for row in cur.fetchall()}
+    cur.close()
+    conn.close()
+    return {"categories": categories, "colors": colors, "slugs": slugs}
+
+def load_sheets(files):
+    """{file: {sheet: DataFrame}}, mỗi file đọc 1 lần"""
+    sheets = {}
+    for file in files:
+        if not os.path.exists(file):
+            continue
+        sheets[file] = pd.read_excel(file, sheet_name=None)
+    return sheets
+
+def _split_list(series, sep):
+    """'1,2, x' -> Series phần tử đã strip, index = index dòng gốc"""
+    parts = series.fillna("").astype(str).str.split(sep).explode().str.strip()
+    return parts[parts != ""]
+
+def _blank(series):
+    return series.isna() | (series.astype(str).str.strip() == "")
+
+# ==================== CHECKS ====================
+def check_columns(report, file, sheet, df):
+    missing = [c for c in REQUIRED_COLUMNS[sheet] if c not in df.columns]
+    if missing:
+        report.errors.append((file, sheet, HEADER_ROWS, ",".join(missing), "thiếu cột"))
+    return not missing
+
+def check_id_name_sheet(report, sheet, frames):
+    """Categories / Colors: id số, tên không rỗng, cùng id thì cùng tên giữa các file"""
+    combined = pd.concat([df.assign(_file=file) for file, df in frames], ignore_index=False)
+    for file, df in frames:
+        ids = pd.to_numeric(df["id"], errors="coerce")
+        report.add_mask("error", file, df, sheet, ids.isna(), "id", "id không phải số")
+        report.add_mask("error", file, df, sheet, _blank(df["name"]), "name", "thiếu tên")
+
+    valid = combined[pd.to_numeric(combined["id"], errors="coerce").notna() & ~_blank(combined["name"])]
+    valid = valid.assign(id=valid["id"].astype(int), name=valid["name"].astype(str).str.strip())
+    # Trong 1 file: lỗi. Giữa các file: cảnh báo, seed_colors ghi đè theo id nên file sau thắng
+    per_file = valid.groupby(["_file", "id"])["name"].transform("nunique")
+    for file, group in valid[per_file > 1].groupby("_file"):
+        report.add("error", file, sheet, group.index, "id", "cùng id nhưng tên khác trong file")
+    across = valid.groupby("id")["name"].transform("nunique")
+    for file, group in valid[(across > 1) & (per_file == 1)].groupby("_file"):
+        report.add("warning", file, sheet, group.index, "id", "cùng id nhưng tên khác ở file khác")
+    return valid.drop_duplicates("id").set_index("id")["name"]
+
+def check_categories(report, frames, reference):
+    names = check_id_name_sheet(report, "Categories", frames)
+    # seed_categories insert theo slug, id do DB sinh -> id trong sheet phải khớp tên trong DB
+    if reference is not None and len(names):
+        db_names = reference["categories"].reindex(names.index)
+        mismatch = db_names.notna() & (db_names.astype(str) != names)
+        for category_id in names.index[mismatch]:
+            for file, df in frames:
+                rows = df.index[pd.to_numeric(df["id"], errors="coerce") == category_id]
+                report.add("warning", file, "Categories", rows, "id",
+                           f"id {category_id} trong DB là '{db_names[category_id]}', products sẽ gắn vào category đó")
+    slugs = names.map(generate_slug)
+    duplicated = slugs[slugs.duplicated(keep=False)]
+    for category_id in duplicated.index:
+        for file, df in frames:
+            rows = df.index[pd.to_numeric(df["id"], errors="coerce") == category_id]
+            report.add("error", file, "Categories", rows, "name", f"slug '{slugs[category_id]}' trùng với category khác")
+    return set(names.index)
+
+def check_products(report, frames, category_ids, color_ids, reference):
+    all_slugs = []
+    for file, df in frames:
+        add = lambda mask, column, message, level="error": report.add_mask(level, file, df, "Products", mask, column, message)
+
+        category = pd.to_numeric(df["category_id"], errors="coerce")
+        add(category.isna(), "category_id", "category_id không phải số")
+        add(category.notna() & ~category.isin(category_ids), "category_id", "category_id không tồn tại")
+
+        price = pd.to_numeric(df["selling_price"], errors="coerce")
+        add(price.isna() | (price <= 0), "selling_price", "selling_price không hợp lệ")
+
+        add(_blank(df["name"]), "name", "thiếu tên")
+        add(_blank(df["description"]), "description", "thiếu mô tả", level="warning")
+
+        # color_ids: "1,2,3" -> mọi phần tử phải là số và có trong Colors / DB
+        add(_blank(df["color_ids"]), "color_ids", "color_ids rỗng")
+        colors = _split_list(df["color_ids"], ",")
+        color_numbers = pd.to_numeric(colors, errors="coerce")
+        not_number = color_numbers.isna()
+        unknown = color_numbers.notna() & ~color_numbers.isin(color_ids)
+        report.add("error", file, "Products", colors.index[not_number].unique(), "color_ids", "có phần tử không phải số")
+        report.add("error", file, "Products", colors.index[unknown].unique(), "color_ids", "có color id không tồn tại")
+
+        # images: rỗng làm seed_variants_and_images crash ở .split(', ')
+        add(_blank(df["images"]), "images", "images rỗng")
+        images = _split_list(df["images"], ", ")
+        bad_url = ~images.str.match(r"^https?://")
+        report.add("error", file, "Products", images.index[bad_url].unique(), "images", "có ảnh không phải URL http(s)")
+
+        slugs = df["name"].fillna("").astype(str).map(generate_slug)
+        add(~_blank(df["name"]) & (slugs == ""), "name", "tên không tạo được slug")
+        if reference is not None:
+            add(slugs.isin(reference["slugs"]), "name", "slug đã có trong DB, dòng sẽ bị bỏ qua", level="warning")
+        all_slugs.append(pd.DataFrame({"file": file, "row": df.index, "slug": slugs}))
+
+    if all_slugs:
+        slugs = pd.concat(all_slugs, ignore_index=True)
+        slugs = slugs[slugs["slug"] != ""]
+        # Loader dùng ON CONFLICT (slug) DO NOTHING: dòng đầu tiên được giữ, các dòng sau bị bỏ qua
+        duplicated = slugs[slugs["slug"].duplicated(keep="first")]
+        for (file, slug), group in duplicated.groupby(["file", "slug"]):
+            report.add("warning", file, "Products", group["row"], "name",
+                       f"slug '{slug}' trùng với dòng trước, dòng sẽ bị bỏ qua")
+
+def validate_excel(files=EXCEL_FILES, offline=False):
+    """Kiểm tra mọi sheet của mọi file, trả về ValidationReport (không ghi DB)"""
+    log("=== Kiểm tra dữ liệu Excel ===")
+    report = ValidationReport()
+    sheets = load_sheets(files)
+    reference = None if offline else fetch_reference()
+
+    frames = {sheet: [] for sheet in REQUIRED_COLUMNS}
+    for file, workbook in sheets.items():
+        for sheet in REQUIRED_COLUMNS:
+            if sheet not in workbook:
+                report.errors.append((file, sheet, 0, "-", "thiếu sheet"))
+                continue
+            if check_columns(report, file, sheet, workbook[sheet]):
+                frames[sheet].append((file, workbook[sheet]))
+
+    category_ids = check_categories(report, frames["Categories"], reference)
+    color_ids = set(check_id_name_sheet(report, "Colors", frames["Colors"]).index)
+    if reference is not None:
+        color_ids |= reference["colors"]
+        category_ids |= set(reference["categories"].index)
+    check_products(report, frames["Products"], category_ids, color_ids, reference)
+
+    rows = sum(len(df) for workbook in sheets.values() for df in workbook.values())
+    log(f"Đã kiểm tra {len(sheets)} file, {rows} dòng")
+    return report
+
+def check_excel(files=EXCEL_FILES):
+    """Stage validate của seed.py: in báo cáo, dừng (exit 1) nếu Excel có lỗi"""
+    report = validate_excel(files)
+    report.print()
+    if not report.ok:
+        log("❌ Dữ liệu Excel có lỗi, dừng trước khi seed")
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiểm tra dữ liệu Excel trước khi seed")
+    parser.add_argument("files", nargs="*", default=EXCEL_FILES)
+    parser.add_argument("--offline", action="store_true", help="không kết nối DB")
+    args = parser.parse_args()
+
+    report = validate_excel(args.files, args.offline)
+    report.print()
+    sys.exit(0 if report.ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -268,9 +268,13 @@ export class ChatService {
     const senderId = session.visitor_id || `session_${dto.session_id}`;
     let rasaResponses = [];
 
+    const rasaTimeoutMs = 10000;
+
     // Build metadata with customer_id
     const metadata: any = {
       session_id: dto.session_id.toString(),
+      // Action server uses this as the deadline for its backend calls
+      timeout_ms: rasaTimeoutMs,
     };
 
     if (customerId) {
@@ -282,10 +286,18 @@ export class ChatService {
       metadata.user_jwt_token = authHeader.replace('Bearer ', '');
     }
 
+    // "Xem thêm": trang tiếp theo của product_list (action_show_more_products)
+    if (dto.cursor) {
+      metadata.cursor = dto.cursor;
+    }
+
     console.log(`[Chat] Calling Rasa webhook: ${rasaUrl}/webhooks/rest/webhook`);
     console.log(`[Chat] Sender: ${senderId}, Message: "${dto.message}"`);
     console.log(`[Chat] Metadata:`, JSON.stringify(metadata));
 
+    // Thời gian round-trip tới Rasa (webhook + actions) của chính request này, trả về trong timing
+    const rasaStartedAt = Date.now();
+    let rasaMs: number;
     try {
       const response = await firstValueFrom(
         this.httpService.post(
@@ -296,15 +308,17 @@ export class ChatService {
             metadata: metadata, // ✅ Include metadata with customer_id
           },
           {
-            timeout: 10000, // 10 seconds timeout
+            timeout: rasaTimeoutMs,
           },
         ),
       );
 
+      rasaMs = Date.now() - rasaStartedAt;
       rasaResponses = response.data || [];
       console.log(`[Chat] Rasa responded with ${rasaResponses.length} message(s)`);
       console.log(`[Chat] 🔍 DEBUG - Full Rasa response:`, JSON.stringify(rasaResponses, null, 2));
     } catch (error) {
+      rasaMs = Date.now() - rasaStartedAt;
       // Log detailed error for debugging
       console.error('[Chat] Rasa webhook failed:', error.message);
       if (error.code === 'ECONNREFUSED') {
@@ -367,6 +381,8 @@ export class ChatService {
     return {
       customer_message: customerMessage,
       bot_responses: savedBotResponses,
+      // chat_load_test.py tách hop Rasa khỏi phần xử lý của backend bằng số này
+      timing: { rasa_ms: rasaMs },
     };
   }
 
@@ -20,4 +20,13 @@ export class SendMessageDto {
   @IsOptional()
   @IsUrl()
   image_url?: string;
+
+  @ApiProperty({
+    description: 'next_cursor của product_list trước đó, gửi kèm khi bấm "Xem thêm" (optional)',
+    required: false,
+    example: '3f9c1a2b7d4e:5',
+  })
+  @IsOptional()
+  @IsString()
+  cursor?: string;
 }
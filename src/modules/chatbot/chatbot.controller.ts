@@ -246,6 +246,27 @@ export class ChatbotController {
     };
   }
 
+  @Get('size-rules')
+  @ApiOperation({
+    summary: '[Internal] Get size recommendation rules',
+    description:
+      'Rules used by size-advice, so the Rasa action server can evaluate them locally without a copy of its own.',
+  })
+  @ApiResponse({
+    status: 200,
+    description: 'Size rules retrieved successfully',
+  })
+  @ApiResponse({
+    status: 401,
+    description: 'Invalid or missing API key',
+  })
+  getSizeRules() {
+    return {
+      success: true,
+      data: this.chatbotService.getSizeRules(),
+    };
+  }
+
   @Post('size-advice')
   @ApiOperation({
     summary: '[Internal] Get size recommendation',
@@ -31,6 +31,15 @@ import { SizeAdviceDto } from './dto/size-advice.dto';
 import { ProductRecommendDto } from './dto/product-recommend.dto';
 import { GeminiAskDto } from './dto/gemini-ask.dto';
 
+import {
+  SIZE_ADVICE_NOTE,
+  SIZE_FALLBACK,
+  SIZE_HEIGHT_RANGE,
+  SIZE_RULES,
+  SIZE_WEIGHT_RANGE,
+  matchSizeRule,
+} from './size-rules';
+
 @Injectable()
 export class ChatbotService {
   private readonly logger = new Logger(ChatbotService.name);
@@ -226,43 +235,17 @@ export class ChatbotService {
 
   /**
    * Get size recommendation based on height and weight
-   * Simple rule-based logic (can be enhanced with ML later)
+   * Rule-based, rules in size-rules.ts (shared with the Rasa action server via getSizeRules)
    */
   async getSizeAdvice(dto: SizeAdviceDto) {
     const { height, weight, category } = dto;
-
-    let recommendedSize: string;
-    let confidence: string;
-    let reason: string;
-
-    // Rule-based sizing logic
-    if (height >= 160 && height <= 170 && weight >= 50 && weight <= 60) {
-      recommendedSize = 'M';
-      confidence = 'high';
-      reason = 'Based on your height and weight measurements';
-    } else if (height > 170 && height <= 180 && weight > 60 && weight <= 75) {
-      recommendedSize = 'L';
-      confidence = 'high';
-      reason = 'Based on your height and weight measurements';
-    } else if (height > 180 || weight > 75) {
-      recommendedSize = 'XL';
-      confidence = 'medium';
-      reason = 'Based on your height and weight measurements';
-    } else if (height < 160 || weight < 50) {
-      recommendedSize = 'S';
-      confidence = 'medium';
-      reason = 'Based on your height and weight measurements';
-    } else {
-      recommendedSize = 'M';
-      confidence = 'low';
-      reason = 'General recommendation - please check size chart for accuracy';
-    }
+    const { size, confidence, reason } = matchSizeRule(height, weight, category);
 
     return {
-      recommended_size: recommendedSize,
+      recommended_size: size,
       confidence,
       reason,
-      note: 'This is a general recommendation. Please check the size chart for accurate measurements.',
+      note: SIZE_ADVICE_NOTE,
       measurements: {
         height: `${height} cm`,
         weight: `${weight} kg`,
@@ -270,6 +253,19 @@ export class ChatbotService {
     };
   }
 
+  /**
+   * Size rules for the Rasa action server, which evaluates them locally
+   */
+  getSizeRules() {
+    return {
+      height_range: SIZE_HEIGHT_RANGE,
+      weight_range: SIZE_WEIGHT_RANGE,
+      rules: SIZE_RULES,
+      fallback: SIZE_FALLBACK,
+      note: SIZE_ADVICE_NOTE,
+    };
+  }
+
   /**
    * Calculate relevance score for a product based on search query
    * Score range: 0.0 - 1.0
@@ -1,5 +1,6 @@
 import { IsInt, IsOptional, IsString, Min, Max } from 'class-validator';
 import { ApiProperty } from '@nestjs/swagger';
+import { SIZE_HEIGHT_RANGE, SIZE_WEIGHT_RANGE } from '../size-rules';
 
 /**
  * DTO for size advice/recommendation API
@@ -10,8 +11,8 @@ export class SizeAdviceDto {
     description: 'Height in centimeters',
   })
   @IsInt()
-  @Min(100)
-  @Max(250)
+  @Min(SIZE_HEIGHT_RANGE[0])
+  @Max(SIZE_HEIGHT_RANGE[1])
   height: number;
 
   @ApiProperty({
@@ -19,8 +20,8 @@ export class SizeAdviceDto {
     description: 'Weight in kilograms',
   })
   @IsInt()
-  @Min(30)
-  @Max(200)
+  @Min(SIZE_WEIGHT_RANGE[0])
+  @Max(SIZE_WEIGHT_RANGE[1])
   weight: number;
 
   @ApiProperty({
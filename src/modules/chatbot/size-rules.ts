@@ -0,0 +1,66 @@
+/**
+ * Luật tư vấn size - nguồn duy nhất cho cả backend và Rasa action server.
+ *
+ * - POST /api/chatbot/size-advice dùng trực tiếp (ChatbotService.getSizeAdvice)
+ * - GET /api/chatbot/size-rules trả nguyên bộ luật để action server dựng bảng tra cứu
+ *   (actions/size_chart.py), nên sửa luật ở đây là đủ, không cần sửa bên Python
+ *
+ * Khoảng là đoạn số nguyên đóng [min, max], null = không giới hạn.
+ * match 'all': cần cả chiều cao và cân nặng, 'any': một trong hai. Luật đầu tiên khớp được dùng.
+ */
+
+export type SizeRange = [number | null, number | null];
+
+export interface SizeRule {
+  size: string;
+  confidence: 'high' | 'medium' | 'low';
+  height: SizeRange;
+  weight: SizeRange;
+  match: 'all' | 'any';
+  reason: string;
+}
+
+// Giới hạn của SizeAdviceDto
+export const SIZE_HEIGHT_RANGE: [number, number] = [100, 250];
+export const SIZE_WEIGHT_RANGE: [number, number] = [30, 200];
+
+const MEASURED_REASON = 'Based on your height and weight measurements';
+
+export const SIZE_ADVICE_NOTE =
+  'This is a general recommendation. Please check the size chart for accurate measurements.';
+
+// Kết quả khi không luật nào khớp
+export const SIZE_FALLBACK = {
+  size: 'M',
+  confidence: 'low' as const,
+  reason: 'General recommendation - please check size chart for accuracy',
+};
+
+// Theo category (chữ thường); category không có trong đây dùng 'default'
+export const SIZE_RULES: Record<string, SizeRule[]> = {
+  default: [
+    { size: 'M', confidence: 'high', height: [160, 170], weight: [50, 60], match: 'all', reason: MEASURED_REASON },
+    { size: 'L', confidence: 'high', height: [171, 180], weight: [61, 75], match: 'all', reason: MEASURED_REASON },
+    { size: 'XL', confidence: 'medium', height: [181, null], weight: [76, null], match: 'any', reason: MEASURED_REASON },
+    { size: 'S', confidence: 'medium', height: [null, 159], weight: [null, 49], match: 'any', reason: MEASURED_REASON },
+  ],
+};
+
+function inRange(value: number, [min, max]: SizeRange): boolean {
+  return (min === null || value >= min) && (max === null || value <= max);
+}
+
+export function rulesFor(category?: string): SizeRule[] {
+  return SIZE_RULES[(category || '').toLowerCase()] || SIZE_RULES.default;
+}
+
+export function matchSizeRule(height: number, weight: number, category?: string) {
+  for (const rule of rulesFor(category)) {
+    const h = inRange(height, rule.height);
+    const w = inRange(weight, rule.weight);
+    if (rule.match === 'all' ? h && w : h || w) {
+      return { size: rule.size, confidence: rule.confidence, reason: rule.reason };
+    }
+  }
+  return SIZE_FALLBACK;
+}
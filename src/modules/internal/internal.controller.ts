@@ -41,6 +41,11 @@ export class InternalController {
     - search: Tìm theo tên/mô tả (vd: ?search=áo khoác)
     - category: Lọc theo category slug (vd: ?category=ao-khoac)
     - limit: Số lượng kết quả (default: 10)
+    - updated_since, after_id: Đồng bộ tăng dần theo watermark updated_at (dùng cho index của Action Server).
+      Khi có updated_since: trả cả sản phẩm inactive/đã xóa (kèm status, deleted_at), sắp xếp theo (updated_at, id)
+      và trả next_cursor để gọi trang tiếp theo. Bỏ qua search/category.
+    - ids: Lấy nhiều sản phẩm theo ID trong 1 request (vd: ?ids=1,2,3, tối đa 100), giữ thứ tự ids.
+      Dùng cho so sánh sản phẩm / giỏ hàng thay vì gọi /internal/products/:id từng cái.
     
     Trả về: name, selling_price, total_stock, description, category_name, thumbnail_url`,
   })
@@ -72,7 +77,24 @@ export class InternalController {
     @Query('search') search?: string,
     @Query('category') category?: string,
     @Query('limit') limit?: number,
+    @Query('updated_since') updatedSince?: string,
+    @Query('after_id') afterId?: number,
+    @Query('ids') ids?: string,
   ) {
+    if (ids !== undefined) {
+      return this.internalService.getProductsByIds(this.parseIdList(ids, 'ids'));
+    }
+    if (updatedSince !== undefined) {
+      const since = new Date(updatedSince);
+      if (isNaN(since.getTime())) {
+        throw new BadRequestException('Invalid updated_since format');
+      }
+      return this.internalService.getProductsChangedSince({
+        updatedSince: since,
+        afterId: afterId || 0,
+        limit: limit || 500,
+      });
+    }
     return this.internalService.searchProducts({ search, category, limit: limit || 10 });
   }
 
@@ -212,6 +234,7 @@ export class InternalController {
     - color: Lọc theo màu (vd: ?color=Đen)
     - in_stock: true/false - Chỉ lấy variants còn hàng
     - limit: Số lượng kết quả (default: 20)
+    - ids / product_ids: Lấy nhiều variant theo variant ID / product ID trong 1 request (vd: ?ids=4,8,15, tối đa 100)
     
     Trả về: variant_id, product_name, sku, size, color, stock, price, images`,
   })
@@ -252,9 +275,15 @@ export class InternalController {
     @Query('color') color?: string,
     @Query('in_stock') in_stock?: boolean,
     @Query('limit') limit?: number,
+    @Query('ids') ids?: string,
+    @Query('product_ids') productIds?: string,
   ) {
+    const variantIds = ids !== undefined ? this.parseIdList(ids, 'ids') : undefined;
+    const productIdList = productIds !== undefined ? this.parseIdList(productIds, 'product_ids') : undefined;
     return this.internalService.searchVariants({
       product_id: product_id ? Number(product_id) : undefined,
+      ids: variantIds,
+      product_ids: productIdList,
       sku,
       size,
       color,
@@ -263,6 +292,20 @@ export class InternalController {
     });
   }
 
+  /**
+   * "1,2,3" -> [1, 2, 3]; tối đa 100 ID cho mỗi request batch
+   */
+  private parseIdList(raw: string, name: string): number[] {
+    const ids = [...new Set(raw.split(',').map(s => s.trim()).filter(Boolean).map(Number))];
+    if (ids.length === 0 || ids.some(id => !Number.isInteger(id) || id <= 0)) {
+      throw new BadRequestException(`Invalid ${name} format, expected comma-separated IDs`);
+    }
+    if (ids.length > 100) {
+      throw new BadRequestException(`Too many ${name} (max 100)`);
+    }
+    return ids;
+  }
+
   // ==================== CHATBOT INTERNAL APIs ====================
 
   @Post('products/sizing-advice')
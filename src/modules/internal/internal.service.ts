@@ -537,45 +537,129 @@ export class InternalService {
     const products = await queryBuilder.getMany();
 
     return {
-      products: products.map(p => {
-        const totalStock = p.variants?.reduce((sum, v) => sum + (v.total_stock || 0), 0) || 0;
-        const availableSizes = [...new Set(p.variants?.map(v => v.size?.name).filter(Boolean))];
-        const availableColors = [...new Set(p.variants?.map(v => v.color?.name).filter(Boolean))];
-        const images =
-          p.variants
-            ?.flatMap(v => v.images || [])
-            .slice(0, 3)
-            .map(img => img.image_url) || [];
-
-        const variants =
-          p.variants?.map(v => ({
-            id: v.id,
-            variant_id: v.id,
-            size: v.size?.name || null,
-            color: v.color?.name || null,
-            stock: v.total_stock - v.reserved_stock,
-          })) || [];
-
-        return {
-          id: p.id,
-          name: p.name,
-          slug: p.slug,
-          description: p.description || '',
-          selling_price: p.selling_price,
-          total_stock: totalStock,
-          category_name: p.category?.name || null,
-          thumbnail_url: p.thumbnail_url || images[0] || null,
-          available_sizes: availableSizes,
-          available_colors: availableColors,
-          images: images,
-          variants: variants,
-          colors: availableColors,
-        };
-      }),
+      products: products.map(p => this.toChatbotProduct(p)),
       count: products.length,
     };
   }
 
+  /**
+   * Đồng bộ tăng dần cho index sản phẩm của Rasa Action Server.
+   * Keyset theo (updated_at làm tròn ms, id) để không lặp/mất bản ghi khi nhiều sản phẩm
+   * có cùng updated_at (vd: seed trong 1 transaction).
+   */
+  async getProductsChangedSince(options: { updatedSince: Date; afterId: number; limit: number }) {
+    const { updatedSince, afterId } = options;
+    const limit = Math.min(Math.max(options.limit, 1), 1000);
+    const changedAt = "date_trunc('milliseconds', p.updated_at)";
+
+    const rows = await this.productRepository
+      .createQueryBuilder('p')
+      .select('p.id', 'id')
+      .where(`(${changedAt}, p.id) > (:updatedSince, :afterId)`, { updatedSince, afterId })
+      .orderBy(changedAt, 'ASC')
+      .addOrderBy('p.id', 'ASC')
+      .limit(limit)
+      .getRawMany();
+
+    const ids = rows.map(r => Number(r.id));
+    if (ids.length === 0) {
+      return { products: [], count: 0, next_cursor: null };
+    }
+
+    const products = await this.productRepository
+      .createQueryBuilder('p')
+      .leftJoinAndSelect('p.category', 'c')
+      .leftJoinAndSelect('p.variants', 'v')
+      .leftJoinAndSelect('v.size', 's')
+      .leftJoinAndSelect('v.color', 'co')
+      .leftJoinAndSelect('v.images', 'i')
+      .where('p.id IN (:...ids)', { ids })
+      .getMany();
+
+    const byId = new Map(products.map(p => [Number(p.id), p]));
+    const ordered = ids.map(id => byId.get(id)).filter(Boolean);
+    const last = ordered[ordered.length - 1];
+
+    return {
+      products: ordered.map(p => ({
+        ...this.toChatbotProduct(p),
+        category_slug: p.category?.slug || null,
+        status: p.status,
+        deleted_at: p.deleted_at,
+        updated_at: p.updated_at,
+      })),
+      count: ordered.length,
+      next_cursor:
+        ids.length === limit
+          ? { updated_since: last.updated_at.toISOString(), after_id: Number(last.id) }
+          : null,
+    };
+  }
+
+  /**
+   * Lấy nhiều sản phẩm trong 1 query (so sánh sản phẩm, giỏ hàng, gợi ý phối đồ).
+   * Giữ thứ tự ids; ID không tồn tại / inactive / đã xóa nằm trong missing_ids.
+   */
+  async getProductsByIds(ids: number[]) {
+    const products = await this.productRepository
+      .createQueryBuilder('p')
+      .leftJoinAndSelect('p.category', 'c')
+      .leftJoinAndSelect('p.variants', 'v')
+      .leftJoinAndSelect('v.size', 's')
+      .leftJoinAndSelect('v.color', 'co')
+      .leftJoinAndSelect('v.images', 'i')
+      .where('p.id IN (:...ids)', { ids })
+      .andWhere('p.status = :status', { status: 'active' })
+      // Sản phẩm đã xóa mềm vẫn có thể 'active' -> trả về trong missing_ids để Rasa bỏ khỏi index
+      .andWhere('p.deleted_at IS NULL')
+      .getMany();
+
+    const byId = new Map(products.map(p => [Number(p.id), p]));
+    const ordered = ids.map(id => byId.get(id)).filter(Boolean);
+
+    return {
+      products: ordered.map(p => ({ ...this.toChatbotProduct(p), category_slug: p.category?.slug || null })),
+      count: ordered.length,
+      missing_ids: ids.filter(id => !byId.has(id)),
+    };
+  }
+
+  private toChatbotProduct(p: Product) {
+    const totalStock = p.variants?.reduce((sum, v) => sum + (v.total_stock || 0), 0) || 0;
+    const availableSizes = [...new Set(p.variants?.map(v => v.size?.name).filter(Boolean))];
+    const availableColors = [...new Set(p.variants?.map(v => v.color?.name).filter(Boolean))];
+    const images =
+      p.variants
+        ?.flatMap(v => v.images || [])
+        .slice(0, 3)
+        .map(img => img.image_url) || [];
+
+    const variants =
+      p.variants?.map(v => ({
+        id: v.id,
+        variant_id: v.id,
+        size: v.size?.name || null,
+        color: v.color?.name || null,
+        stock: v.total_stock - v.reserved_stock,
+      })) || [];
+
+    return {
+      id: p.id,
+      name: p.name,
+      slug: p.slug,
+      description: p.description || '',
+      selling_price: p.selling_price,
+      total_stock: totalStock,
+      category_name: p.category?.name || null,
+      thumbnail_url: p.thumbnail_url || images[0] || null,
+      available_sizes: availableSizes,
+      available_colors: availableColors,
+      images: images,
+      variants: variants,
+      colors: availableColors,
+    };
+  }
+
   async getPageBySlug(slug: string) {
     const page = await this.pageRepository.findOne({ where: { slug } });
 
@@ -680,13 +764,15 @@ export class InternalService {
    */
   async searchVariants(params: {
     product_id?: number;
+    ids?: number[];
+    product_ids?: number[];
     sku?: string;
     size?: string;
     color?: string;
     in_stock?: boolean;
     limit?: number;
   }) {
-    const { product_id, sku, size, color, in_stock, limit = 20 } = params;
+    const { product_id, ids, product_ids, sku, size, color, in_stock, limit = 20 } = params;
 
     const queryBuilder = this.variantRepository
       .createQueryBuilder('v')
@@ -702,6 +788,14 @@ export class InternalService {
       queryBuilder.andWhere('v.product_id = :product_id', { product_id });
     }
 
+    if (ids?.length) {
+      queryBuilder.andWhere('v.id IN (:...ids)', { ids });
+    }
+
+    if (product_ids?.length) {
+      queryBuilder.andWhere('v.product_id IN (:...product_ids)', { product_ids });
+    }
+
     if (sku) {
       queryBuilder.andWhere('v.sku ILIKE :sku', { sku: `%${sku}%` });
     }
@@ -718,7 +812,12 @@ export class InternalService {
       queryBuilder.andWhere('v.total_stock > v.reserved_stock');
     }
 
-    const variants = await queryBuilder.limit(limit).getMany();
+    // Batch theo ID: đã giới hạn bởi số ID (tối đa 100), không cắt bớt kết quả
+    if (!ids?.length && !product_ids?.length) {
+      queryBuilder.limit(limit);
+    }
+
+    const variants = await queryBuilder.getMany();
 
     return {
       variants: variants.map(v => ({
@@ -959,6 +1058,50 @@ export class InternalService {
    * API 3: Top Discounts
    */
   async getTopDiscounts(limit: number = 20) {
+    // Giá đã tính sẵn theo khung giờ khuyến mãi (python -m actions.promotion_pricing)
+    let rows: any[] = [];
+    try {
+      rows = await this.productRepository.query(
+        `SELECT cp.product_id, p.name, p.slug, p.thumbnail_url, c.name AS category,
+                cp.list_price, cp.effective_price, cp.discount_percent, cp.promotion_type,
+                COUNT(*) OVER () AS total
+         FROM current_product_prices cp
+         JOIN products p ON p.id = cp.product_id
+         LEFT JOIN categories c ON c.id = p.category_id
+         WHERE cp.discount_percent > 0 AND p.status = 'active' AND p.deleted_at IS NULL
+         ORDER BY cp.discount_percent DESC, cp.product_id
+         LIMIT $1`,
+        [limit],
+      );
+    } catch (error) {
+      // Bảng chưa được tạo (migration 011) -> tính như cũ
+      if (error?.code !== '42P01') throw error;
+      return this.getTopDiscountsFromCostPrice(limit);
+    }
+    if (!rows.length) return this.getTopDiscountsFromCostPrice(limit);
+
+    return {
+      top_discounts: rows.map(r => {
+        const listPrice = parseFloat(r.list_price);
+        const effectivePrice = parseFloat(r.effective_price);
+        return {
+          product_id: Number(r.product_id),
+          product_name: r.name,
+          slug: r.slug,
+          original_price: listPrice,
+          selling_price: effectivePrice,
+          discount_percent: Math.round(parseFloat(r.discount_percent)),
+          save_amount: listPrice - effectivePrice,
+          category: r.category || null,
+          thumbnail_url: r.thumbnail_url,
+          promotion_type: r.promotion_type || null,
+        };
+      }),
+      count: Number(rows[0].total),
+    };
+  }
+
+  private async getTopDiscountsFromCostPrice(limit: number) {
     const products = await this.productRepository
       .createQueryBuilder('p')
       .leftJoinAndSelect('p.category', 'c')